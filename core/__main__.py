@@ -49,6 +49,9 @@ parser.add_argument('-g', '--no-gui', action='store_true',
         help='does not load the manager gui module')
 parser.add_argument('-c', '--config', default='', help='configuration file')
 parser.add_argument('-l', '--logdir', default='', help='log directory')
+parser.add_argument('-sp', '--profile-startup', action='store_true',
+        help='record import, instantiation, connection and activation times of all modules '
+             'and write a report to the log directory')
 args = parser.parse_args()
 
 
@@ -39,12 +39,22 @@ import ruamel.yaml as yaml
 from io import BytesIO
 
 
-def ordered_load(stream, Loader=yaml.Loader):
+class NpyFile(str):
+    """
+    Name of a .npy file in the directory of the config file holding a numpy
+    array. Saved with the tag !npy and loaded as the numpy array.
+    """
+    pass
+
+
+def ordered_load(stream, Loader=yaml.Loader, mmap_arrays=False):
     """
     Loads a YAML formatted data from stream and puts it into an OrderedDict
 
     @param Stream stream: stream the data is read from
     @param Loader Loader: Loader base class
+    @param bool mmap_arrays: memory-map arrays stored in .npy files (copy on
+                             write) instead of reading them
 
     Returns OrderedDict with data. If stream is empty then an empty
     OrderedDict is returned.
@@ -80,6 +90,22 @@ def ordered_load(stream, Loader=yaml.Loader):
         arrays = numpy.load(filename)
         return arrays['array']
 
+    def construct_npy(loader, node):
+        """
+        The constructor for a numpy array that is saved in a .npy file next
+        to the config file.
+        """
+        filename = loader.construct_yaml_str(node)
+        configdir = os.path.dirname(getattr(stream, 'name', ''))
+        path = os.path.join(configdir, filename)
+        if mmap_arrays:
+            try:
+                return numpy.load(path, mmap_mode='c').view(numpy.ndarray)
+            except ValueError:
+                # arrays of python objects can not be memory-mapped
+                pass
+        return numpy.load(path, allow_pickle=True)
+
     def construct_frozenset(loader, node):
         """
         The frozenset constructor.
@@ -120,6 +146,9 @@ def ordered_load(stream, Loader=yaml.Loader):
     OrderedLoader.add_constructor(
             '!extndarray',
             construct_external_ndarray)
+    OrderedLoader.add_constructor(
+            '!npy',
+            construct_npy)
     OrderedLoader.add_constructor(
         '!frozenset',
         construct_frozenset)
@@ -136,13 +165,15 @@ def ordered_load(stream, Loader=yaml.Loader):
         return OrderedDict()
 
 
-def ordered_dump(data, stream=None, Dumper=yaml.Dumper, **kwds):
+def ordered_dump(data, stream=None, Dumper=yaml.Dumper, inline_arrays=False, **kwds):
     """
     dumps (OrderedDict) data in YAML format
 
     @param OrderedDict data: the data
     @param Stream stream: where the data in YAML is dumped
     @param Dumper Dumper: The dumper that is used as a base class
+    @param bool inline_arrays: save numpy arrays in the YAML data instead of
+                               external .npz files
     """
     class OrderedDumper(Dumper):
         """
@@ -184,11 +215,21 @@ def ordered_dump(data, stream=None, Dumper=yaml.Dumper, **kwds):
         node.tag = '!frozenset'
         return node
 
+    def represent_npy(dumper, filename):
+        """
+        Representer for references to .npy files
+        """
+        node = dumper.represent_str(str(filename))
+        node.tag = '!npy'
+        return node
+
     def represent_ndarray(dumper, array_data):
         """
         Representer for numpy ndarrays
         """
         try:
+            if inline_arrays:
+                raise ValueError('Arrays are saved inline.')
             filename = os.path.splitext(os.path.basename(stream.name))[0]
             configdir = os.path.dirname(stream.name)
             newpath = '{0}-{1:06}.npz'.format(
@@ -222,29 +263,35 @@ def ordered_dump(data, stream=None, Dumper=yaml.Dumper, **kwds):
     # OrderedDumper.add_representer(numpy.float128, represent_float)
     OrderedDumper.add_representer(numpy.ndarray, represent_ndarray)
     OrderedDumper.add_representer(frozenset, represent_frozenset)
+    OrderedDumper.add_representer(NpyFile, represent_npy)
 
     # dump data
     return yaml.dump(data, stream, OrderedDumper, **kwds)
 
 
-def load(filename):
+def load(filename, mmap_arrays=False):
     """
     Loads a config file
 
     @param str filename: filename of config file
+    @param bool mmap_arrays: memory-map arrays stored in .npy files (copy on
+                             write) instead of reading them
 
     Returns OrderedDict
     """
     with open(filename, 'r') as f:
-        return ordered_load(f, yaml.SafeLoader)
+        return ordered_load(f, yaml.SafeLoader, mmap_arrays=mmap_arrays)
 
 
-def save(filename, data):
+def save(filename, data, inline_arrays=False):
     """
     saves data to filename in yaml format.
 
     @param str filename: filename of config file
     @param OrderedDict data: config values
+    @param bool inline_arrays: save numpy arrays in the YAML file instead of
+                               external .npz files
     """
     with open(filename, 'w') as f:
-        ordered_dump(data, stream=f, Dumper=yaml.SafeDumper, default_flow_style=False)
+        ordered_dump(data, stream=f, Dumper=yaml.SafeDumper, default_flow_style=False,
+                     inline_arrays=inline_arrays)
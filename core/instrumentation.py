@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the Qudi instrumentation of measurement loops and other hot paths.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import datetime
+import functools
+import json
+import math
+import threading
+import time
+
+from collections import OrderedDict
+
+# Histogram bins: HISTOGRAM_BINS_PER_DECADE logarithmic bins per decade starting at
+# HISTOGRAM_MIN s, durations outside of the range are counted in the first or last bin
+HISTOGRAM_MIN = 1e-6
+HISTOGRAM_DECADES = 8
+HISTOGRAM_BINS_PER_DECADE = 4
+HISTOGRAM_BINS = HISTOGRAM_DECADES * HISTOGRAM_BINS_PER_DECADE
+
+
+def histogram_edges():
+    """ Lower edges of the histogram bins in s. """
+    return [HISTOGRAM_MIN * 10 ** (i / HISTOGRAM_BINS_PER_DECADE) for i in range(HISTOGRAM_BINS)]
+
+
+class Probe:
+    """ Timing statistics of one instrumented piece of code, e.g. one iteration of a measurement
+        loop.
+    """
+
+    def __init__(self, name):
+        """
+        @param str name: name of the probe, nested probes are named <parent>/<child>
+        """
+        self.name = name
+        self.calls = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.last = 0.0
+        self.first_start = None
+        self.last_end = None
+        self.histogram = [0] * HISTOGRAM_BINS
+
+    def add(self, start, duration):
+        """ Add a measured duration.
+
+        @param float start: start time (time.perf_counter) in s
+        @param float duration: duration in s
+        """
+        self.calls += 1
+        self.total += duration
+        self.last = duration
+        if duration < self.min:
+            self.min = duration
+        if duration > self.max:
+            self.max = duration
+        if self.first_start is None:
+            self.first_start = start
+        self.last_end = start + duration
+        if duration > HISTOGRAM_MIN:
+            index = int(math.log10(duration / HISTOGRAM_MIN) * HISTOGRAM_BINS_PER_DECADE)
+            self.histogram[min(index, HISTOGRAM_BINS - 1)] += 1
+        else:
+            self.histogram[0] += 1
+
+    def statistics(self):
+        """ Statistics as dictionary of python types.
+
+        @return dict: calls, total, mean, min, max and last duration in s, duty cycle (fraction of
+                      the time between the first start and the last end spent in the code) and
+                      histogram (counts of the bins, see histogram_edges)
+        """
+        elapsed = 0.0 if self.first_start is None else self.last_end - self.first_start
+        return OrderedDict((
+            ('calls', self.calls),
+            ('total', self.total),
+            ('mean', self.total / self.calls if self.calls else 0.0),
+            ('min', self.min if self.calls else 0.0),
+            ('max', self.max),
+            ('last', self.last),
+            ('duty_cycle', min(1.0, self.total / elapsed) if elapsed > 0 else 0.0),
+            ('histogram', list(self.histogram))))
+
+
+class _NullContext:
+    """ Context manager doing nothing, used while the instrumentation is disabled. """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_null_context = _NullContext()
+
+
+class _Measurement:
+    """ Context manager timing its body with a probe. """
+
+    def __init__(self, instrumentation, name):
+        self._instrumentation = instrumentation
+        self._name = name
+
+    def __enter__(self):
+        self._key = self._instrumentation._push(self._name)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter() - self._start
+        self._instrumentation._pop()
+        self._instrumentation.record(self._key, duration, start=self._start)
+        return False
+
+
+class Instrumentation:
+    """
+    Records timing statistics (calls, total, min, max, histogram, duty cycle) of instrumented code
+    and counters.
+
+    Code is instrumented with the decorator timed or the context manager measure. Measurements
+    started while another one is running in the same thread are recorded as its children
+    (<parent>/<child>), e.g. the time waiting for the hardware in one iteration of a loop:
+
+        @instrumentation.timed()
+        def count_loop_body(self):
+            with instrumentation.measure('hardware'):
+                data = self._counting_device.get_counter()
+            ...
+
+    Methods of Qudi modules are recorded as <module name>.<method name>. While the
+    instrumentation is disabled (the default) the decorator only checks a flag and measure returns
+    a shared context manager that does nothing, so instrumented code can stay in place.
+    """
+
+    def __init__(self, enabled=False):
+        """
+        @param bool enabled: record timings
+        """
+        self.enabled = bool(enabled)
+        self._probes = OrderedDict()
+        self._counters = OrderedDict()
+        self._lock = threading.Lock()
+        self._stacks = threading.local()
+        self._reset_time = time.time()
+
+    def _push(self, name):
+        stack = getattr(self._stacks, 'stack', None)
+        if stack is None:
+            stack = self._stacks.stack = list()
+        key = name if not stack else '{0}/{1}'.format(stack[-1], name)
+        stack.append(key)
+        return key
+
+    def _pop(self):
+        self._stacks.stack.pop()
+
+    def measure(self, name):
+        """ Context manager recording the duration of its body.
+
+        @param str name: name of the probe, prefixed by the name of an enclosing measurement
+
+        @return: context manager
+        """
+        if not self.enabled:
+            return _null_context
+        return _Measurement(self, name)
+
+    def timed(self, name=None):
+        """ Decorator recording the duration of each call of a function.
+
+        @param str name: name of the probe, default: the name of the function. For methods of
+                         Qudi modules the module name is prepended.
+
+        @return: decorator
+        """
+        def decorator(function):
+            probe_name = function.__name__ if name is None else name
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                module_name = getattr(args[0], '_name', None) if args else None
+                if isinstance(module_name, str):
+                    key = '{0}.{1}'.format(module_name, probe_name)
+                else:
+                    key = probe_name
+                with _Measurement(self, key):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name, duration, start=None):
+        """ Add a duration measured elsewhere to a probe.
+
+        @param str name: full name of the probe
+        @param float duration: duration in s
+        @param float start: start time (time.perf_counter) in s, default: now - duration
+        """
+        if not self.enabled:
+            return
+        if start is None:
+            start = time.perf_counter() - duration
+        with self._lock:
+            probe = self._probes.get(name)
+            if probe is None:
+                probe = self._probes[name] = Probe(name)
+            probe.add(start, duration)
+
+    def count(self, name, value=1):
+        """ Increase a counter, e.g. for dropped samples or retries.
+
+        @param str name: name of the counter
+        @param int value: value to add
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def reset(self):
+        """ Remove all recorded timings and counters. """
+        with self._lock:
+            self._probes.clear()
+            self._counters.clear()
+            self._reset_time = time.time()
+
+    def statistics(self):
+        """ All recorded statistics as dictionary of python types (e.g. for remote access).
+
+        @return dict: 'enabled', 'since' (time of the last reset as ISO string), 'histogram_edges'
+                      (lower bin edges in s), 'probes' (name -> statistics, see
+                      Probe.statistics) and 'counters' (name -> value)
+        """
+        with self._lock:
+            probes = OrderedDict((name, probe.statistics()) for name, probe in self._probes.items())
+            counters = OrderedDict(self._counters)
+            since = datetime.datetime.fromtimestamp(self._reset_time).isoformat(' ')
+        return OrderedDict((('enabled', self.enabled),
+                            ('since', since),
+                            ('histogram_edges', histogram_edges()),
+                            ('probes', probes),
+                            ('counters', counters)))
+
+    def format_report(self):
+        """ Create a text report of all recorded statistics.
+
+        @return str: the report
+        """
+        statistics = self.statistics()
+        probes = statistics['probes']
+        lines = ['Qudi instrumentation, {0} (recorded since {1})'.format(
+            datetime.datetime.now().isoformat(' '), statistics['since']), '']
+        header = '{0:<50}{1:>10}{2:>12}{3:>12}{4:>12}{5:>12}{6:>8}{7:>8}'.format(
+            'probe', 'calls', 'mean [ms]', 'min [ms]', 'max [ms]', 'total [s]', 'duty', 'parent')
+        lines.append(header)
+        lines.append('-' * len(header))
+        # sorted, so nested probes follow their parent
+        for name, stats in sorted(probes.items()):
+            parent = name.rpartition('/')[0]
+            share = ''
+            if parent in probes and probes[parent]['total'] > 0:
+                share = '{0:.0%}'.format(stats['total'] / probes[parent]['total'])
+            lines.append('{0:<50}{1:>10d}{2:>12.3f}{3:>12.3f}{4:>12.3f}{5:>12.3f}{6:>8.0%}{7:>8}'
+                         ''.format(name, stats['calls'], stats['mean'] * 1e3, stats['min'] * 1e3,
+                                   stats['max'] * 1e3, stats['total'], stats['duty_cycle'],
+                                   share))
+        if statistics['counters']:
+            lines.append('')
+            lines.append('Counters:')
+            for name, value in statistics['counters'].items():
+                lines.append('{0:<50}{1:>10}'.format(name, value))
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path):
+        """ Write all recorded statistics to a file.
+
+        @param str path: path of the file, a .json file gets the statistics including the
+                         histograms, any other file the text report (see format_report)
+        """
+        with open(path, 'w') as file:
+            if path.lower().endswith('.json'):
+                json.dump(self.statistics(), file, indent=1)
+            else:
+                file.write(self.format_report())
+
+
+# instrumentation shared by all modules of this Qudi process
+instrumentation = Instrumentation()
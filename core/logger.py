@@ -31,6 +31,9 @@ import os
 import sys
 import traceback
 import functools
+import collections
+import threading
+import time
 from qtpy import QtCore
 
 
@@ -78,12 +81,23 @@ class QtLogFormatter(logging.Formatter):
 class QtLogHandler(QtCore.QObject, logging.Handler):
     """Log handler for displaying log records in a QT gui.
 
-      For each log record the Qt signal sigLoggedMessage is emitted
-      with a dictionary as parameter. The keys of this dictionary are:
+      Log records are only queued when they are emitted, so logging from any
+      thread is cheap. The queued records are formatted and delivered in the
+      thread of this handler (the main thread) in batches at most every
+      <interval> seconds. Consecutive records with the same logger name, level
+      and message (and without exception) are coalesced into a single entry
+      with a repeat counter when they are queued. If more than <max_pending>
+      records are waiting for delivery, the oldest ones are dropped and a
+      warning entry is added.
+
+      For each batch the Qt signal sigLoggedMessages is emitted with a list of
+      dictionaries, and sigLoggedMessage once for each of them. The keys of
+      these dictionaries are:
         - name: logger name
         - message: the message
-        - timestamp: the creation time of the log record
+        - timestamp: the creation time of the (last) log record
         - level: log level
+        - repeat: number of coalesced log records
       Optional if an exception is logged:
         - exception: dictionary with keys:
           - message: the message
@@ -91,26 +105,109 @@ class QtLogHandler(QtCore.QObject, logging.Handler):
 
       @param object parent: parent of QObject, defaults to None
       @param int level: log level, defaults to NOTSET
+      @param float interval: minimum time between two batches in seconds
+      @param int max_pending: maximum number of queued log records
     """
 
     sigLoggedMessage = QtCore.Signal(object)
-    """signal emitted for each log record"""
+    """signal emitted for each delivered log entry"""
+    sigLoggedMessages = QtCore.Signal(object)
+    """signal emitted for each batch of log entries"""
+    _sigScheduleDelivery = QtCore.Signal()
 
-    def __init__(self, parent=None, level=0):
+    def __init__(self, parent=None, level=0, interval=0.1, max_pending=10000):
         QtCore.QObject.__init__(self, parent)
         logging.Handler.__init__(self, level)
         self.setFormatter(QtLogFormatter())
+        self.interval = interval
+        self._pending = collections.deque(maxlen=max_pending)
+        self._pending_lock = threading.Lock()
+        self._dropped = 0
+        self._delivery_scheduled = False
+        self._last_delivery = 0
+        # created on first use, the handler is set up before the Qt application
+        self._delivery_timer = None
+        self._sigScheduleDelivery.connect(self._schedule_delivery,
+                                          QtCore.Qt.QueuedConnection)
 
     def emit(self, record):
         """Emit function of handler.
 
-          Formats the log record and emits :sigLoggedMessage:
+          Queues the log record for delivery with the next batch. A record
+          equal to the previously queued one only increases its repeat counter.
 
           @param object record: :logging.LogRecord:
         """
-        record = self.format(record)
-        if record:
-            self.sigLoggedMessage.emit(record)
+        try:
+            if record.exc_info is None:
+                key = (record.name, record.levelno, record.getMessage())
+            else:
+                key = None
+        except Exception:
+            self.handleError(record)
+            return
+        with self._pending_lock:
+            if (key is not None and self._pending
+                    and self._pending[-1][0] == key):
+                # coalesce with the previous record, keep the newest one
+                self._pending[-1][1] = record
+                self._pending[-1][2] += 1
+            else:
+                if len(self._pending) == self._pending.maxlen:
+                    self._dropped += 1
+                self._pending.append([key, record, 1])
+            if self._delivery_scheduled:
+                return
+            self._delivery_scheduled = True
+        self._sigScheduleDelivery.emit()
+
+    def _schedule_delivery(self):
+        """Start the timer for the delivery of the next batch."""
+        if self._delivery_timer is None:
+            self._delivery_timer = QtCore.QTimer(self)
+            self._delivery_timer.setSingleShot(True)
+            self._delivery_timer.timeout.connect(self.deliver_pending)
+        wait = self._last_delivery + self.interval - time.monotonic()
+        self._delivery_timer.start(max(0, int(round(wait * 1000))))
+
+    def deliver_pending(self):
+        """Format all queued log records and emit them as a batch.
+
+          Must be called from the thread of the handler.
+        """
+        with self._pending_lock:
+            records = list(self._pending)
+            self._pending.clear()
+            dropped = self._dropped
+            self._dropped = 0
+            self._delivery_scheduled = False
+        self._last_delivery = time.monotonic()
+
+        entries = list()
+        if dropped:
+            entries.append({
+                'name': __name__,
+                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'level': 'warning',
+                'message': '{0:d} log messages were dropped because they '
+                           'arrived faster than they could be '
+                           'displayed.'.format(dropped),
+                'repeat': 1})
+        for key, record, repeat in records:
+            try:
+                entry = self.format(record)
+            except Exception:
+                self.handleError(record)
+                continue
+            if entry:
+                entry['repeat'] = repeat
+                entries.append(entry)
+
+        if not entries:
+            return
+        for entry in entries:
+            self.sigLoggedMessage.emit(entry)
+        self.sigLoggedMessages.emit(entries)
 
 
 def initialize_logger(path=''):
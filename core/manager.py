@@ -27,6 +27,8 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+import concurrent.futures
+import functools
 import os
 import sys
 import re
@@ -38,6 +40,9 @@ from . import config
 
 from .util.mutex import Mutex  # Mutex provides access serialization between threads
 from .util.modules import toposort, is_base
+from .util.startup_profiler import StartupProfiler
+from .statusstore import StatusStore
+from .instrumentation import instrumentation
 from collections import OrderedDict
 from .logger import register_exception_handler
 from .threadmanager import ThreadManager
@@ -106,6 +111,15 @@ class Manager(QtCore.QObject):
         self.baseDir = None
         self.alreadyQuit = False
         self.remote_server = False
+        # activation times of the modules activated last, see _activateModules
+        self.activation_times = OrderedDict()
+        # records import, instantiation, connection and activation times if enabled
+        self.startup_profiler = StartupProfiler(enabled=getattr(args, 'profile_startup', False))
+        self.startup_profiler.start_import_tracking()
+        self._logDir = getattr(args, 'logdir', '')
+        # saves and loads the status variables, configured from the global config section
+        self.status_store = StatusStore()
+        self._statusCheckpointTimer = None
 
         try:
             # Initialize parent class QObject
@@ -135,6 +149,9 @@ class Manager(QtCore.QObject):
                 config_file = args.config
             self.configDir = os.path.dirname(config_file)
             self.readConfig(config_file)
+            self._setupStatusStore()
+            self._setupWorkerPools()
+            instrumentation.enabled = bool(self.tree['global'].get('instrumentation', False))
 
             # check first if remote support is enabled and if so create RemoteObjectManager
             if RemoteObjectManager is None:
@@ -167,8 +184,12 @@ class Manager(QtCore.QObject):
                             if (cacertfile is not None) and not os.path.isabs(cacertfile):
                                 cacertfile = os.path.abspath(os.path.join(self.configDir,
                                                                           cacertfile))
+                            array_transport = self.tree['global']['module_server'].get(
+                                'array_transport', True)
+                            array_port = self.tree['global']['module_server'].get(
+                                'array_port', 0)
                             self.rm.createServer(server_address, server_port, certfile, keyfile,
-                                                 cacertfile)
+                                                 cacertfile, array_transport, array_port)
                             # successfully started remote server
                             logger.info('Started server rpyc://{0}:{1}'.format(server_address,
                                                                                server_port))
@@ -185,22 +206,28 @@ class Manager(QtCore.QObject):
             if 'startup' in self.tree['global']:
                 # walk throug the list of loadable modules to be loaded on
                 # startup and load them if appropriate
+                startup_modules = list()
                 for key in self.tree['global']['startup']:
                     if key in self.tree['defined']['hardware']:
-                        self.startModule('hardware', key)
-                        self.sigModulesChanged.emit()
+                        startup_modules.append(('hardware', key))
                     elif key in self.tree['defined']['logic']:
-                        self.startModule('logic', key)
-                        self.sigModulesChanged.emit()
+                        startup_modules.append(('logic', key))
                     elif self.hasGui and key in self.tree['defined']['gui']:
-                        self.startModule('gui', key)
-                        self.sigModulesChanged.emit()
+                        startup_modules.append(('gui', key))
                     else:
                         logger.error('Loading startup module {} failed, not '
                                      'defined anywhere.'.format(key))
+                if startup_modules:
+                    self.startModules(startup_modules)
+                    self.sigModulesChanged.emit()
+
+            self.startup_profiler.stop_import_tracking()
+            if self.startup_profiler.enabled:
+                self.writeStartupProfile()
         except:
             logger.exception('Error while configuring Manager:')
         finally:
+            self.startup_profiler.stop_import_tracking()
             if (len(self.tree['loaded']['logic']) == 0
                     and len(self.tree['loaded']['gui']) == 0):
                 logger.critical('No modules loaded during startup.')
@@ -762,7 +789,9 @@ class Manager(QtCore.QObject):
                         defined_module['remote'],
                         certfile=certfile,
                         keyfile=keyfile,
-                        cacertsfile=cacertsfile)
+                        cacertsfile=cacertsfile,
+                        cached_methods=defined_module.get('cached_methods', None),
+                        connections=defined_module.get('connections', None))
                     logger.info('Remote module {0} loaded as {1}.{2}.'
                                 ''.format(defined_module['remote'], base, key))
                     with self.lock:
@@ -787,19 +816,21 @@ class Manager(QtCore.QObject):
                         '',
                         defined_module['module.Class'])
 
-                    modObj = self.importModule(base, module_name)
-
-                    # Ensure that the namespace of a module is reloaded before 
-                    # instantiation. That will not harm anything.
-                    # Even if the import is successful an error might occur 
-                    # during instantiation. E.g. in an abc metaclass, 
-                    # methods might be missing in a derived interface file.
-                    # Reloading the namespace will prevent the need to restart 
-                    # Qudi, if a module instantiation was not successful upon 
-                    # load.
-                    importlib.reload(modObj)  # keep the namespace of module up to date
-
-                    self.configureModule(modObj, base, class_name, key, defined_module)
+                    with self.startup_profiler.measure(base, key, 'import'):
+                        modObj = self.importModule(base, module_name)
+
+                        # Ensure that the namespace of a module is reloaded before 
+                        # instantiation. That will not harm anything.
+                        # Even if the import is successful an error might occur 
+                        # during instantiation. E.g. in an abc metaclass, 
+                        # methods might be missing in a derived interface file.
+                        # Reloading the namespace will prevent the need to restart 
+                        # Qudi, if a module instantiation was not successful upon 
+                        # load.
+                        importlib.reload(modObj)  # keep the namespace of module up to date
+
+                    with self.startup_profiler.measure(base, key, 'instantiate'):
+                        self.configureModule(modObj, base, class_name, key, defined_module)
                     if 'remoteaccess' in defined_module and defined_module['remoteaccess']:
                         if self.rm is None:
                             logger.error('Remote module sharing functionality disabled. Rpyc not'
@@ -940,18 +971,31 @@ class Manager(QtCore.QObject):
           @param string name: module which is going to be activated.
 
         """
+        if self._prepareModuleActivation(base, name):
+            self._triggerModuleActivation(base, name)
+        QtCore.QCoreApplication.instance().processEvents()
+
+    def _prepareModuleActivation(self, base, name):
+        """ Check if a module can be activated, restore its status variables and start its thread.
+            Must be called from the main thread.
+
+          @param string base: module base package (hardware, logic or gui)
+          @param string name: module which is going to be activated.
+
+          @return bool: True if the activation can be triggered
+        """
         if not self.isModuleLoaded(base, name):
             logger.error('{0} module {1} not loaded.'.format(base, name))
-            return
+            return False
         module = self.tree['loaded'][base][name]
         if module.module_state() != 'deactivated' and (
                 self.isModuleDefined(base, name)
                 and 'remote' in self.tree['defined'][base][name]):
             logger.debug('No need to activate remote module {0}.{1}.'.format(base, name))
-            return
+            return False
         if module.module_state() != 'deactivated':
             logger.error('{0} module {1} not deactivated'.format(base, name))
-            return
+            return False
         try:
             module.setStatusVariables(self.loadStatusVariables(base, name))
             # start main loop for qt objects
@@ -959,6 +1003,25 @@ class Manager(QtCore.QObject):
                 modthread = self.tm.newThread('mod-{0}-{1}'.format(base, name))
                 module.moveToThread(modthread)
                 modthread.start()
+        except:
+            logger.exception(
+                '{0} module {1}: error during activation:'.format(base, name))
+            return False
+        return True
+
+    def _triggerModuleActivation(self, base, name):
+        """ Run the activation of a module prepared by _prepareModuleActivation.
+            Threaded modules are activated in their own thread, all others in the calling thread.
+
+          @param string base: module base package (hardware, logic or gui)
+          @param string name: module which is going to be activated.
+
+          @return bool: activation success
+        """
+        module = self.tree['loaded'][base][name]
+        success = False
+        try:
+            if module.is_module_threaded:
                 success = QtCore.QMetaObject.invokeMethod(
                     module.module_state,
                     'trigger',
@@ -966,12 +1029,124 @@ class Manager(QtCore.QObject):
                     QtCore.Q_RETURN_ARG(bool),
                     QtCore.Q_ARG(str, 'activate'))
             else:
-                success = module.module_state.activate()  # runs on_activate in main thread
+                success = module.module_state.activate()  # runs on_activate in calling thread
             logger.debug('Activation success: {}'.format(success))
         except:
             logger.exception(
                 '{0} module {1}: error during activation:'.format(base, name))
-        QtCore.QCoreApplication.instance().processEvents()
+        return bool(success)
+
+    def _activatesInParallel(self, base, name):
+        """ Decide if a module may be activated concurrently with other modules.
+
+          @param string base: module base package (hardware, logic or gui)
+          @param string name: module name
+
+          @return bool: True if the activation may run in a worker thread
+
+            Threaded modules are activated in their own thread anyway. Non-threaded modules are
+            activated in the main thread unless their configuration contains
+            "parallel_activation: True". GUI modules are always activated in the main thread.
+        """
+        if base == 'gui':
+            return False
+        module = self.tree['loaded'][base][name]
+        default = module.is_module_threaded
+        return bool(self.tree['defined'][base][name].get('parallel_activation', default))
+
+    def _activateModules(self, modules, deps):
+        """ Activate several loaded and connected modules and log the activation times.
+
+          @param list modules: (base, name) tuples of the modules in topological order
+          @param dict deps: module dependencies in the format of the toposort function
+
+            If "parallel_activation: True" is set in the global section of the configuration,
+            each module is activated as soon as all modules it depends on are active. Modules
+            allowed to (see _activatesInParallel) are activated concurrently, all others in the
+            main thread. Otherwise the modules are activated one after another.
+        """
+        timings = OrderedDict()
+        app = QtCore.QCoreApplication.instance()
+        start_time = time.perf_counter()
+
+        def timed_activation(base, name, thread_name):
+            start = time.perf_counter()
+            success = self._triggerModuleActivation(base, name)
+            return {'thread': thread_name,
+                    'start': start - start_time,
+                    'duration': time.perf_counter() - start,
+                    'success': success}
+
+        if not self.tree['global'].get('parallel_activation', False):
+            for base, name in modules:
+                if self._prepareModuleActivation(base, name):
+                    timings[(base, name)] = timed_activation(base, name, 'main')
+                app.processEvents()
+            self._logActivationTimes(timings, time.perf_counter() - start_time)
+            return
+
+        names = set(name for base, name in modules)
+        pending = OrderedDict(
+            ((base, name), set(deps.get(name, ())) & names) for base, name in modules)
+        done_names = set()
+        running = dict()
+        workers = max(1, min(32, len(modules)))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            while pending or running:
+                ready = [mod for mod, mod_deps in pending.items() if mod_deps <= done_names]
+                if not ready and not running:
+                    logger.error('Unable to resolve activation order of modules {0}.'
+                                 ''.format(', '.join(name for base, name in pending)))
+                    break
+                # hand over all concurrent activations before blocking the main thread
+                ready.sort(key=lambda mod: not self._activatesInParallel(*mod))
+                for base, name in ready:
+                    del pending[(base, name)]
+                    if not self._prepareModuleActivation(base, name):
+                        done_names.add(name)
+                    elif self._activatesInParallel(base, name):
+                        thread_name = ('module' if self.tree['loaded'][base][name].is_module_threaded
+                                       else 'worker')
+                        future = pool.submit(timed_activation, base, name, thread_name)
+                        running[future] = (base, name)
+                    else:
+                        timings[(base, name)] = timed_activation(base, name, 'main')
+                        done_names.add(name)
+                    app.processEvents()
+                if running:
+                    # keep the event loop of the main thread alive while waiting
+                    finished, _ = concurrent.futures.wait(
+                        running, timeout=0.01, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in finished:
+                        base, name = running.pop(future)
+                        timings[(base, name)] = future.result()
+                        done_names.add(name)
+                app.processEvents()
+        self._logActivationTimes(timings, time.perf_counter() - start_time)
+
+    def _logActivationTimes(self, timings, total):
+        """ Store the activation times in self.activation_times and log them as table.
+
+          @param OrderedDict timings: dict with (base, name) as keys and dicts with the keys
+                                      'thread', 'start', 'duration' and 'success' as values
+          @param float total: total time in s needed for activating all modules
+        """
+        if not timings:
+            return
+        self.activation_times = timings
+        for (base, name), timing in timings.items():
+            self.startup_profiler.add_time(base, name, 'activate', timing['duration'])
+        lines = ['Activated {0:d} modules in {1:.3f} s:'.format(len(timings), total),
+                 '    {0:<40} {1:>9} {2:>12}  {3:<7}'.format(
+                     'module', 'start [s]', 'duration [s]', 'thread')]
+        for (base, name), timing in timings.items():
+            lines.append('    {0:<40} {1:>9.3f} {2:>12.3f}  {3:<7}{4}'.format(
+                '{0}.{1}'.format(base, name),
+                timing['start'],
+                timing['duration'],
+                timing['thread'],
+                '' if timing['success'] else '  (failed)'))
+        logger.info('\n'.join(lines))
 
     @QtCore.Slot(str, str)
     def deactivateModule(self, base, name):
@@ -1148,35 +1323,72 @@ class Manager(QtCore.QObject):
             If the module is already loaded, just activate it.
             If the module is an active GUI module, show its window.
         """
+        return self.startModules([(base, key)])
 
-        deps = self.getRecursiveModuleDependencies(base, key)
-        sorteddeps = toposort(deps)
-        if len(sorteddeps) == 0:
-            sorteddeps.append(key)
+    def startModules(self, modules):
+        """ Load, connect and activate several modules together with all their dependencies.
 
+          @param list modules: (base, key) tuples of the modules to start
+
+          @return int: 0 on success, -1 if a module could not be loaded or connected
+
+            All modules are loaded and connected first. Modules depending on a module that
+            failed to load are skipped. Afterwards all loaded modules are activated (see
+            _activateModules).
+        """
+        deps = dict()
+        sorteddeps = list()
+        for base, key in modules:
+            module_deps = self.getRecursiveModuleDependencies(base, key)
+            if module_deps is None:
+                logger.error('Unable to resolve dependencies of module {0}.{1}.'
+                             ''.format(base, key))
+                continue
+            deps.update(module_deps)
+            module_order = toposort(module_deps)
+            if len(module_order) == 0:
+                module_order.append(key)
+            sorteddeps.extend(mkey for mkey in module_order if mkey not in sorteddeps)
+
+        result = 0
+        failed = set()
+        to_activate = list()
         for mkey in sorteddeps:
+            if failed.intersection(deps.get(mkey, ())):
+                logger.warning('Not loading module {0} since a module it depends on could not '
+                               'be loaded.'.format(mkey))
+                failed.add(mkey)
+                continue
             for mbase in ('hardware', 'logic', 'gui'):
                 if mkey in self.tree['defined'][mbase] and mkey not in self.tree['loaded'][mbase]:
                     success = self.loadConfigureModule(mbase, mkey)
                     if success < 0:
-                        logger.warning('Stopping module loading after loading failure.')
-                        return -1
+                        logger.warning('Skipping modules depending on {0}.{1} after loading '
+                                       'failure.'.format(mbase, mkey))
+                        failed.add(mkey)
+                        result = -1
+                        break
                     elif success > 0:
                         logger.warning('Nonfatal loading error, going on.')
-                    success = self.connectModule(mbase, mkey)
+                    with self.startup_profiler.measure(mbase, mkey, 'connect'):
+                        success = self.connectModule(mbase, mkey)
                     if success < 0:
-                        logger.warning('Stopping loading module {0}.{1} after '
+                        logger.warning('Skipping modules depending on {0}.{1} after '
                                        'connection failure.'.format(mbase, mkey))
-                        return -1
+                        failed.add(mkey)
+                        result = -1
+                        break
                     if mkey in self.tree['loaded'][mbase]:
-                        self.activateModule(mbase, mkey)
+                        to_activate.append((mbase, mkey))
                 elif mkey in self.tree['defined'][mbase] and mkey in self.tree['loaded'][mbase]:
                     if self.tree['loaded'][mbase][mkey].module_state() == 'deactivated':
-                        self.activateModule(mbase, mkey)
+                        to_activate.append((mbase, mkey))
                     elif (self.tree['loaded'][mbase][mkey].module_state() != 'deactivated' and
                           mbase == 'gui'):
                         self.tree['loaded'][mbase][mkey].show()
-        return 0
+
+        self._activateModules(to_activate, deps)
+        return result
 
     @QtCore.Slot(str, str)
     def stopModule(self, base, key):
@@ -1258,13 +1470,63 @@ class Manager(QtCore.QObject):
         deps = self.getAllRecursiveModuleDependencies(self.tree['defined'])
         sorteddeps = toposort(deps)
 
-        for module in sorteddeps:
-            base = self.findBase(module)
-            if self.startModule(base, module) < 0:
-                break
+        self.startModules([(self.findBase(module), module) for module in sorteddeps])
 
         logger.info('Start all modules finished.')
 
+    def writeStartupProfile(self, path=None):
+        """ Write the report of the startup profiler (enabled with the command line option
+            --profile-startup) to a text file.
+
+          @param str path: path of the report, default: startup_profile.txt in the log directory
+        """
+        if not self.startup_profiler.enabled:
+            logger.error('Startup profiling is not enabled. Start Qudi with --profile-startup.')
+            return
+        if path is None:
+            path = os.path.join(self._logDir, 'startup_profile.txt')
+        try:
+            self.startup_profiler.write_report(path)
+        except OSError:
+            logger.exception('Unable to write startup profile to {0}.'.format(path))
+            return
+        logger.info('Startup profile written to {0}.'.format(os.path.abspath(path)))
+
+    @QtCore.Slot(bool)
+    def setInstrumentationEnabled(self, enabled):
+        """ Start or stop recording the timing statistics of instrumented code (see
+            core.instrumentation).
+
+          @param bool enabled: record timings
+        """
+        instrumentation.enabled = bool(enabled)
+        logger.info('Instrumentation {0}.'.format('enabled' if enabled else 'disabled'))
+
+    @QtCore.Slot()
+    def resetInstrumentation(self):
+        """ Remove all recorded timing statistics and counters.
+        """
+        instrumentation.reset()
+
+    def dumpInstrumentation(self, path=None):
+        """ Write the recorded timing statistics to a file.
+
+          @param str path: path of the file, .json for all statistics including histograms,
+                           default: instrumentation_<time>.txt in the log directory
+
+          @return str: path of the written file, None if failed
+        """
+        if path is None:
+            path = os.path.join(self._logDir, 'instrumentation_{0}.txt'.format(
+                time.strftime('%Y%m%d-%H%M%S')))
+        try:
+            instrumentation.dump(path)
+        except OSError:
+            logger.exception('Unable to write instrumentation statistics to {0}.'.format(path))
+            return None
+        logger.info('Instrumentation statistics written to {0}.'.format(os.path.abspath(path)))
+        return path
+
     def getStatusDir(self):
         """ Get the directory where the app state is saved, create it if necessary.
 
@@ -1275,21 +1537,82 @@ class Manager(QtCore.QObject):
             os.makedirs(appStatusDir)
         return appStatusDir
 
+    def _setupStatusStore(self):
+        """ Configure the status variable store from the global configuration section.
+        """
+        glob = self.tree['global']
+        self.status_store.array_threshold = int(glob.get('status_array_threshold', 65536))
+        self.status_store.asynchronous = bool(glob.get('status_async_save', True))
+        self.status_store.mmap_arrays = bool(glob.get('status_mmap_arrays', True))
+        interval = float(glob.get('status_checkpoint_interval', 0))
+        if interval > 0:
+            self._statusCheckpointTimer = QtCore.QTimer(self)
+            self._statusCheckpointTimer.timeout.connect(self.checkpointStatusVariables)
+            self._statusCheckpointTimer.start(int(interval * 1000))
+
+    def _setupWorkerPools(self):
+        """ Create the shared worker pools of the modules from the global configuration section.
+        """
+        glob = self.tree['global']
+        for name, kind, key in (('worker-threads', 'thread', 'worker_threads'),
+                                ('worker-processes', 'process', 'worker_processes')):
+            max_workers = glob.get(key, None)
+            if max_workers is not None and int(max_workers) == 0:
+                logger.info('Worker pool {0} is disabled, its jobs run synchronously.'.format(name))
+                continue
+            self.tm.newPool(name, kind, max_workers)
+
+    @QtCore.Slot()
+    def checkpointStatusVariables(self):
+        """ Save the current status variables of all active modules in the background, so they
+            are not lost if Qudi does not shut down properly.
+
+        The status variables are collected in the thread of each module when it returns to its
+        event loop and then saved in a background thread.
+        """
+        for base in ('hardware', 'logic', 'gui'):
+            for name, module in list(self.tree['loaded'][base].items()):
+                if 'remote' in self.tree['defined'][base].get(name, {}):
+                    continue
+                try:
+                    if module.module_state() not in ('idle', 'locked'):
+                        continue
+                    QtCore.QMetaObject.invokeMethod(
+                        module.module_state,
+                        'checkpointStatusVariables',
+                        QtCore.Qt.QueuedConnection,
+                        QtCore.Q_ARG(object, functools.partial(
+                            self.saveStatusVariables, base, name, asynchronous=True)))
+                except:
+                    logger.exception('Failed to collect status variables of module '
+                                     '{0}.{1}.'.format(base, name))
+
+    def _getStatusFile(self, base, module):
+        """ Path of the status variable file of a loaded module.
+
+          @param str base: the module category
+          @param str module: the unique module name
+
+          @return str: path of the status file
+        """
+        statusdir = self.getStatusDir()
+        classname = self.tree['loaded'][base][module].__class__.__name__
+        return os.path.join(statusdir, 'status-{0}_{1}_{2}.cfg'.format(classname, base, module))
+
     @QtCore.Slot(str, str, dict)
-    def saveStatusVariables(self, base, module, variables):
+    def saveStatusVariables(self, base, module, variables, asynchronous=None):
         """ If a module has status variables, save them to a file in the application status directory.
 
           @param str base: the module category
           @param str module: the unique module name
           @param dict variables: a dictionary of status variable names and values
+          @param bool asynchronous: save in a background thread, None for the configured
+                                    default (status_async_save)
         """
         if len(variables) > 0:
             try:
-                statusdir = self.getStatusDir()
-                classname = self.tree['loaded'][base][module].__class__.__name__
-                filename = os.path.join(statusdir,
-                                        'status-{0}_{1}_{2}.cfg'.format(classname, base, module))
-                config.save(filename, variables)
+                filename = self._getStatusFile(base, module)
+                self.status_store.save(filename, variables, asynchronous=asynchronous)
             except:
                 print(variables)
                 logger.exception('Failed to save status variables of module '
@@ -1304,14 +1627,7 @@ class Manager(QtCore.QObject):
           @return dict: dictionary of satus variable names and values
         """
         try:
-            statusdir = self.getStatusDir()
-            classname = self.tree['loaded'][base][module].__class__.__name__
-            filename = os.path.join(
-                statusdir, 'status-{0}_{1}_{2}.cfg'.format(classname, base, module))
-            if os.path.isfile(filename):
-                variables = config.load(filename)
-            else:
-                variables = OrderedDict()
+            variables = self.status_store.load(self._getStatusFile(base, module))
         except:
             logger.exception('Failed to load status variables.')
             variables = OrderedDict()
@@ -1325,8 +1641,7 @@ class Manager(QtCore.QObject):
                 module]['module.Class'].split('.')[-1]
             filename = os.path.join(
                 statusdir, 'status-{0}_{1}_{2}.cfg'.format(classname, base, module))
-            if os.path.isfile(filename):
-                os.remove(filename)
+            self.status_store.remove(filename)
         except:
             logger.exception('Failed to remove module status file.')
 
@@ -1375,6 +1690,13 @@ class Manager(QtCore.QObject):
                 logger.info('Deactivating module {0}.{1}'.format(base, module))
                 self.deactivateModule(base, module)
             QtCore.QCoreApplication.processEvents()
+        if self.rm is not None:
+            self.rm.closeConnections()
+        self.tm.shutdownPools()
+        if self._statusCheckpointTimer is not None:
+            self._statusCheckpointTimer.stop()
+        # write all status files before quitting
+        self.status_store.wait()
         self.sigManagerQuit.emit(self, bool(restart))
 
     @QtCore.Slot(object)
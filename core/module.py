@@ -112,6 +112,23 @@ class ModuleStateMachine(QtCore.QObject, Fysom):
         """
         self.sigStateChanged.emit(e)
 
+    @QtCore.Slot(object)
+    def checkpointStatusVariables(self, callback):
+        """ Collect the current status variables of an active module and pass them to a callback.
+            Invoke this slot with a queued connection, so the status variables are collected in
+            the thread of the module and not while the module changes them.
+
+        @param callable callback: function taking the OrderedDict of status variables
+        """
+        if self.current not in ('idle', 'locked'):
+            return
+        try:
+            variables = self._parent.collectStatusVariables()
+        except:
+            self._parent.log.exception('Failed to collect status variables.')
+            return
+        callback(variables)
+
 
 class BaseMixin(metaclass=ModuleMeta):
     """
@@ -233,14 +250,34 @@ class BaseMixin(metaclass=ModuleMeta):
             raise e
         finally:
             # save status vars even if deactivation failed
-            for vname, var in self._stat_vars.items():
-                if hasattr(self, var.var_name):
-                    value = getattr(self, var.var_name)
-                    if not isinstance(value, StatusVar):
-                        if var.representer_function is None:
-                            self._statusVariables[var.name] = value
-                        else:
-                            self._statusVariables[var.name] = var.representer_function(self, value)
+            self._statusVariables.update(self.__represent_status_vars())
+
+    def __represent_status_vars(self):
+        """ Current values of the status variables as they are saved.
+
+            @return OrderedDict: status variable names and values
+        """
+        variables = OrderedDict()
+        for vname, var in self._stat_vars.items():
+            if hasattr(self, var.var_name):
+                value = getattr(self, var.var_name)
+                if not isinstance(value, StatusVar):
+                    if var.representer_function is None:
+                        variables[var.name] = value
+                    else:
+                        variables[var.name] = var.representer_function(self, value)
+        return variables
+
+    def collectStatusVariables(self):
+        """ Return the status variables of an active module with their current values, e.g. to
+            save a checkpoint while the module is running. Call this in the thread of the module
+            (see ModuleStateMachine.checkpointStatusVariables).
+
+        @return OrderedDict: status variable names and values
+        """
+        variables = OrderedDict(self._statusVariables)
+        variables.update(self.__represent_status_vars())
+        return variables
 
     @property
     def log(self):
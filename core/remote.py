@@ -26,12 +26,24 @@ logger = logging.getLogger(__name__)
 from qtpy.QtCore import QObject
 from urllib.parse import urlparse
 import ssl
+from .instrumentation import instrumentation
 from .util.models import DictTableModel, ListTableModel
+from .util.network import netobtain, execute_requests, is_transportable_array, shared_memory, \
+    HOST_ID, TOKEN_FORMAT, LENGTH_FORMAT, INVALID_TOKEN
 import rpyc
 from rpyc.utils.server import ThreadedServer
 rpyc.core.protocol.DEFAULT_CONFIG['allow_pickle'] = True
+import concurrent.futures
+import contextlib
+import inspect
+import numpy as np
 import os
+import secrets
+import socket
+import struct
 import sys
+import threading
+import weakref
 
 
 class SSLAuthenticator:
@@ -69,10 +81,13 @@ class RemoteObjectManager(QObject):
         self.tm = manager.tm
         self.manager = manager
         self.server = None
+        self.array_server = None
         self.remoteModules = ListTableModel()
         self.remoteModules.headers[0] = 'Remote Modules'
         self.sharedModules = DictTableModel()
         self.sharedModules.headers[0] = 'Shared Modules'
+        # (host, port, certfile, keyfile, cacertsfile) -> RemoteConnectionPool
+        self.connectionPools = dict()
 
     def makeRemoteService(self):
         """ A function that returns a class containing a module list hat can be manipulated from the host.
@@ -82,6 +97,7 @@ class RemoteObjectManager(QObject):
             """
             modules = self.sharedModules
             _manager = self.manager
+            _array_server = self.array_server
 
             @classmethod
             def get_service_name(cls):
@@ -91,14 +107,91 @@ class RemoteObjectManager(QObject):
                 """ code that runs when a connection is created
                     (to init the service, if needed)
                 """
+                self._array_tokens = set()
                 logger.info('Client connected!')
 
             def on_disconnect(self, conn):
                 """ code that runs when the connection has already closed
                     (to finalize the service, if needed)
                 """
+                if self._array_server is not None:
+                    for token in list(self._array_tokens):
+                        self._array_server.release(token)
+                self._array_tokens.clear()
                 logger.info('Client disconnected!')
 
+            def exposed_get_method_names(self, module):
+                """ Names of the public methods of a module, which can be called through any
+                    connection.
+
+                  @param object module: the module
+
+                  @return tuple(str): method names
+                """
+                cls = type(module)
+                return tuple(name for name in dir(cls) if not name.startswith('_')
+                             and inspect.isfunction(getattr(cls, name, None)))
+
+            def exposed_get_array_transport(self):
+                """ Check if numpy arrays can be transferred with the array transport.
+
+                  @return int: port of the array transport, None if arrays can only be passed
+                               through shared memory (raises AttributeError if not available)
+                """
+                if self._array_server is None:
+                    raise AttributeError('Array transport not available.')
+                return self._array_server.port
+
+            def exposed_register_array(self, array, host_id, use_socket=True):
+                """ Register a numpy array for a transfer with the array transport.
+
+                  @param numpy.ndarray array: the array
+                  @param str host_id: HOST_ID of the client computer
+                  @param bool use_socket: the client can receive the array through the array
+                                          transport connection
+
+                  @return tuple: header (token, dtype, shape, shared memory name) to receive the
+                                 array, None if the array can not be transferred this way
+                """
+                if self._array_server is None or not is_transportable_array(array):
+                    return None
+                return self._array_server.register(array, host_id, use_socket,
+                                                   owner=self._array_tokens)
+
+            def exposed_release_array(self, token):
+                """ Free a registered array which will not be transferred any more.
+
+                  @param int token: token of the array
+                """
+                if self._array_server is not None:
+                    self._array_server.release(token)
+
+            def exposed_batch(self, obj, requests, host_id, use_socket=True):
+                """ Execute several attribute reads and method calls in one request.
+
+                  @param object obj: object to execute the requests on
+                  @param tuple requests: requests (name, args or None, kwargs items)
+                  @param str host_id: HOST_ID of the client computer
+                  @param bool use_socket: the client can use the array transport connection
+
+                  @return tuple: one tuple (True, array header) or (False, value) per request
+                """
+                results = list()
+                for value in execute_requests(obj, requests):
+                    header = self.exposed_register_array(value, host_id, use_socket)
+                    if header is None:
+                        results.append((False, value))
+                    else:
+                        results.append((True, header))
+                return tuple(results)
+
+            def exposed_get_instrumentation(self):
+                """ Timing statistics of the instrumented code of this Qudi process.
+
+                  @return dict: statistics, see core.instrumentation.Instrumentation.statistics
+                """
+                return instrumentation.statistics()
+
             def exposed_getModule(self, name):
                 """ Return reference to a module in the shared module list.
 
@@ -123,11 +216,21 @@ class RemoteObjectManager(QObject):
                         return None
         return RemoteModuleService
 
-    def createServer(self, hostname, port, certfile=None, keyfile=None, cacertfile=None):
+    def createServer(self, hostname, port, certfile=None, keyfile=None, cacertfile=None,
+                     array_transport=True, array_port=0):
         """ Start the rpyc modules server on a given port.
 
           @param int port: port where the server should be running
+          @param bool array_transport: serve numpy arrays as raw buffers
+          @param int array_port: port of the array transport, 0 for any free port
         """
+        if array_transport:
+            # plain sockets would bypass the SSL encryption, only use shared memory then
+            self.array_server = ArrayTransportServer(
+                hostname,
+                array_port,
+                serve_socket=(certfile is None or keyfile is None))
+            self.array_server.start()
         thread = self.tm.newThread('rpyc-server')
         if certfile is not None and keyfile is not None:
             self.server = RPyCServer(
@@ -153,6 +256,9 @@ class RemoteObjectManager(QObject):
         if self.server is not None:
             self.server.close()
             self.server = None
+        if self.array_server is not None:
+            self.array_server.close()
+            self.array_server = None
 
     def shareModule(self, name, obj):
         """ Add a module to the list of modules that can be accessed remotely.
@@ -174,22 +280,28 @@ class RemoteObjectManager(QObject):
             logger.error('Module {0} was not shared.'.format(name))
         self.sharedModules.pop(name)
 
-    def getRemoteModuleUrl(self, url, certfile=None, keyfile=None, cacertsfile=None):
+    def getRemoteModuleUrl(self, url, certfile=None, keyfile=None, cacertsfile=None,
+                           cached_methods=None, connections=None):
         """ Get a remote module via its URL.
 
           @param str url: URL pointing to a module hosted b a remote server
           @param str certfile: filename of certificate or None if SSL is not used
           @param str keyfile: filename of key or None if SSL is not used
           @param str cacertsfile: filename of cacerts of None if SSL is not used
+          @param list cached_methods: names of methods whose results are cached locally,
+                                      None for the default (get_constraints)
+          @param int connections: maximum number of connections to the server used at the same
+                                  time, None for the default (4)
 
           @return object: remote module
         """
         parsed = urlparse(url)
         name = parsed.path.replace('/', '')
         return self.getRemoteModule(parsed.hostname, parsed.port, name, certfile, keyfile,
-                                    cacertsfile)
+                                    cacertsfile, cached_methods, connections)
 
-    def getRemoteModule(self, host, port, name, certfile=None, keyfile=None, cacertsfile=None):
+    def getRemoteModule(self, host, port, name, certfile=None, keyfile=None, cacertsfile=None,
+                        cached_methods=None, connections=None):
         """ Get a remote module via its host, port and name.
 
           @param str host: host that the remote module server is running on
@@ -198,14 +310,35 @@ class RemoteObjectManager(QObject):
           @param str certfile: filename of certificate or None if SSL is not used
           @param str keyfile: filename of key or None if SSL is not used
           @param str cacertsfile: filename of cacerts of None if SSL is not used
+          @param list cached_methods: names of methods whose results are cached locally,
+                                      None for the default (get_constraints)
+          @param int connections: maximum number of connections to the server used at the same
+                                  time, None for the default (4)
 
           @return object: remote module
         """
-        module = RemoteModule(host, port, name, certfile=certfile, keyfile=keyfile,
-                              cacertsfile=cacertsfile)
+        key = (host, port, certfile, keyfile, cacertsfile)
+        pool = self.connectionPools.get(key)
+        if pool is None:
+            pool = RemoteConnectionPool(host, port, certfile=certfile, keyfile=keyfile,
+                                        cacertsfile=cacertsfile)
+            self.connectionPools[key] = pool
+        if connections is not None:
+            pool.max_connections = max(pool.max_connections, int(connections))
+        if cached_methods is None:
+            module = RemoteModule(pool, name)
+        else:
+            module = RemoteModule(pool, name, cached_methods=cached_methods)
         self.remoteModules.append(module)
         return module.module
 
+    def closeConnections(self):
+        """ Close the connections to all remote module servers.
+        """
+        for pool in self.connectionPools.values():
+            pool.close()
+        self.connectionPools.clear()
+
 
 class RPyCServer(QObject):
     """ Contains a RPyC server that serves modules to remote computers. Runs in a QThread.
@@ -252,10 +385,181 @@ class RPyCServer(QObject):
         self.server.start()
 
 
-class RemoteModule:
-    """ This class represents a module on a remote computer and holds a reference to it.
+class ArrayTransportServer:
+    """ Serves numpy arrays registered through the module server as raw buffers, either through a
+        plain TCP socket or through shared memory if the client runs on the same computer.
+        See core.util.network.ArrayTransportClient for the client side.
     """
-    def __init__(self, host, port, name, certfile=None, keyfile=None, cacertsfile=None):
+    max_free_blocks = 4
+
+    def __init__(self, host, port=0, serve_socket=True):
+        """
+          @param str host: interface to listen on
+          @param int port: port to listen on, 0 for any free port
+          @param bool serve_socket: accept connections, otherwise only use shared memory
+        """
+        self.host = host
+        self._requested_port = port
+        self.serve_socket = serve_socket
+        self.port = None
+        self._socket = None
+        # token -> (array, shared memory block, token set of the owning connection)
+        self._arrays = dict()
+        # released shared memory blocks kept for reuse, creating a new one is expensive
+        self._free_blocks = list()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """ Start listening for array transport connections.
+        """
+        if not self.serve_socket:
+            return
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self._requested_port))
+        self._socket.listen(5)
+        self.port = self._socket.getsockname()[1]
+        threading.Thread(target=self._accept, name='array-transport', daemon=True).start()
+        logger.info('Started array transport at {0} on port {1}'.format(self.host, self.port))
+
+    def close(self):
+        """ Stop listening and free all registered arrays.
+        """
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except OSError:
+                pass
+            self._socket = None
+        with self._lock:
+            tokens = list(self._arrays)
+        for token in tokens:
+            self.release(token)
+        with self._lock:
+            blocks = self._free_blocks
+            self._free_blocks = list()
+        for block in blocks:
+            self._destroy_block(block)
+
+    def register(self, array, host_id, use_socket=True, owner=None):
+        """ Register an array for transfer.
+
+          @param numpy.ndarray array: the array
+          @param str host_id: HOST_ID of the client computer
+          @param bool use_socket: the client can receive the array through a socket connection
+          @param set owner: optional, token set of the client connection. The token is added to
+                            it and removed again when the array is served or released.
+
+          @return tuple: header (token, dtype, shape, shared memory name), None if the array can
+                         not be transferred to this client
+        """
+        array = np.ascontiguousarray(array)
+        header = (array.dtype.str, array.shape)
+        block = None
+        if host_id == HOST_ID and shared_memory is not None and array.nbytes > 0:
+            block = self._get_block(array.nbytes)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            array = None
+        elif not (use_socket and self._socket is not None):
+            return None
+        with self._lock:
+            # The array transport port is not authenticated, so tokens must not be guessable
+            token = secrets.randbits(64)
+            while token == 0 or token in self._arrays:
+                token = secrets.randbits(64)
+            self._arrays[token] = (array, block, owner)
+            if owner is not None:
+                owner.add(token)
+        return (token,) + header + (None if block is None else block.name,)
+
+    def release(self, token):
+        """ Free a registered array.
+
+          @param int token: token of the array
+        """
+        with self._lock:
+            array, block, owner = self._arrays.pop(token, (None, None, None))
+            if owner is not None:
+                owner.discard(token)
+            if block is not None and len(self._free_blocks) < self.max_free_blocks:
+                self._free_blocks.append(block)
+                block = None
+        if block is not None:
+            self._destroy_block(block)
+
+    def _get_block(self, size):
+        """ Get a shared memory block of at least the given size, reuse a free one if possible. """
+        with self._lock:
+            for ii, block in enumerate(self._free_blocks):
+                if size <= block.size <= 2 * size:
+                    return self._free_blocks.pop(ii)
+        return shared_memory.SharedMemory(create=True, size=size)
+
+    @staticmethod
+    def _destroy_block(block):
+        block.close()
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _accept(self):
+        while self._socket is not None:
+            try:
+                connection, address = self._socket.accept()
+            except OSError:
+                break
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._serve, args=(connection,), name='array-transport',
+                             daemon=True).start()
+
+    def _serve(self, connection):
+        token_size = struct.calcsize(TOKEN_FORMAT)
+        try:
+            while True:
+                request = b''
+                while len(request) < token_size:
+                    data = connection.recv(token_size - len(request))
+                    if not data:
+                        return
+                    request += data
+                token = struct.unpack(TOKEN_FORMAT, request)[0]
+                with self._lock:
+                    # arrays in shared memory are not served through the socket
+                    array, block, owner = self._arrays.get(token, (None, None, None))
+                    if array is not None:
+                        del self._arrays[token]
+                        if owner is not None:
+                            owner.discard(token)
+                if array is None:
+                    connection.sendall(struct.pack(LENGTH_FORMAT, INVALID_TOKEN))
+                    continue
+                connection.sendall(struct.pack(LENGTH_FORMAT, array.nbytes))
+                if array.nbytes > 0:
+                    connection.sendall(memoryview(array).cast('B'))
+        except OSError:
+            pass
+        finally:
+            connection.close()
+
+
+class RemoteConnectionPool:
+    """ Pool of rpyc connections to a module server, shared by all modules obtained from it.
+
+    Requests on one rpyc connection are processed one after the other by the server, so each
+    thread calling remote methods at the same time gets its own connection from the pool (up to
+    max_connections). Broken connections are replaced on their next use.
+    """
+    def __init__(self, host, port, certfile=None, keyfile=None, cacertsfile=None,
+                 max_connections=4):
+        """
+          @param str host: host that the remote module server is running on
+          @param int port: port that the remote module server is listening on
+          @param str certfile: filename of certificate or None if SSL is not used
+          @param str keyfile: filename of key or None if SSL is not used
+          @param str cacertsfile: filename of cacerts of None if SSL is not used
+          @param int max_connections: maximum number of connections used at the same time
+        """
         if certfile is not None and keyfile is not None:
             if not os.path.exists(certfile):
                 raise Exception('SSL certificate {0} does not exist.'.format(certfile))
@@ -263,15 +567,294 @@ class RemoteModule:
                 raise Exception('SSL private key file {0} does not exist.'.format(keyfile))
             if (cacertsfile is not None) and (not os.path.exists(cacertsfile)):
                 logger.warning('SSL CA certificates file {0} does not exist.'.format(cacertsfile))
-            self.connection = rpyc.ssl_connect(
-                host,
-                port=port,
+        self.host = host
+        self.port = port
+        self.certfile = certfile
+        self.keyfile = keyfile
+        self.cacertsfile = cacertsfile
+        self.max_connections = max(1, int(max_connections))
+        self._idle = list()
+        self._count = 0
+        self._condition = threading.Condition()
+        self._shared = None
+        self._shared_lock = threading.Lock()
+        self._executor = None
+        self._closed = False
+
+    def connect(self):
+        """ Open a new connection to the module server (not managed by the pool).
+
+          @return rpyc.Connection: the connection
+        """
+        if self.certfile is not None and self.keyfile is not None:
+            return rpyc.ssl_connect(
+                self.host,
+                port=self.port,
                 config={'allow_all_attrs': True},
-                certfile=certfile,
-                keyfile=keyfile,
-                ca_certs=cacertsfile,
+                certfile=self.certfile,
+                keyfile=self.keyfile,
+                ca_certs=self.cacertsfile,
                 cert_reqs=ssl.CERT_REQUIRED)
         else:
-            self.connection = rpyc.connect(host, port, config={'allow_all_attrs': True})
-        self.module = self.connection.root.getModule(name)
+            return rpyc.connect(self.host, self.port, config={'allow_all_attrs': True})
+
+    def shared_connection(self):
+        """ Connection used by all threads for attribute access, reconnected if it was closed.
+
+          @return rpyc.Connection: the connection
+        """
+        with self._shared_lock:
+            if self._shared is None or self._shared.closed:
+                self._shared = self.connect()
+            return self._shared
+
+    @contextlib.contextmanager
+    def connection(self):
+        """ Context manager borrowing a connection for exclusive use by the calling thread.
+            Waits if max_connections connections are in use already.
+        """
+        with self._condition:
+            while True:
+                while self._idle:
+                    conn = self._idle.pop()
+                    if not conn.closed:
+                        break
+                    self._count -= 1
+                else:
+                    if self._count < self.max_connections:
+                        self._count += 1
+                        conn = None
+                    else:
+                        self._condition.wait()
+                        continue
+                break
+        try:
+            if conn is None:
+                conn = self.connect()
+        except Exception:
+            self._drop(None)
+            raise
+        try:
+            yield conn
+        except (EOFError, OSError):
+            # connection lost, do not reuse it
+            self._drop(conn)
+            raise
+        except Exception:
+            self._release(conn)
+            raise
+        else:
+            self._release(conn)
+
+    def _release(self, conn):
+        if self._closed:
+            self._drop(conn)
+            return
+        with self._condition:
+            self._idle.append(conn)
+            self._condition.notify()
+
+    def _drop(self, conn):
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        with self._condition:
+            self._count -= 1
+            self._condition.notify()
+
+    def get_instrumentation(self):
+        """ Timing statistics of the instrumented code of the Qudi process serving the modules.
+
+          @return dict: statistics, see core.instrumentation.Instrumentation.statistics
+        """
+        with self.connection() as conn:
+            return netobtain(conn.root.get_instrumentation())
+
+    def submit(self, function, *args, **kwargs):
+        """ Run a function in a worker thread of the pool.
+
+          @return concurrent.futures.Future: future of the result
+        """
+        with self._condition:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_connections)
+        return self._executor.submit(function, *args, **kwargs)
+
+    def close(self):
+        """ Close all connections. Borrowed connections are closed when they are returned.
+        """
+        self._closed = True
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        with self._condition:
+            idle = self._idle
+            self._idle = list()
+        for conn in idle:
+            self._drop(conn)
+        with self._shared_lock:
+            if self._shared is not None:
+                self._shared.close()
+                self._shared = None
+
+
+class RemoteModule:
+    """ This class represents a module on a remote computer and holds a reference to it.
+
+    The reference (RemoteModule.module) is a RemoteModuleProxy: Attributes are accessed through a
+    connection shared with all other modules of the same server, but methods of the module are
+    called through the connection pool, so calls from different threads do not wait for each
+    other. Methods can also be called asynchronously (see RemoteMethod.call_async) and the results
+    of methods listed in cached_methods (e.g. get_constraints) are copied and cached locally.
+    """
+    def __init__(self, pool, name, cached_methods=('get_constraints',)):
+        """
+          @param RemoteConnectionPool pool: connection pool of the module server
+          @param str name: unique name of the remote module
+          @param list cached_methods: names of methods returning constant values
+        """
+        self.pool = pool
         self.name = name
+        self.cached_methods = frozenset(cached_methods)
+        # rpyc connection -> reference to the module obtained through that connection
+        self._modules = weakref.WeakKeyDictionary()
+        self._modules_lock = threading.Lock()
+        self._cache = dict()
+        self._cache_lock = threading.Lock()
+        module = self.get_module(self.pool.shared_connection())
+        try:
+            self.method_names = frozenset(
+                self.pool.shared_connection().root.get_method_names(module))
+        except AttributeError:
+            # server of an older Qudi version, everything goes through the shared connection
+            self.method_names = frozenset()
+        self.module = RemoteModuleProxy(self)
+
+    @property
+    def connection(self):
+        return self.pool.shared_connection()
+
+    def get_module(self, conn):
+        """ Reference to the module obtained through a connection.
+
+          @param rpyc.Connection conn: connection to the module server
+
+          @return netref: the module
+        """
+        with self._modules_lock:
+            module = self._modules.get(conn)
+            if module is None:
+                module = conn.root.getModule(self.name)
+                if module is None:
+                    raise Exception('Module {0} is not shared by rpyc://{1}:{2}.'.format(
+                        self.name, self.pool.host, self.pool.port))
+                self._modules[conn] = module
+            return module
+
+    def call(self, name, *args, **kwargs):
+        """ Call a method of the remote module.
+
+          @param str name: name of the method
+
+          @return: return value of the method
+        """
+        if name not in self.cached_methods:
+            return self._call(name, args, kwargs)
+        key = (name, args, tuple(sorted(kwargs.items())))
+        try:
+            with self._cache_lock:
+                return self._cache[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # unhashable arguments
+            return self._call(name, args, kwargs)
+        value = self._call(name, args, kwargs)
+        try:
+            value = netobtain(value)
+        except Exception:
+            # can not be copied, do not cache a reference which may become invalid
+            return value
+        with self._cache_lock:
+            self._cache[key] = value
+        return value
+
+    def _call(self, name, args, kwargs):
+        with self.pool.connection() as conn:
+            return getattr(self.get_module(conn), name)(*args, **kwargs)
+
+    def call_async(self, name, *args, **kwargs):
+        """ Call a method of the remote module in a worker thread.
+
+          @param str name: name of the method
+
+          @return concurrent.futures.Future: future of the return value
+        """
+        return self.pool.submit(self.call, name, *args, **kwargs)
+
+    def clear_cache(self):
+        """ Forget the cached results of the methods in cached_methods.
+        """
+        with self._cache_lock:
+            self._cache.clear()
+
+
+class RemoteMethod:
+    """ A method of a remote module, see RemoteModule.
+    """
+    __slots__ = ('_remote_module', '_name')
+
+    def __init__(self, remote_module, name):
+        self._remote_module = remote_module
+        self._name = name
+
+    def __call__(self, *args, **kwargs):
+        return self._remote_module.call(self._name, *args, **kwargs)
+
+    def call_async(self, *args, **kwargs):
+        """ Call the method in a worker thread.
+
+          @return concurrent.futures.Future: future of the return value
+        """
+        return self._remote_module.call_async(self._name, *args, **kwargs)
+
+    def __repr__(self):
+        return '<remote method {0}.{1}>'.format(self._remote_module.name, self._name)
+
+
+class RemoteModuleProxy:
+    """ Local stand-in for a module on a remote computer, see RemoteModule.
+    """
+    def __init__(self, remote_module):
+        object.__setattr__(self, '_remote_module', remote_module)
+
+    def _shared_module(self):
+        remote_module = object.__getattribute__(self, '_remote_module')
+        return remote_module.get_module(remote_module.pool.shared_connection())
+
+    @property
+    def __class__(self):
+        # class of the remote module, used by the connectors to check the interfaces
+        return self._shared_module().__class__
+
+    def __getattr__(self, name):
+        remote_module = object.__getattribute__(self, '_remote_module')
+        if name in remote_module.method_names:
+            return RemoteMethod(remote_module, name)
+        return getattr(self._shared_module(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._shared_module(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._shared_module(), name)
+
+    def __dir__(self):
+        return dir(self._shared_module())
+
+    def __repr__(self):
+        remote_module = object.__getattribute__(self, '_remote_module')
+        return '<remote module {0} at rpyc://{1}:{2}>'.format(
+            remote_module.name, remote_module.pool.host, remote_module.pool.port)
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the Qudi store for the status variables of modules.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import concurrent.futures
+import hashlib
+import logging
+import os
+import re
+import shutil
+import threading
+import numpy as np
+
+from collections import OrderedDict
+from . import config
+
+logger = logging.getLogger(__name__)
+
+
+class StatusStore:
+    """
+    Saves and loads the status variables of modules.
+
+    Each status file is a YAML file (see core.config) holding scalars, strings, small arrays etc.
+    Arrays of at least array_threshold bytes are saved uncompressed as .npy files in the directory
+    <status file>.arrays next to it and referenced with the tag !npy. The name of such a file
+    contains a hash of the array content, so unchanged arrays are not written again and a file
+    that is memory-mapped by a module is never overwritten. On loading, these arrays are
+    memory-mapped copy-on-write, so only the parts that are used are read from disk.
+
+    Saving can run in a background thread. The variables are copied when the save is requested,
+    so the module can continue to change them. Saves are executed one after the other, a save
+    request is skipped if a newer one for the same file is waiting. Loading a status file waits
+    for pending saves of the same file.
+    """
+
+    def __init__(self, array_threshold=65536, asynchronous=True, mmap_arrays=True):
+        """
+        @param int array_threshold: minimum size in bytes of arrays saved in .npy files
+        @param bool asynchronous: save in a background thread by default
+        @param bool mmap_arrays: memory-map arrays from .npy files on loading
+        """
+        self.array_threshold = int(array_threshold)
+        self.asynchronous = bool(asynchronous)
+        self.mmap_arrays = bool(mmap_arrays)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._lock = threading.Lock()
+        # filename -> future of the latest save request
+        self._pending = dict()
+        # filename -> number of the latest save request, older requests are skipped
+        self._generation = dict()
+
+    @staticmethod
+    def array_directory(filename):
+        """ Directory of the .npy files belonging to a status file. """
+        return '{0}.arrays'.format(os.path.splitext(filename)[0])
+
+    def save(self, filename, variables, asynchronous=None):
+        """ Save status variables to a file.
+
+        @param str filename: path of the status file
+        @param dict variables: status variable names and values
+        @param bool asynchronous: save in the background thread, None for the default
+
+        @return concurrent.futures.Future: future which is done when the file is written
+        """
+        if asynchronous is None:
+            asynchronous = self.asynchronous
+        snapshot = self._copy(variables)
+        with self._lock:
+            generation = self._generation.get(filename, 0) + 1
+            self._generation[filename] = generation
+            future = self._executor.submit(self._save, filename, snapshot, generation)
+            self._pending[filename] = future
+        future.add_done_callback(lambda f: self._done(filename, f))
+        if not asynchronous:
+            future.result()
+        return future
+
+    def _done(self, filename, future):
+        with self._lock:
+            if self._pending.get(filename) is future:
+                del self._pending[filename]
+
+    def load(self, filename):
+        """ Load status variables from a file.
+
+        @param str filename: path of the status file
+
+        @return OrderedDict: status variable names and values, empty if the file does not exist
+        """
+        self.wait(filename)
+        if not os.path.isfile(filename):
+            return OrderedDict()
+        return config.load(filename, mmap_arrays=self.mmap_arrays)
+
+    def remove(self, filename):
+        """ Remove a status file and its array files.
+
+        @param str filename: path of the status file
+        """
+        self.wait(filename)
+        if os.path.isfile(filename):
+            os.remove(filename)
+        shutil.rmtree(self.array_directory(filename), ignore_errors=True)
+
+    def wait(self, filename=None):
+        """ Wait until pending saves are finished.
+
+        @param str filename: only wait for this status file, None for all
+        """
+        with self._lock:
+            if filename is None:
+                futures = list(self._pending.values())
+            else:
+                futures = [self._pending[filename]] if filename in self._pending else []
+        concurrent.futures.wait(futures)
+
+    def _copy(self, value):
+        """ Copy containers and arrays, so the module can change them during a background save.
+        """
+        if isinstance(value, np.ndarray):
+            return value.copy()
+        elif isinstance(value, OrderedDict):
+            return OrderedDict((k, self._copy(v)) for k, v in value.items())
+        elif isinstance(value, dict):
+            return {k: self._copy(v) for k, v in value.items()}
+        elif isinstance(value, list):
+            return [self._copy(v) for v in value]
+        elif isinstance(value, tuple):
+            return tuple(self._copy(v) for v in value)
+        return value
+
+    def _save(self, filename, variables, generation):
+        with self._lock:
+            if self._generation.get(filename) != generation:
+                # a newer save request of the same file is waiting
+                return
+        try:
+            array_dir = self.array_directory(filename)
+            used_files = set()
+            data = self._externalize(variables, array_dir, '', used_files)
+            tmp_filename = '{0}.tmp'.format(filename)
+            config.save(tmp_filename, data, inline_arrays=True)
+            os.replace(tmp_filename, filename)
+            # remove array files of older versions
+            if os.path.isdir(array_dir):
+                for name in os.listdir(array_dir):
+                    if name not in used_files:
+                        try:
+                            os.remove(os.path.join(array_dir, name))
+                        except OSError:
+                            # still memory-mapped on Windows, removed next time
+                            pass
+        except:
+            logger.exception('Failed to save status variables to {0}:\n{1}'.format(
+                filename, repr(variables)))
+
+    def _externalize(self, value, array_dir, key, used_files):
+        """ Replace large arrays by references to .npy files, which are written if necessary.
+        """
+        if isinstance(value, np.ndarray):
+            if value.nbytes < self.array_threshold or value.dtype.hasobject:
+                return value
+            value = np.ascontiguousarray(value)
+            digest = hashlib.blake2b(digest_size=12)
+            digest.update('{0}{1}'.format(value.dtype.str, value.shape).encode())
+            digest.update(memoryview(value).cast('B') if value.nbytes > 0 else b'')
+            name = '{0}.{1}.npy'.format(re.sub(r'[^\w.-]', '_', key), digest.hexdigest())
+            path = os.path.join(array_dir, name)
+            if not os.path.isfile(path):
+                os.makedirs(array_dir, exist_ok=True)
+                tmp_path = '{0}.tmp'.format(path)
+                np.save(tmp_path, value, allow_pickle=False)
+                os.replace('{0}.npy'.format(tmp_path), path)
+            used_files.add(name)
+            return config.NpyFile(os.path.join(os.path.basename(array_dir), name))
+        elif isinstance(value, dict):
+            items = ((k, self._externalize(v, array_dir, self._key(key, k), used_files))
+                     for k, v in value.items())
+            return OrderedDict(items) if isinstance(value, OrderedDict) else dict(items)
+        elif isinstance(value, list):
+            return [self._externalize(v, array_dir, self._key(key, i), used_files)
+                    for i, v in enumerate(value)]
+        elif isinstance(value, tuple):
+            return tuple(self._externalize(v, array_dir, self._key(key, i), used_files)
+                         for i, v in enumerate(value))
+        return value
+
+    @staticmethod
+    def _key(parent, child):
+        return str(child) if not parent else '{0}.{1}'.format(parent, child)
@@ -20,7 +20,12 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 
+import concurrent.futures
 import logging
+import multiprocessing
+import os
+import threading
+import time
 logger = logging.getLogger(__name__)
 from qtpy import QtCore
 from collections import OrderedDict
@@ -29,6 +34,9 @@ from .util.mutex import Mutex
 
 class ThreadManager(QtCore.QAbstractTableModel):
     """ This class keeps track of all the QThreads that are needed somewhere.
+
+    It also holds the worker pools (see WorkerPool) for CPU-bound jobs of the modules, listed in the
+    table model ThreadManager.pools.
     """
     def __init__(self):
         super().__init__()
@@ -36,6 +44,45 @@ class ThreadManager(QtCore.QAbstractTableModel):
         self.lock = Mutex()
         self.headers = ['Name', 'Thread']
         self.thread = QtCore.QThread.currentThread()
+        self.pools = WorkerPoolModel()
+
+    def newPool(self, name, kind='thread', max_workers=None):
+        """ Create a new worker pool with a name.
+
+          @param str name: unique name of the pool
+          @param str kind: 'thread' or 'process'
+          @param int max_workers: number of workers, None for the number of CPU cores
+
+          @return WorkerPool: new pool, None if failed
+        """
+        if self.pools.getPool(name) is not None:
+            logger.error('Worker pool {0} already exists.'.format(name))
+            return None
+        try:
+            pool = WorkerPool(name, kind=kind, max_workers=max_workers)
+        except ValueError as e:
+            logger.error('Could not create worker pool {0}: {1}'.format(name, e))
+            return None
+        logger.debug('Creating worker pool: "{0}" with {1} {2} workers.'.format(
+            name, pool.max_workers, kind))
+        self.pools.addPool(pool)
+        return pool
+
+    def getPool(self, name):
+        """ Get a worker pool by name.
+
+          @param str name: unique name of the pool
+
+          @return WorkerPool: the pool, None if there is no pool with this name
+        """
+        return self.pools.getPool(name)
+
+    def shutdownPools(self):
+        """ Cancel the waiting jobs of all worker pools and stop their workers.
+        """
+        logger.debug('Shutting down all worker pools.')
+        for pool in self.pools.allPools():
+            pool.shutdown()
 
     def newThread(self, name):
         """ Create a new thread with a name, return its object
@@ -220,3 +267,348 @@ class ThreadItem(QtCore.QObject):
         logger.debug('Thread {0} has quit.'.format(self.name))
 
 
+class WorkerJob(QtCore.QObject):
+    """ A job submitted to a WorkerPool.
+
+      @signal object sigFinished: sent with the return value when the job has finished
+      @signal object sigFailed: sent with the exception if the job raised one or was cancelled
+
+    The signals are sent from the thread which submitted the job (it needs a running Qt event
+    loop, like the threads of the modules), when control returns to its event loop. So they can
+    be connected after submitting the job without missing the result.
+    """
+    sigFinished = QtCore.Signal(object)
+    sigFailed = QtCore.Signal(object)
+    _sigDone = QtCore.Signal()
+
+    def __init__(self, future, name=''):
+        """ Create a WorkerJob object
+
+          @param concurrent.futures.Future future: future of the job
+          @param str name: name of the job for log messages
+        """
+        super().__init__()
+        self.future = future
+        self.name = name
+        # keeps the job alive until its signals are sent
+        self._self_reference = self
+        self._sigDone.connect(self._emitResult, QtCore.Qt.QueuedConnection)
+
+    def cancel(self):
+        """ Cancel the job if it has not started yet.
+
+          @return bool: True if the job was cancelled
+        """
+        return self.future.cancel()
+
+    def done(self):
+        """ Check if the job has finished, failed or was cancelled.
+
+          @return bool: job is done
+        """
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """ Wait for the result of the job.
+
+          @param float timeout: maximum time to wait in s, None for no limit
+
+          @return object: return value of the job
+        """
+        return self.future.result(timeout)
+
+    @classmethod
+    def runSynchronously(cls, function, *args, **kwargs):
+        """ Execute a function immediately in the calling thread and wrap the result in a job.
+
+          @param callable function: function to execute
+          @param args: positional arguments of the function
+          @param kwargs: keyword arguments of the function
+
+          @return WorkerJob: finished job, its signals are sent when control returns to the event
+                             loop of the calling thread
+        """
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(function(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        job = cls(future, name=getattr(function, '__qualname__', repr(function)))
+        job._futureDone(future)
+        return job
+
+    def _futureDone(self, future):
+        """ Done callback of the future, called in the worker (or pool management) thread.
+        """
+        self._sigDone.emit()
+
+    @QtCore.Slot()
+    def _emitResult(self):
+        """ Send the result signals in the thread of the job.
+        """
+        self._self_reference = None
+        future = self.future
+        if future.cancelled():
+            self.sigFailed.emit(concurrent.futures.CancelledError(
+                'Job {0} has been cancelled.'.format(self.name)))
+            return
+        error = future.exception()
+        if error is None:
+            self.sigFinished.emit(future.result())
+        else:
+            logger.error('Job {0} failed: {1!r}'.format(self.name, error))
+            self.sigFailed.emit(error)
+
+
+class WorkerPool:
+    """ A pool of worker threads or processes executing jobs of the modules.
+
+    Thread pools suit numpy-heavy jobs, since numpy releases the GIL for most operations. Process
+    pools run pure python code in parallel, but the function and its arguments have to be
+    picklable (e.g. a function defined on module level of a python file) and the arguments are
+    copied to the worker process. The processes are started on the first submitted job.
+
+    The pool counts its jobs to show the queue depth and utilization in the thread widget.
+    """
+
+    kinds = ('thread', 'process')
+
+    def __init__(self, name, kind='thread', max_workers=None):
+        """
+          @param str name: unique name of the pool
+          @param str kind: 'thread' or 'process'
+          @param int max_workers: number of workers, None for the number of CPU cores
+        """
+        if kind not in self.kinds:
+            raise ValueError('Unknown kind of worker pool "{0}", use one of {1}.'.format(
+                kind, self.kinds))
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        if int(max_workers) < 1:
+            raise ValueError('A worker pool needs at least one worker.')
+        self.name = name
+        self.kind = kind
+        self.max_workers = int(max_workers)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._shutdown = False
+        self._futures = set()
+        self.completed = 0
+        self.failed = 0
+        # integral of the number of busy workers over time, for the utilization
+        self._busy_time = 0.0
+        self._last_change = time.monotonic()
+        self._window = (self._last_change, 0.0)
+
+    def submit(self, function, *args, **kwargs):
+        """ Execute a function in a worker of the pool.
+
+          @param callable function: function to execute
+          @param args: positional arguments of the function
+          @param kwargs: keyword arguments of the function
+
+          @return WorkerJob: job with the signals sigFinished and sigFailed
+        """
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('Worker pool {0} has been shut down.'.format(self.name))
+            if self._executor is None:
+                if self.kind == 'process':
+                    # spawn instead of fork: a forked child inherits the locks of the other
+                    # threads of this process (Qt, rpyc, logging) and may deadlock on them
+                    self._executor = concurrent.futures.ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context('spawn'))
+                else:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=self.name)
+            future = self._executor.submit(function, *args, **kwargs)
+            self._updateBusyTime()
+            self._futures.add(future)
+        job = WorkerJob(future, name='{0}/{1}'.format(
+            self.name, getattr(function, '__qualname__', repr(function))))
+        future.add_done_callback(job._futureDone)
+        future.add_done_callback(self._jobDone)
+        return job
+
+    def _jobDone(self, future):
+        with self._lock:
+            self._updateBusyTime()
+            self._futures.discard(future)
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    def _updateBusyTime(self):
+        """ Add the busy time since the last change of the unfinished jobs. Call with lock held.
+        """
+        now = time.monotonic()
+        self._busy_time += min(len(self._futures), self.max_workers) * (now - self._last_change)
+        self._last_change = now
+
+    def statistics(self):
+        """ Current state of the pool.
+
+          @return dict: 'queued' (waiting jobs), 'running' (busy workers), 'completed' and 'failed'
+                        (number of jobs) and 'utilization' (busy fraction of the workers since the
+                        previous call of this method)
+        """
+        with self._lock:
+            self._updateBusyTime()
+            pending = len(self._futures)
+            now = self._last_change
+            start, busy_at_start = self._window
+            self._window = (now, self._busy_time)
+            elapsed = now - start
+            utilization = 0.0
+            if elapsed > 0:
+                utilization = (self._busy_time - busy_at_start) / (elapsed * self.max_workers)
+            return {'queued': max(0, pending - self.max_workers),
+                    'running': min(pending, self.max_workers),
+                    'completed': self.completed,
+                    'failed': self.failed,
+                    'utilization': utilization}
+
+    def shutdown(self, wait=False):
+        """ Cancel the waiting jobs and stop the workers.
+
+          @param bool wait: wait until the running jobs have finished
+        """
+        with self._lock:
+            self._shutdown = True
+            executor, self._executor = self._executor, None
+            futures = list(self._futures)
+        for future in futures:
+            future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+class WorkerPoolModel(QtCore.QAbstractTableModel):
+    """ Table model of the worker pools of the ThreadManager.
+
+    The statistics are updated by calling refresh, e.g. from a timer of the GUI.
+    """
+    headers = ['Name', 'Type', 'Workers', 'Running', 'Queued', 'Utilization', 'Completed',
+               'Failed']
+
+    def __init__(self):
+        super().__init__()
+        self._pools = OrderedDict()
+        self._statistics = dict()
+        self.lock = Mutex()
+
+    def addPool(self, pool):
+        """ Add a worker pool to the model.
+
+          @param WorkerPool pool: the pool
+        """
+        with self.lock:
+            row = len(self._pools)
+            self.beginInsertRows(QtCore.QModelIndex(), row, row)
+            self._pools[pool.name] = pool
+            self._statistics[pool.name] = pool.statistics()
+            self.endInsertRows()
+
+    def getPool(self, name):
+        """ Get a worker pool by name.
+
+          @param str name: unique name of the pool
+
+          @return WorkerPool: the pool, None if there is no pool with this name
+        """
+        return self._pools.get(name)
+
+    def allPools(self):
+        """ Get all worker pools.
+
+          @return list(WorkerPool): the pools
+        """
+        with self.lock:
+            return list(self._pools.values())
+
+    @QtCore.Slot()
+    def refresh(self):
+        """ Update the statistics of all pools.
+        """
+        with self.lock:
+            for name, pool in self._pools.items():
+                self._statistics[name] = pool.statistics()
+        if len(self._pools) > 0:
+            self.dataChanged.emit(self.index(0, 3),
+                                  self.index(len(self._pools) - 1, len(self.headers) - 1))
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        """ Gives the number of worker pools.
+
+          @return int: number of pools
+        """
+        return len(self._pools)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        """ Gives the number of data fields of a pool.
+
+          @return int: number of pool data fields
+        """
+        return len(self.headers)
+
+    def flags(self, index):
+        """ Determines what can be done with entry cells in the table view.
+
+          @param QModelIndex index: cell fo which the flags are requested
+
+          @return Qt.ItemFlags: actions allowed for this cell
+        """
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+
+    def data(self, index, role):
+        """ Get data from model for a given cell.
+
+          @param QModelIndex index: cell for which data is requested
+          @param ItemDataRole role: role for which data is requested
+
+          @return QVariant: data for given cell and role
+        """
+        if not index.isValid() or role != QtCore.Qt.DisplayRole:
+            return None
+        with self.lock:
+            if not 0 <= index.row() < len(self._pools):
+                return None
+            pool = list(self._pools.values())[index.row()]
+            statistics = self._statistics[pool.name]
+        column = index.column()
+        if column == 0:
+            return pool.name
+        elif column == 1:
+            return pool.kind
+        elif column == 2:
+            return pool.max_workers
+        elif column == 3:
+            return statistics['running']
+        elif column == 4:
+            return statistics['queued']
+        elif column == 5:
+            return '{0:.0f} %'.format(100 * statistics['utilization'])
+        elif column == 6:
+            return statistics['completed']
+        elif column == 7:
+            return statistics['failed']
+        return None
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        """ Data for the table view headers.
+
+          @param int section: number of the column to get header data for
+          @param Qt.Orientation: orientation of header (horizontal or vertical)
+          @param ItemDataRole: role for which to get data
+
+          @return QVariant: header data for given column and role
+        """
+        if role != QtCore.Qt.DisplayRole or orientation != QtCore.Qt.Horizontal:
+            return None
+        if not 0 <= section < len(self.headers):
+            return None
+        return self.headers[section]
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a Levenberg-Marquardt least squares fitter for Qudi, which fits an lmfit model
+to many data traces sharing the same x axis at once.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import numpy as np
+from asteval import Interpreter
+
+
+class BatchModelFitter:
+    """
+    Fits an lmfit model to a stack of 1D traces with a Levenberg-Marquardt algorithm that is
+    vectorized over all traces.
+
+    The model is evaluated for all traces in one call by passing the parameters as arrays of shape
+    (n, 1). This works for all models whose functions broadcast like numpy ufuncs, e.g. the models
+    built in logic/fitmethods (use BatchModelFitter.supports to check a model).
+    Parameter bounds are respected by clipping each step to the bounds. Parameters with constraint
+    expressions are evaluated for all traces at once. Parameter uncertainties are estimated from
+    the covariance matrix scaled with the reduced chi-square (like lmfit does by default).
+    """
+
+    def __init__(self, model, x_axis, max_iterations=200, ftol=1e-10):
+        """
+        @param lmfit.Model model: the model to fit
+        @param numpy.ndarray x_axis: 1D x axis shared by all traces
+        @param int max_iterations: maximum number of Levenberg-Marquardt iterations
+        @param float ftol: relative change in chi-square below which a fit is converged
+        """
+        self.model = model
+        self.x_axis = np.asarray(x_axis, dtype=float)
+        self.max_iterations = int(max_iterations)
+        self.ftol = float(ftol)
+
+    @staticmethod
+    def supports(model, params, x_axis):
+        """ Check if a model can be evaluated for several parameter sets at once.
+
+        @param lmfit.Model model: the model to check
+        @param lmfit.Parameters params: parameters of the model
+        @param numpy.ndarray x_axis: 1D x axis
+
+        @return bool: True if the model broadcasts over parameter arrays of shape (n, 1)
+        """
+        x_axis = np.asarray(x_axis, dtype=float)
+        values = dict()
+        for name in model.param_names:
+            value = params[name].value if name in params else 1.0
+            if value is None or not np.isfinite(value):
+                value = 1.0
+            values[name] = np.array([[value], [value]], dtype=float)
+        try:
+            with np.errstate(all='ignore'):
+                result = np.asarray(model.eval(x=x_axis, **values))
+        except Exception:
+            return False
+        return result.shape == (2, x_axis.size)
+
+    def result_dtype(self, params):
+        """ Returns the dtype of the structured result array for the given parameters. """
+        fields = [(name, np.float64) for name in params]
+        fields.extend(('{0}_error'.format(name), np.float64) for name in params)
+        fields.extend([('chisqr', np.float64), ('redchi', np.float64), ('success', np.bool_)])
+        return np.dtype(fields)
+
+    def fit(self, traces, initial_params, initial_values=None):
+        """ Fit the model to all traces.
+
+        @param numpy.ndarray traces: 2D array of shape (n, len(x_axis))
+        @param list initial_params: list of n lmfit.Parameters containing the initial values and
+                                    bounds for each trace, or one lmfit.Parameters shared by all
+                                    traces. Which parameters are varied and the constraint
+                                    expressions are taken from the first entry.
+        @param dict initial_values: optional, parameter name -> array of n initial values, which
+                                    replace the values in initial_params (e.g. the result of a
+                                    vectorized estimator)
+
+        @return numpy.ndarray: structured array of length n with the fields <param name>,
+                               <param name>_error, 'chisqr', 'redchi' and 'success'
+        """
+        traces = np.asarray(traces, dtype=float)
+        if traces.ndim != 2 or traces.shape[1] != self.x_axis.size:
+            raise ValueError('Traces must be a 2D array of shape (n, {0:d}).'
+                             ''.format(self.x_axis.size))
+        if isinstance(initial_params, (list, tuple)):
+            if len(initial_params) != traces.shape[0]:
+                raise ValueError('Number of initial parameter sets must match the number of '
+                                 'traces.')
+        else:
+            initial_params = [initial_params]
+        if initial_values is None:
+            initial_values = dict()
+
+        template = initial_params[0]
+        self._names = list(template)
+        self._free = [name for name in self._names
+                      if template[name].vary and not template[name].expr]
+        self._fixed = [name for name in self._names
+                       if not template[name].vary and not template[name].expr]
+        self._exprs = [name for name in self._names if template[name].expr]
+
+        def param_attr(name, attr, default):
+            if attr == 'value' and name in initial_values:
+                values = np.asarray(initial_values[name], dtype=float)
+            else:
+                values = [getattr(params[name], attr) for params in initial_params]
+                values = np.array([default if v is None else v for v in values], dtype=float)
+            return np.broadcast_to(values, (traces.shape[0], )).copy()
+
+        start = np.stack([param_attr(name, 'value', 0.0) for name in self._free], axis=1)
+        lower = np.stack([param_attr(name, 'min', -np.inf) for name in self._free], axis=1)
+        upper = np.stack([param_attr(name, 'max', np.inf) for name in self._free], axis=1)
+        self._fixed_values = {name: param_attr(name, 'value', 0.0) for name in self._fixed}
+        self._expressions = {name: template[name].expr for name in self._exprs}
+
+        popt, success = self._levenberg_marquardt(traces, np.clip(start, lower, upper),
+                                                  lower, upper)
+
+        # Final statistics and uncertainties
+        index = np.arange(traces.shape[0])
+        all_index = slice(None)
+        residual = traces - self._eval(popt, all_index)
+        chisqr = np.sum(residual ** 2, axis=1)
+        dof = max(1, traces.shape[1] - len(self._free))
+        redchi = chisqr / dof
+        jacobian = self._jacobian(popt, all_index, self._eval(popt, all_index))
+        covariance = self._covariance(jacobian) * redchi[:, np.newaxis, np.newaxis]
+
+        values = self._all_values(popt, all_index)
+        errors = dict.fromkeys(self._names)
+        free_errors = np.sqrt(np.abs(np.diagonal(covariance, axis1=1, axis2=2)))
+        for i, name in enumerate(self._free):
+            errors[name] = free_errors[:, i]
+        for name in self._fixed:
+            errors[name] = np.zeros(index.size)
+        if self._exprs:
+            # Propagate the uncertainties to constrained parameters via numerical gradients
+            gradients = {name: np.zeros((index.size, len(self._free))) for name in self._exprs}
+            for i, step in enumerate(self._steps(popt)):
+                shifted = popt.copy()
+                shifted[:, i] += step
+                shifted_values = self._all_values(shifted, all_index)
+                for name in self._exprs:
+                    gradients[name][:, i] = (shifted_values[name] - values[name]) / step
+            for name in self._exprs:
+                grad = gradients[name]
+                errors[name] = np.sqrt(np.abs(np.einsum('ni,nij,nj->n', grad, covariance, grad)))
+
+        result = np.zeros(traces.shape[0], dtype=self.result_dtype(template))
+        for name in self._names:
+            result[name] = values[name]
+            result['{0}_error'.format(name)] = errors[name]
+        result['chisqr'] = chisqr
+        result['redchi'] = redchi
+        result['success'] = success & np.all(np.isfinite(popt), axis=1)
+        return result
+
+    def _levenberg_marquardt(self, traces, start, lower, upper):
+        popt = start.copy()
+        damping = np.full(traces.shape[0], 1e-3)
+        success = np.zeros(traces.shape[0], dtype=bool)
+        active = np.arange(traces.shape[0])
+
+        model = self._eval(popt, active)
+        chisqr = np.sum((traces - model) ** 2, axis=1)
+        for iteration in range(self.max_iterations):
+            if active.size == 0:
+                break
+            params = popt[active]
+            residual = traces[active] - model
+            jacobian = self._jacobian(params, active, model)
+            jtj = np.einsum('nmi,nmj->nij', jacobian, jacobian)
+            jtr = np.einsum('nmi,nm->ni', jacobian, residual)
+            diagonal = np.diagonal(jtj, axis1=1, axis2=2)
+            scaled = jtj + (damping[active, np.newaxis] * (diagonal + 1e-30))[:, :, np.newaxis] \
+                * np.eye(params.shape[1])
+            step = self._solve(scaled, jtr)
+            new_params = np.clip(params + step, lower[active], upper[active])
+
+            new_model = self._eval(new_params, active)
+            new_chisqr = np.sum((traces[active] - new_model) ** 2, axis=1)
+            old_chisqr = chisqr[active]
+            improved = np.isfinite(new_chisqr) & (new_chisqr <= old_chisqr)
+
+            # Accept improving steps and decrease damping, otherwise increase damping
+            accepted = active[improved]
+            popt[accepted] = new_params[improved]
+            chisqr[accepted] = new_chisqr[improved]
+            damping[accepted] = np.maximum(damping[accepted] / 10, 1e-12)
+            damping[active[~improved]] *= 10
+            model[improved] = new_model[improved]
+
+            converged = improved & (old_chisqr - new_chisqr <= self.ftol * old_chisqr)
+            converged |= np.all(step == 0, axis=1)
+            success[active[converged]] = True
+            stalled = damping[active] > 1e16
+            done = converged | stalled
+            active = active[~done]
+            model = model[~done]
+        return popt, success
+
+    def _all_values(self, params, index):
+        """ Values of all parameters (free, fixed and constrained) for the given traces. """
+        values = {name: params[:, i] for i, name in enumerate(self._free)}
+        for name in self._fixed:
+            values[name] = self._fixed_values[name][index]
+        if self._exprs:
+            interpreter = Interpreter()
+            interpreter.symtable.update(values)
+            for name in self._exprs:
+                with np.errstate(all='ignore'):
+                    value = interpreter.eval(self._expressions[name], show_errors=False)
+                if interpreter.error:
+                    raise ValueError('Unable to evaluate constraint expression of parameter '
+                                     '"{0}".'.format(name))
+                values[name] = np.broadcast_to(np.asarray(value, dtype=float),
+                                               (params.shape[0],)).copy()
+                interpreter.symtable[name] = values[name]
+        return values
+
+    def _eval(self, params, index):
+        values = self._all_values(params, index)
+        kwargs = {name: values[name][:, np.newaxis] for name in self.model.param_names}
+        with np.errstate(all='ignore'):
+            result = np.asarray(self.model.eval(x=self.x_axis, **kwargs), dtype=float)
+        if result.shape != (params.shape[0], self.x_axis.size):
+            result = np.broadcast_to(result, (params.shape[0], self.x_axis.size)).copy()
+        return result
+
+    @staticmethod
+    def _steps(params):
+        """ Finite difference step for each free parameter (one array per parameter). """
+        scale = np.where(params != 0, np.abs(params), 1.0)
+        return [np.sqrt(np.finfo(float).eps) * scale[:, i] for i in range(params.shape[1])]
+
+    def _jacobian(self, params, index, model):
+        jacobian = np.empty((params.shape[0], self.x_axis.size, params.shape[1]))
+        for i, step in enumerate(self._steps(params)):
+            shifted = params.copy()
+            shifted[:, i] += step
+            jacobian[:, :, i] = (self._eval(shifted, index) - model) / step[:, np.newaxis]
+        return jacobian
+
+    @staticmethod
+    def _solve(matrices, vectors):
+        try:
+            return np.linalg.solve(matrices, vectors[:, :, np.newaxis])[:, :, 0]
+        except np.linalg.LinAlgError:
+            return np.einsum('nij,nj->ni', np.linalg.pinv(matrices), vectors)
+
+    @staticmethod
+    def _covariance(jacobian):
+        jtj = np.einsum('nmi,nmj->nij', jacobian, jacobian)
+        try:
+            return np.linalg.inv(jtj)
+        except np.linalg.LinAlgError:
+            return np.linalg.pinv(jtj)
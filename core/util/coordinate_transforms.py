@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains coordinate transforms for scanner interfuses and a cache of transformed scan
+paths.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import hashlib
+import threading
+import numpy as np
+
+from collections import OrderedDict
+from numpy.polynomial import polynomial
+
+
+class CoordinateTransform:
+    """
+    Transform of scanner positions given as array of shape (axes, points), like the line paths of
+    ConfocalScannerInterface.scan_line. A single position is an array of shape (axes, ).
+
+    Subclasses implement _forward and _inverse, which change a float64 array in place, and key,
+    which identifies the parameters of the transform for the TransformCache.
+    """
+
+    @property
+    def key(self):
+        """ Hashable value which is equal for transforms with the same result. """
+        raise NotImplementedError
+
+    @property
+    def is_identity(self):
+        """ True if the transform does not change positions. """
+        return False
+
+    def forward(self, positions):
+        """ Transform positions from the input to the output coordinates of an interfuse.
+
+        @param numpy.ndarray positions: positions of shape (axes, points) or (axes, )
+
+        @return numpy.ndarray: transformed positions, the passed array is not changed
+        """
+        result = np.array(positions, dtype=np.float64)
+        if not self.is_identity:
+            self._forward(result)
+        return result
+
+    def inverse(self, positions):
+        """ Transform positions from the output back to the input coordinates of an interfuse.
+
+        @param numpy.ndarray positions: positions of shape (axes, points) or (axes, )
+
+        @return numpy.ndarray: positions in input coordinates, the passed array is not changed
+        """
+        result = np.array(positions, dtype=np.float64)
+        if not self.is_identity:
+            self._inverse(result)
+        return result
+
+    def _forward(self, positions):
+        raise NotImplementedError
+
+    def _inverse(self, positions):
+        raise NotImplementedError
+
+
+class ComposedTransform(CoordinateTransform):
+    """
+    Several transforms fused into one, applied in the given order (the transform of the outermost
+    interfuse first). The positions are copied only once and identity transforms are skipped.
+    """
+
+    def __init__(self, transforms):
+        """
+        @param list transforms: CoordinateTransform objects in the order of application
+        """
+        flat = list()
+        for transform in transforms:
+            if isinstance(transform, ComposedTransform):
+                flat.extend(transform.transforms)
+            else:
+                flat.append(transform)
+        self.transforms = tuple(t for t in flat if not t.is_identity)
+        self._key = ('composed', ) + tuple(t.key for t in self.transforms)
+
+    @property
+    def key(self):
+        return self._key
+
+    @property
+    def is_identity(self):
+        return len(self.transforms) == 0
+
+    def _forward(self, positions):
+        for transform in self.transforms:
+            transform._forward(positions)
+
+    def _inverse(self, positions):
+        for transform in reversed(self.transforms):
+            transform._inverse(positions)
+
+
+class TiltTransform(CoordinateTransform):
+    """
+    Z correction of a tilted sample surface: z -= (x - x0) * ax + (y - y0) * ay
+    """
+
+    def __init__(self, slope_x, slope_y, reference_x=0, reference_y=0, enabled=True):
+        """
+        @param float slope_x: dz/dx of the surface
+        @param float slope_y: dz/dy of the surface
+        @param float reference_x: x position without z correction
+        @param float reference_y: y position without z correction
+        @param bool enabled: apply the correction, otherwise the transform is the identity
+        """
+        self.slope_x = float(slope_x)
+        self.slope_y = float(slope_y)
+        self.reference_x = float(reference_x)
+        self.reference_y = float(reference_y)
+        self.enabled = bool(enabled)
+
+    @property
+    def key(self):
+        return ('tilt', self.slope_x, self.slope_y, self.reference_x, self.reference_y,
+                self.enabled)
+
+    @property
+    def is_identity(self):
+        return not self.enabled
+
+    def dz(self, x, y):
+        """ Change in z for the given lateral position(s). """
+        if not self.enabled:
+            return 0.
+        return -((x - self.reference_x) * self.slope_x + (y - self.reference_y) * self.slope_y)
+
+    def _forward(self, positions):
+        positions[2] += self.dz(positions[0], positions[1])
+
+    def _inverse(self, positions):
+        # the correction only depends on x and y, which are not changed
+        positions[2] -= self.dz(positions[0], positions[1])
+
+
+class LateralPolynomialTransform(CoordinateTransform):
+    """
+    Lateral correction with two 2D polynomials: x' = P_x(x, y), y' = P_y(x, y), where
+    poly2d[i][j] is the coefficient of x**j * y**i (the format of the config option of the
+    ScannerLateralPolyCorrectInterfuse).
+
+    Both polynomials are evaluated with a single pseudo-Vandermonde matrix. The inverse is
+    calculated with the Newton method, starting from the inverse of the linear part.
+    """
+
+    def __init__(self, poly2d_x, poly2d_y, tolerance=1e-12, absolute_tolerance=1e-15,
+                 max_iterations=50):
+        """
+        @param array poly2d_x: coefficients of the polynomial for x
+        @param array poly2d_y: coefficients of the polynomial for y
+        @param float tolerance: relative tolerance of the inverse
+        @param float absolute_tolerance: absolute tolerance of the inverse in output coordinates,
+                                         needed for positions at or near the origin
+        @param int max_iterations: maximum number of Newton iterations of the inverse
+        """
+        coeff_x = np.atleast_2d(np.array(poly2d_x, dtype=np.float64)).T
+        coeff_y = np.atleast_2d(np.array(poly2d_y, dtype=np.float64)).T
+        shape = np.maximum(coeff_x.shape, coeff_y.shape)
+        # coefficients with index [power of x, power of y, output axis]
+        self._coefficients = np.zeros((shape[0], shape[1], 2))
+        self._coefficients[:coeff_x.shape[0], :coeff_x.shape[1], 0] = coeff_x
+        self._coefficients[:coeff_y.shape[0], :coeff_y.shape[1], 1] = coeff_y
+        self._degree = [shape[0] - 1, shape[1] - 1]
+        self._matrix = self._coefficients.reshape(-1, 2)
+        linear = np.zeros((max(2, shape[0]), max(2, shape[1]), 2))
+        linear[:shape[0], :shape[1]] = self._coefficients
+        try:
+            self._inverse_linear = np.linalg.inv(linear[[1, 0], [0, 1]].T)
+        except np.linalg.LinAlgError:
+            self._inverse_linear = np.eye(2)
+        self._dx = polynomial.polyder(self._coefficients, axis=0)
+        self._dy = polynomial.polyder(self._coefficients, axis=1)
+        self.tolerance = float(tolerance)
+        self.absolute_tolerance = float(absolute_tolerance)
+        self.max_iterations = int(max_iterations)
+        self._key = ('poly2d', self._coefficients.shape, self._coefficients.tobytes())
+
+    @property
+    def key(self):
+        return self._key
+
+    def evaluate(self, x, y):
+        """ Evaluate both polynomials.
+
+        @param float|numpy.ndarray x: input x position(s)
+        @param float|numpy.ndarray y: input y position(s)
+
+        @return numpy.ndarray, numpy.ndarray: output x and y position(s)
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        result = polynomial.polyvander2d(x, y, self._degree) @ self._matrix
+        # polyvander2d returns at least one dimension
+        result = result.reshape(np.broadcast(x, y).shape + (2, ))
+        return result[..., 0], result[..., 1]
+
+    def _forward(self, positions):
+        positions[0], positions[1] = self.evaluate(positions[0], positions[1])
+
+    def _inverse(self, positions):
+        target_x = positions[0].copy()
+        target_y = positions[1].copy()
+        # start with the inverse of the linear part
+        c = self._coefficients
+        inverse_linear = self._inverse_linear
+        offset_x = target_x - c[0, 0, 0]
+        offset_y = target_y - c[0, 0, 1]
+        x = inverse_linear[0, 0] * offset_x + inverse_linear[0, 1] * offset_y
+        y = inverse_linear[1, 0] * offset_x + inverse_linear[1, 1] * offset_y
+        limit_x = self.absolute_tolerance + self.tolerance * np.abs(target_x)
+        limit_y = self.absolute_tolerance + self.tolerance * np.abs(target_y)
+        for _ in range(self.max_iterations):
+            value_x, value_y = self.evaluate(x, y)
+            error_x = value_x - target_x
+            error_y = value_y - target_y
+            if np.all(np.abs(error_x) <= limit_x) and np.all(np.abs(error_y) <= limit_y):
+                break
+            dxx = polynomial.polyval2d(x, y, self._dx[..., 0])
+            dxy = polynomial.polyval2d(x, y, self._dy[..., 0])
+            dyx = polynomial.polyval2d(x, y, self._dx[..., 1])
+            dyy = polynomial.polyval2d(x, y, self._dy[..., 1])
+            determinant = dxx * dyy - dxy * dyx
+            if np.any(determinant == 0):
+                raise ValueError('Polynomial transform is not invertible at the given position.')
+            x = x - (dyy * error_x - dxy * error_y) / determinant
+            y = y - (dxx * error_y - dyx * error_x) / determinant
+        else:
+            raise ValueError('Inverse of the polynomial transform did not converge.')
+        positions[0] = x
+        positions[1] = y
+
+
+class TransformCache:
+    """
+    Least recently used cache of transformed scan paths.
+
+    A scan repeats the same line paths for every image and refocus, so the transformed paths are
+    kept and looked up by a hash of the path and the key of the transform. Changing the parameters
+    of a transform changes its key, so outdated entries are never used. Cached paths are read-only.
+    """
+
+    def __init__(self, max_bytes=64 * 2**20):
+        """
+        @param int max_bytes: maximum size of all cached paths in bytes, 0 disables the cache
+        """
+        self.max_bytes = int(max_bytes)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def forward(self, transform, path):
+        """ Transform a path, or look up the result of a previous call with the same arguments.
+
+        @param CoordinateTransform transform: the transform
+        @param numpy.ndarray path: positions of shape (axes, points)
+
+        @return numpy.ndarray: transformed path
+        """
+        if transform.is_identity:
+            return path
+        path = np.ascontiguousarray(path, dtype=np.float64)
+        if self.max_bytes <= 0 or path.nbytes > self.max_bytes:
+            return transform.forward(path)
+        digest = hashlib.sha1(memoryview(path).cast('B')).digest()
+        key = (transform.key, path.shape, digest)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                return result
+        result = transform.forward(path)
+        result.setflags(write=False)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = result
+                self._bytes += result.nbytes
+                while self._bytes > self.max_bytes:
+                    _, removed = self._entries.popitem(last=False)
+                    self._bytes -= removed.nbytes
+        return result
+
+    def clear(self):
+        """ Remove all cached paths. """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
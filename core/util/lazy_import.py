@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a helper to defer the import of heavy python packages until they are used.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import importlib
+import importlib.util
+import sys
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Placeholder for a python module which is imported on the first attribute access.
+
+    After the import all attributes of the module are copied into the placeholder, so later
+    accesses are as fast as for the module itself.
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lazy_lock'] = threading.Lock()
+        self.__dict__['_lazy_module'] = None
+
+    def _lazy_load(self):
+        with self.__dict__['_lazy_lock']:
+            module = self.__dict__['_lazy_module']
+            if module is None:
+                module = importlib.import_module(self.__name__)
+                self.__dict__.update(module.__dict__)
+                self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, name):
+        # only called for attributes not yet copied from the module
+        return getattr(self._lazy_load(), name)
+
+    def __dir__(self):
+        return dir(self._lazy_load())
+
+    def __repr__(self):
+        if self.__dict__['_lazy_module'] is None:
+            return '<lazy module {0!r} (not imported yet)>'.format(self.__name__)
+        return repr(self.__dict__['_lazy_module'])
+
+
+def lazy_import(name):
+    """ Import a python module on its first use.
+
+    @param str name: absolute name of the module, e.g. 'matplotlib.pyplot'
+
+    @return module: the module if it is already imported, otherwise a LazyModule placeholder
+
+    Use it in place of a module level import of a heavy package, which is only needed by a few
+    methods, e.g.
+
+        plt = lazy_import('matplotlib.pyplot')
+
+    instead of "import matplotlib.pyplot as plt". Only the top level package is looked up right
+    away (without importing it), so a missing package still raises an ImportError on import of
+    the Qudi module. Names imported with "from ... import ..." have to be accessed through the
+    module instead.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    top_level = name.partition('.')[0]
+    if top_level not in sys.modules and importlib.util.find_spec(top_level) is None:
+        raise ImportError('No module named {0!r}'.format(top_level), name=top_level)
+    return LazyModule(name)
@@ -19,14 +19,299 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import concurrent.futures
+import socket
+import struct
+import threading
+import uuid
+import weakref
+
+import numpy as np
+import rpyc
 import rpyc.core.netref
 import rpyc.utils.classic
 
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # python < 3.8
+    shared_memory = None
+
+# Identifies this computer, used to decide if arrays can be passed through shared memory
+HOST_ID = '{0}-{1:012x}'.format(socket.gethostname(), uuid.getnode())
+
+# Array transport connection: request a registered array by its token, the answer is the length
+# in bytes followed by the raw data (or INVALID_TOKEN as length if the token is unknown)
+TOKEN_FORMAT = '<Q'
+LENGTH_FORMAT = '<Q'
+INVALID_TOKEN = 2 ** 64 - 1
+
+# rpyc connection -> ArrayTransportClient (or None if the server does not support it)
+_transport_clients = weakref.WeakKeyDictionary()
+_transport_clients_lock = threading.Lock()
+
 
 def netobtain(obj):
-    """
+    """ Get a local copy of an object if it is a reference to an object on a remote computer.
+
+    @param object obj: the object or a rpyc netref
+
+    @return object: local object
+
+    Numpy arrays served by a Qudi module server are transferred as raw buffers (or through shared
+    memory if the server runs on the same computer) instead of being pickled.
     """
     if isinstance(obj, rpyc.core.netref.BaseNetref):
+        if _remote_type_name(obj) == 'numpy.ndarray':
+            client = get_transport_client(_netref_connection(obj))
+            if client is not None:
+                return client.obtain(obj)
         return rpyc.utils.classic.obtain(obj)
     else:
         return obj
+
+
+def netbatch(obj, requests):
+    """ Read several attributes of an object and call several of its methods in a single request.
+
+    @param object obj: module or any other object, local or a rpyc netref
+    @param list requests: each request is either an attribute name (str) or a tuple
+                          (method name, args) or (method name, args, kwargs)
+
+    @return list: results of the requests in the same order
+
+    For a remote object all requests are executed on the server in one network round trip. Numpy
+    arrays in the results are transferred like netobtain does it, all other results are returned
+    as rpyc returns them (by value for simple types, as netrefs otherwise). For a local object the
+    requests are simply executed.
+    """
+    requests = [_normalize_request(request) for request in requests]
+    if isinstance(obj, rpyc.core.netref.BaseNetref):
+        conn = _netref_connection(obj)
+        client = get_transport_client(conn)
+        if client is not None:
+            return client.batch(obj, requests)
+        return [netobtain(result) if _remote_type_name(result) == 'numpy.ndarray' else result
+                for result in execute_requests(obj, requests)]
+    return execute_requests(obj, requests)
+
+
+def netcall_async(method, *args, **kwargs):
+    """ Call a method of a module asynchronously if the module is a remote module.
+
+    @param method: method of a module, e.g. self.fastcounter().get_data_trace
+
+    @return concurrent.futures.Future: future of the return value
+
+    Methods of remote modules are called in a worker thread of the connection pool, so several
+    remote calls can run at the same time. Methods of local modules are called directly and the
+    returned future is already done.
+    """
+    if hasattr(method, 'call_async'):
+        return method.call_async(*args, **kwargs)
+    future = concurrent.futures.Future()
+    try:
+        future.set_result(method(*args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def _normalize_request(request):
+    if isinstance(request, str):
+        return request, None, tuple()
+    name = request[0]
+    args = tuple(request[1]) if len(request) > 1 else tuple()
+    kwargs = tuple(request[2].items()) if len(request) > 2 and request[2] else tuple()
+    return str(name), args, kwargs
+
+
+def execute_requests(obj, requests):
+    """ Execute requests (see netbatch) normalized to tuples (name, args or None, kwargs items).
+
+    @param object obj: object to execute the requests on
+    @param list requests: normalized requests
+
+    @return list: results
+    """
+    results = list()
+    for name, args, kwargs in requests:
+        value = getattr(obj, name)
+        if args is not None:
+            value = value(*args, **dict(kwargs))
+        results.append(value)
+    return results
+
+
+def _remote_type_name(netref):
+    try:
+        return object.__getattribute__(netref, '____id_pack__')[0]
+    except (AttributeError, IndexError, TypeError):
+        return None
+
+
+def _netref_connection(netref):
+    conn = object.__getattribute__(netref, '____conn__')
+    if isinstance(conn, weakref.ref):
+        conn = conn()
+    return conn
+
+
+def is_transportable_array(obj):
+    """ Check if an object is a numpy array which can be sent as raw buffer.
+
+    @param object obj: object to check
+
+    @return bool: True for numpy arrays with a plain (not object or structured) dtype
+    """
+    return (isinstance(obj, np.ndarray) and not obj.dtype.hasobject
+            and obj.dtype.fields is None)
+
+
+def get_transport_client(conn):
+    """ Get the array transport client of a rpyc connection.
+
+    @param rpyc.Connection conn: connection to a Qudi module server
+
+    @return ArrayTransportClient: the client or None if the server does not support array transport
+    """
+    if conn is None:
+        return None
+    with _transport_clients_lock:
+        if conn in _transport_clients:
+            return _transport_clients[conn]
+        try:
+            port = conn.root.get_array_transport()
+        except Exception:
+            client = None
+        else:
+            client = ArrayTransportClient(conn, port)
+        _transport_clients[conn] = client
+        return client
+
+
+class ArrayTransportClient:
+    """
+    Receives numpy arrays from the array transport of a Qudi module server.
+
+    The array is registered on the server with a rpyc request returning its dtype and shape. The
+    data is then either copied from shared memory (client and server on the same computer) or
+    received into a preallocated array through a separate plain TCP connection, which avoids
+    pickling as well as the per-message overhead and compression of the rpyc channel.
+    """
+
+    def __init__(self, conn, port):
+        """
+        @param rpyc.Connection conn: connection to a Qudi module server
+        @param int port: port of the array transport of the server, None if the server only
+                         supports shared memory
+        """
+        self._conn = weakref.ref(conn)
+        self._port = port
+        self._host = None
+        try:
+            self._host = conn._channel.stream.sock.getpeername()[0]
+        except (AttributeError, OSError):
+            self._port = None
+        self._socket = None
+        self._lock = threading.Lock()
+        self._host_id = HOST_ID if shared_memory is not None else None
+
+    def obtain(self, netref):
+        """ Get a local copy of a remote numpy array.
+
+        @param netref: rpyc netref of a numpy array
+
+        @return numpy.ndarray: local copy of the array
+        """
+        header = self._conn().root.register_array(netref, self._host_id, self._port is not None)
+        if header is None:
+            return rpyc.utils.classic.obtain(netref)
+        return self.receive(header)
+
+    def batch(self, netref, requests):
+        """ Execute normalized requests (see netbatch) on a remote object.
+
+        @param netref: rpyc netref of the object
+        @param list requests: normalized requests
+
+        @return list: results
+        """
+        results = self._conn().root.batch(netref, tuple(requests), self._host_id,
+                                          self._port is not None)
+        return [self.receive(value) if is_array else value for is_array, value in results]
+
+    def receive(self, header):
+        """ Receive a registered array.
+
+        @param tuple header: (token, dtype, shape, shared memory name) from the server
+
+        @return numpy.ndarray: the array
+        """
+        token, dtype, shape, shm_name = header
+        array = np.empty(tuple(shape), dtype=np.dtype(dtype))
+        if shm_name is not None:
+            try:
+                self._copy_from_shared_memory(shm_name, array)
+            finally:
+                # the server can free the block, no need to wait for it
+                rpyc.async_(self._conn().root.release_array)(token)
+        elif self._port is None:
+            rpyc.async_(self._conn().root.release_array)(token)
+            raise ConnectionError('Array transport of the module server is not available.')
+        else:
+            with self._lock:
+                try:
+                    self._receive_from_socket(token, array)
+                except Exception:
+                    self.close()
+                    raise
+        return array
+
+    @staticmethod
+    def _copy_from_shared_memory(name, array):
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            array[...] = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        finally:
+            block.close()
+            # python < 3.13 registers attached blocks for cleanup at exit, but the server owns it
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(block._name, 'shared_memory')
+            except Exception:
+                pass
+
+    def _receive_from_socket(self, token, array):
+        if self._socket is None:
+            self._socket = socket.create_connection((self._host, self._port))
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._socket.sendall(struct.pack(TOKEN_FORMAT, token))
+        length = struct.unpack(LENGTH_FORMAT, self._receive_exactly(
+            memoryview(bytearray(struct.calcsize(LENGTH_FORMAT)))))[0]
+        if length == INVALID_TOKEN:
+            raise ValueError('Array {0:d} is not registered on the module server.'.format(token))
+        if length != array.nbytes:
+            raise ValueError('Received {0:d} bytes for an array of {1:d} bytes.'.format(
+                length, array.nbytes))
+        if length > 0:
+            self._receive_exactly(memoryview(array).cast('B'))
+
+    def _receive_exactly(self, buffer):
+        received = 0
+        while received < buffer.nbytes:
+            count = self._socket.recv_into(buffer[received:])
+            if count == 0:
+                raise ConnectionError('Array transport connection closed by the module server.')
+            received += count
+        return buffer
+
+    def close(self):
+        """ Close the array transport connection. It is reopened on the next transfer. """
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except OSError:
+                pass
+            self._socket = None
+
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains numpy based data buffers for Qudi.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-size circular buffer of equally shaped numpy arrays stacked along the first axis.
+
+    Every item is written twice into a storage array of twice the capacity ("mirrored" buffer).
+    This way the most recent n items (n <= capacity) always form a contiguous block of memory and
+    can be returned as a numpy view instead of a copy, no matter where the head index currently
+    points to. Appending an item costs O(item size) independent of the buffer length.
+
+    Slots that have not been written yet since the last call of clear() contain zeros.
+    """
+
+    def __init__(self, capacity, item_shape=tuple(), dtype=np.float64):
+        """
+        @param int capacity: Maximum number of items to hold
+        @param tuple item_shape: Shape of a single item
+        @param dtype: numpy dtype of the buffer
+        """
+        capacity = int(capacity)
+        if capacity < 1:
+            raise ValueError('RingBuffer capacity must be an integer >= 1.')
+        self._capacity = capacity
+        self._item_shape = tuple(item_shape)
+        self._data = np.zeros((2 * capacity,) + self._item_shape, dtype=dtype)
+        # Index of the slot the next item will be written to
+        self._head = 0
+        # Number of valid items in the buffer
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def item_shape(self):
+        return self._item_shape
+
+    @property
+    def dtype(self):
+        return self._data.dtype
+
+    @property
+    def head(self):
+        """ Index of the slot the next item will be written to. """
+        return self._head
+
+    @property
+    def is_full(self):
+        return self._count == self._capacity
+
+    def clear(self):
+        """ Remove all items from the buffer and reset all slots to zero. """
+        self._data[...] = 0
+        self._head = 0
+        self._count = 0
+
+    def append(self, item):
+        """
+        Add a new item to the buffer. If the buffer is full the oldest item is overwritten.
+
+        @param numpy.ndarray item: The item to add. Must be broadcastable to item_shape.
+        """
+        self._data[self._head] = item
+        self._data[self._head + self._capacity] = item
+        self._head = (self._head + 1) % self._capacity
+        if self._count < self._capacity:
+            self._count += 1
+
+    def newest(self, number=None):
+        """
+        Returns a view on the most recent items with the newest item at index 0.
+
+        The returned view always has the requested length. Positions not holding a valid item yet
+        contain zeros. The view is updated in place by subsequent calls of append.
+
+        @param int number: Number of items to return (default and maximum: capacity)
+
+        @return numpy.ndarray: view of shape (number, *item_shape)
+        """
+        if number is None:
+            number = self._capacity
+        number = max(0, min(int(number), self._capacity))
+        stop = self._head + self._capacity
+        return self._data[stop - number:stop][::-1]
+
+    def oldest(self, number=None):
+        """
+        Returns a view on the valid items in chronological order (oldest item at index 0).
+
+        @param int number: Return only the most recent <number> valid items (default: all)
+
+        @return numpy.ndarray: view of shape (n, *item_shape) with n <= number of valid items
+        """
+        if number is None:
+            number = self._count
+        number = max(0, min(int(number), self._count))
+        stop = self._head + self._capacity
+        return self._data[stop - number:stop]
+
+    def get_item(self, age):
+        """
+        Returns a view on a single item.
+
+        @param int age: Age of the item, i.e. 0 for the newest, 1 for the second newest etc.
+
+        @return numpy.ndarray: view on the requested item
+        """
+        if not 0 <= age < self._count:
+            raise IndexError('RingBuffer item with age {0} not available. Buffer holds {1:d} '
+                             'items.'.format(age, self._count))
+        return self._data[self._head + self._capacity - 1 - age]
+
+
+class GrowableArray:
+    """
+    Numpy array of equally shaped rows that can be extended at the end in amortized O(1).
+
+    The rows are stored in a preallocated array whose length is doubled whenever it is exhausted.
+    The valid rows are returned as a view without copying. A view obtained before the storage has
+    been enlarged stays valid but does not show rows appended later on.
+
+    Appending from one thread while reading from another one is safe without further locking since
+    the storage is only replaced by a copy holding all valid rows before the row count is increased.
+    """
+
+    def __init__(self, row_shape=tuple(), dtype=np.float64, initial_capacity=1024):
+        """
+        @param tuple row_shape: Shape of a single row
+        @param dtype: numpy dtype of the array
+        @param int initial_capacity: Number of rows to preallocate
+        """
+        self._row_shape = tuple(row_shape)
+        self._initial_capacity = max(1, int(initial_capacity))
+        self._data = np.empty((self._initial_capacity,) + self._row_shape, dtype=dtype)
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def capacity(self):
+        return self._data.shape[0]
+
+    @property
+    def row_shape(self):
+        return self._row_shape
+
+    @property
+    def dtype(self):
+        return self._data.dtype
+
+    @property
+    def data(self):
+        """ View on all valid rows. """
+        # Read the row count before the storage reference (see class docstring)
+        count = self._count
+        return self._data[:count]
+
+    def clear(self):
+        """ Remove all rows and release the storage beyond the initial capacity. """
+        self._count = 0
+        self._data = np.empty((self._initial_capacity,) + self._row_shape, dtype=self._data.dtype)
+
+    def _reserve(self, capacity):
+        if capacity <= self._data.shape[0]:
+            return
+        new_capacity = self._data.shape[0]
+        while new_capacity < capacity:
+            new_capacity *= 2
+        new_data = np.empty((new_capacity,) + self._row_shape, dtype=self._data.dtype)
+        new_data[:self._count] = self._data[:self._count]
+        self._data = new_data
+
+    def append(self, row):
+        """
+        Add a single row at the end.
+
+        @param numpy.ndarray row: The row to add. Must be broadcastable to row_shape.
+        """
+        self._reserve(self._count + 1)
+        self._data[self._count] = row
+        self._count += 1
+
+    def extend(self, rows):
+        """
+        Add several rows at the end.
+
+        @param numpy.ndarray rows: Array of shape (n, *row_shape)
+        """
+        rows = np.asarray(rows, dtype=self._data.dtype)
+        if rows.size == 0:
+            return
+        rows = rows.reshape((-1,) + self._row_shape)
+        self._reserve(self._count + rows.shape[0])
+        self._data[self._count:self._count + rows.shape[0]] = rows
+        self._count += rows.shape[0]
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a profiler recording where the Qudi manager spends its time while starting
+modules.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import contextlib
+import datetime
+import functools
+import importlib.abc
+import sys
+import threading
+import time
+
+from collections import OrderedDict
+
+
+class ImportNode:
+    """ Node of the import time tree: a python module and the modules imported while executing it.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.cumulative = 0.0
+        self.children = list()
+
+    @property
+    def self_time(self):
+        """ Time spent executing the module itself without the imports of other modules. """
+        return self.cumulative - sum(child.cumulative for child in self.children)
+
+
+class _ImportTimingFinder(importlib.abc.MetaPathFinder):
+    """ Meta path finder which delegates the search to the other finders and times the execution
+        of the found modules.
+    """
+
+    def __init__(self, profiler):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        loader = spec.loader
+        # builtin and frozen importers are classes shared by all modules, do not touch them
+        if loader is not None and not isinstance(loader, type) and hasattr(loader, 'exec_module'):
+            try:
+                loader.exec_module = functools.partial(
+                    self._profiler._timed_exec_module, loader.exec_module, fullname)
+            except AttributeError:
+                pass
+        return spec
+
+
+class StartupProfiler:
+    """
+    Records how long the manager needs to import, instantiate, connect and activate each Qudi module
+    and, while import tracking is active, how long every python module import takes (as a tree of
+    nested imports like "python -X importtime").
+
+    Does nothing unless enabled, so the manager can use it unconditionally.
+    """
+    phases = ('import', 'instantiate', 'connect', 'activate')
+
+    def __init__(self, enabled=False):
+        """
+        @param bool enabled: record timings
+        """
+        self.enabled = bool(enabled)
+        # 'base.name' -> OrderedDict(phase -> duration in s)
+        self.module_times = OrderedDict()
+        # import trees, one root node per top level import
+        self.import_tree = list()
+        self._lock = threading.Lock()
+        self._import_stacks = threading.local()
+        self._finder = None
+
+    @property
+    def is_tracking_imports(self):
+        return self._finder is not None
+
+    def start_import_tracking(self):
+        """ Start recording the execution time of all python modules imported from now on. """
+        if self.enabled and self._finder is None:
+            self._finder = _ImportTimingFinder(self)
+            sys.meta_path.insert(0, self._finder)
+
+    def stop_import_tracking(self):
+        """ Stop recording python module imports. """
+        if self._finder is not None:
+            try:
+                sys.meta_path.remove(self._finder)
+            except ValueError:
+                pass
+            self._finder = None
+
+    def _timed_exec_module(self, exec_module, name, module):
+        if self._finder is None:
+            return exec_module(module)
+        stack = getattr(self._import_stacks, 'stack', None)
+        if stack is None:
+            stack = self._import_stacks.stack = list()
+        node = ImportNode(name)
+        if stack:
+            stack[-1].children.append(node)
+        else:
+            with self._lock:
+                self.import_tree.append(node)
+        stack.append(node)
+        start = time.perf_counter()
+        try:
+            return exec_module(module)
+        finally:
+            node.cumulative = time.perf_counter() - start
+            stack.pop()
+
+    @contextlib.contextmanager
+    def measure(self, base, name, phase):
+        """ Context manager adding the time spent in its body to a phase of a module.
+
+        @param str base: module base (hardware, logic or gui)
+        @param str name: module name
+        @param str phase: one of StartupProfiler.phases
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(base, name, phase, time.perf_counter() - start)
+
+    def add_time(self, base, name, phase, duration):
+        """ Add a duration to a phase of a module.
+
+        @param str base: module base (hardware, logic or gui)
+        @param str name: module name
+        @param str phase: one of StartupProfiler.phases
+        @param float duration: duration in s
+        """
+        if not self.enabled:
+            return
+        key = '{0}.{1}'.format(base, name)
+        with self._lock:
+            if key not in self.module_times:
+                self.module_times[key] = OrderedDict((p, 0.0) for p in self.phases)
+            self.module_times[key][phase] = self.module_times[key].get(phase, 0.0) + duration
+
+    def format_report(self, min_import_time=1e-3):
+        """ Create a text report of all recorded timings.
+
+        @param float min_import_time: omit imports with a cumulative time below this value in s
+
+        @return str: the report
+        """
+        with self._lock:
+            module_times = OrderedDict((k, v.copy()) for k, v in self.module_times.items())
+            import_tree = list(self.import_tree)
+
+        lines = ['Qudi startup profile, {0}'.format(datetime.datetime.now().isoformat(' ')), '']
+        lines.append('Module times [s]:')
+        header = '{0:<40}'.format('module') + ''.join(
+            '{0:>13}'.format(phase) for phase in self.phases) + '{0:>13}'.format('total')
+        lines.append(header)
+        lines.append('-' * len(header))
+        totals = OrderedDict((phase, 0.0) for phase in self.phases)
+        for key, times in sorted(module_times.items(), key=lambda item: -sum(item[1].values())):
+            lines.append('{0:<40}'.format(key) + ''.join(
+                '{0:>13.3f}'.format(times.get(phase, 0.0)) for phase in self.phases)
+                + '{0:>13.3f}'.format(sum(times.values())))
+            for phase in self.phases:
+                totals[phase] += times.get(phase, 0.0)
+        lines.append('-' * len(header))
+        lines.append('{0:<40}'.format('sum') + ''.join(
+            '{0:>13.3f}'.format(totals[phase]) for phase in self.phases)
+            + '{0:>13.3f}'.format(sum(totals.values())))
+        lines.append('(activation times of concurrently activated modules overlap)')
+
+        lines.append('')
+        lines.append('Python module imports (cumulative time >= {0:g} ms) [ms]:'
+                     ''.format(min_import_time * 1e3))
+        lines.append('{0:>12}{1:>12}  {2}'.format('cumulative', 'self', 'module'))
+
+        def add_node(node, depth):
+            if node.cumulative < min_import_time:
+                return
+            lines.append('{0:>12.1f}{1:>12.1f}  {2}{3}'.format(
+                node.cumulative * 1e3, node.self_time * 1e3, '| ' * depth, node.name))
+            for child in sorted(node.children, key=lambda n: -n.cumulative):
+                add_node(child, depth + 1)
+
+        for node in sorted(import_tree, key=lambda n: -n.cumulative):
+            add_node(node, 0)
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, path, min_import_time=1e-3):
+        """ Write the report (see format_report) to a text file.
+
+        @param str path: path of the file
+        @param float min_import_time: omit imports with a cumulative time below this value in s
+        """
+        with open(path, 'w') as file:
+            file.write(self.format_report(min_import_time=min_import_time))
@@ -178,8 +178,8 @@ class ConfocalGui(GUIBase):
         self.opt_channel = 0
 
         # Get the image for the display from the logic
-        raw_data_xy = self._scanning_logic.xy_image[:, :, 3 + self.xy_channel]
-        raw_data_depth = self._scanning_logic.depth_image[:, :, 3 + self.depth_channel]
+        raw_data_xy = self._scanning_logic.xy_image_data.channel_image(self.xy_channel)
+        raw_data_depth = self._scanning_logic.depth_image_data.channel_image(self.depth_channel)
 
         # Set initial position for the crosshair, default is the middle of the
         # screen:
@@ -198,14 +198,8 @@ class ConfocalGui(GUIBase):
         self._mw.scanLineDockWidget.hide()
 
         # set up scan line plot
-        sc = self._scanning_logic._scan_counter
-        sc = sc - 1 if sc >= 1 else sc
-        if self._scanning_logic._zscan:
-            data = self._scanning_logic.depth_image[sc, :, 0:4:3]
-        else:
-            data = self._scanning_logic.xy_image[sc, :, 0:4:3]
-
-        self.scan_line_plot = pg.PlotDataItem(data, pen=pg.mkPen(palette.c1))
+        self.scan_line_plot = pg.PlotDataItem(pen=pg.mkPen(palette.c1))
+        self.refresh_scan_line()
         self._mw.scanLineGraphicsView.addItem(self.scan_line_plot)
 
         ###################################################################
@@ -1384,7 +1378,7 @@ class ConfocalGui(GUIBase):
         """
         self.xy_image.getViewBox().updateAutoRange()
 
-        xy_image_data = self._scanning_logic.xy_image[:, :, 3 + self.xy_channel]
+        xy_image_data = self._scanning_logic.xy_image_data.channel_image(self.xy_channel)
 
         cb_range = self.get_xy_cb_range()
 
@@ -1405,7 +1399,8 @@ class ConfocalGui(GUIBase):
 
         self.depth_image.getViewBox().enableAutoRange()
 
-        depth_image_data = self._scanning_logic.depth_image[:, :, 3 + self.depth_channel]
+        depth_image_data = self._scanning_logic.depth_image_data.channel_image(
+            self.depth_channel)
         cb_range = self.get_depth_cb_range()
 
         # Now update image with new color scale, and update colorbar
@@ -1471,9 +1466,10 @@ class ConfocalGui(GUIBase):
         sc = self._scanning_logic._scan_counter
         sc = sc - 1 if sc >= 1 else sc
         if self._scanning_logic._zscan:
-            self.scan_line_plot.setData(self._scanning_logic.depth_image[sc, :, 0:4:3])
+            image = self._scanning_logic.depth_image_data
         else:
-            self.scan_line_plot.setData(self._scanning_logic.xy_image[sc, :, 0:4:3])
+            image = self._scanning_logic.xy_image_data
+        self.scan_line_plot.setData(image.horizontal_axis, image.channel_image(0)[sc])
 
     def adjust_xy_window(self):
         """ Fit the visible window in the xy scan to full view.
@@ -1761,10 +1757,11 @@ class ConfocalGui(GUIBase):
         them as the current image ranges.
         """
         # extract the range directly from the image:
-        xMin = self._scanning_logic.xy_image[0, 0, 0]
-        yMin = self._scanning_logic.xy_image[0, 0, 1]
-        xMax = self._scanning_logic.xy_image[-1, -1, 0]
-        yMax = self._scanning_logic.xy_image[-1, -1, 1]
+        image = self._scanning_logic.xy_image_data
+        xMin = image.horizontal_axis[0]
+        yMin = image.vertical_axis[0]
+        xMax = image.horizontal_axis[-1]
+        yMax = image.vertical_axis[-1]
 
         self._mw.x_min_InputWidget.setValue(xMin)
         self._mw.x_max_InputWidget.setValue(xMax)
@@ -1804,10 +1801,8 @@ class ConfocalGui(GUIBase):
         them as the current image ranges.
         """
         # extract the range directly from the image:
-        xMin = self._scanning_logic.depth_image[0, 0, 0]
-        zMin = self._scanning_logic.depth_image[0, 0, 2]
-        xMax = self._scanning_logic.depth_image[-1, -1, 0]
-        zMax = self._scanning_logic.depth_image[-1, -1, 2]
+        xMin, _, zMin = self._scanning_logic.depth_image_data.pixel_position(0, 0)
+        xMax, _, zMax = self._scanning_logic.depth_image_data.pixel_position(-1, -1)
 
         self._mw.x_min_InputWidget.setValue(xMin)
         self._mw.x_max_InputWidget.setValue(xMax)
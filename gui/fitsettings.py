@@ -155,7 +155,8 @@ class FitSettingsDialog(QtWidgets.QDialog):
         self.applySettings()
 
         for name, fit in user_fits.items():
-            self.addFit(name, fit=fit['fit_name'], estimator=fit['est_name'])
+            self.addFit(name, fit=fit['fit_name'], estimator=fit['est_name'],
+                        warm_start=fit.get('warm_start', False))
 
             # add new tab for new fit
             model, params = self.all_functions[fit['fit_name']]['make_model']()
@@ -165,18 +166,19 @@ class FitSettingsDialog(QtWidgets.QDialog):
         # build fit list and send update signals
         self.applySettings()
 
-    def addFit(self, name, fit=None, estimator=None):
+    def addFit(self, name, fit=None, estimator=None, warm_start=False):
         """ Add a new fit to the dialog.
             @param name str: configured name for fit
             @param fit str: name of the fit function for this fit
             @param estimator str: name of the estimator function for this fit
+            @param warm_start bool: start refits from the previous converged fit result
         """
         if len(name) < 1:
             return
         if name in self.fitWidgets:
             logging.error('{0}: Fit {1} already exists.'.format(self.title, name))
             return
-        fcw = FitConfigWidget(name, self.all_functions, fit, estimator)
+        fcw = FitConfigWidget(name, self.all_functions, fit, estimator, warm_start)
         self.currentFitWidgets[name] = fcw
         self._scrLayout.addWidget(fcw)
         fcw.sigRemoveFit.connect(self.removeFit)
@@ -273,7 +275,8 @@ class FitSettingsDialog(QtWidgets.QDialog):
                     'make_model': self.all_functions[widget.fit]['make_model'],
                     'estimator': self.all_functions[widget.fit][widget.estimator],
                     'parameters': self.parameters[name],
-                    'use_settings': self.parameterUse[name]
+                    'use_settings': self.parameterUse[name],
+                    'warm_start': widget.warm_start
                 }
             except KeyError:
                 continue
@@ -376,22 +379,29 @@ class FitConfigWidget(QtWidgets.QWidget):
 
     sigRemoveFit = QtCore.Signal(str)
 
-    def __init__(self, name, all_fits, fit=None, estimator=None):
+    def __init__(self, name, all_fits, fit=None, estimator=None, warm_start=False):
         """ Create a FitConfigWidget.
             @param name str: name of the fit
             @param all_fits dict: dict of all fits, their estimators and parameters
             @param fit str: optional name of fit function to be selected
             @param etimator str: optional name of estimator to be selected
+            @param warm_start bool: optional, start refits from the previous converged fit result
         """
         super().__init__()
         self.name = name
         self.fit = ''
         self.estimator = ''
+        self.warm_start = bool(warm_start)
         self.all_fits = all_fits
 
         self.nameLabel = QtWidgets.QLabel(name)
         self.fitComboBox = QtWidgets.QComboBox()
         self.estComboBox = QtWidgets.QComboBox()
+        self.warmStartCheckBox = QtWidgets.QCheckBox('Warm start')
+        self.warmStartCheckBox.setToolTip(
+            'Start refits from the parameters of the previous converged fit instead of the '
+            'estimator,\nas long as the x values, data shape and units do not change.')
+        self.warmStartCheckBox.setChecked(self.warm_start)
         self.delButton = QtWidgets.QToolButton()
 
         self.delIcon = QtGui.QIcon()
@@ -402,6 +412,7 @@ class FitConfigWidget(QtWidgets.QWidget):
         self._layout.addWidget(self.nameLabel)
         self._layout.addWidget(self.fitComboBox)
         self._layout.addWidget(self.estComboBox)
+        self._layout.addWidget(self.warmStartCheckBox)
         self._layout.addWidget(self.delButton)
 
         self.setLayout(self._layout)
@@ -450,6 +461,7 @@ class FitConfigWidget(QtWidgets.QWidget):
         """
         self.fit = self.fitComboBox.currentText()
         self.estimator = self.estComboBox.currentText()
+        self.warm_start = self.warmStartCheckBox.isChecked()
 
     def resetSettings(self):
         """ Restore widget contents from external variable.
@@ -458,6 +470,7 @@ class FitConfigWidget(QtWidgets.QWidget):
         self.fitChanged(self.fitComboBox.findText(self.fit))
         self.estComboBox.setCurrentIndex(self.estComboBox.findText(self.estimator))
         self.estimatorChanged(self.estComboBox.findText(self.estimator))
+        self.warmStartCheckBox.setChecked(self.warm_start)
 
     @QtCore.Slot()
     def removeWidget(self):
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the Qudi instrumentation widget class.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+from qtpy import QtCore
+from qtpy.QtWidgets import QWidget
+from qtpy import uic
+import os
+
+from core.instrumentation import instrumentation
+
+
+class InstrumentationModel(QtCore.QAbstractTableModel):
+    """ Table model of the timing statistics of the instrumented code.
+
+    The statistics are updated by calling refresh, e.g. from a timer of the GUI.
+    """
+    headers = ['Probe', 'Calls', 'Mean [ms]', 'Min [ms]', 'Max [ms]', 'Last [ms]', 'Total [s]',
+               'Duty cycle', 'Share of parent']
+
+    def __init__(self):
+        super().__init__()
+        self._rows = list()
+
+    @QtCore.Slot()
+    def refresh(self):
+        """ Read the current statistics.
+        """
+        probes = instrumentation.statistics()['probes']
+        rows = list()
+        for name, stats in sorted(probes.items()):
+            parent = name.rpartition('/')[0]
+            share = ''
+            if parent in probes and probes[parent]['total'] > 0:
+                share = '{0:.0%}'.format(stats['total'] / probes[parent]['total'])
+            rows.append([name,
+                         stats['calls'],
+                         '{0:.3f}'.format(stats['mean'] * 1e3),
+                         '{0:.3f}'.format(stats['min'] * 1e3),
+                         '{0:.3f}'.format(stats['max'] * 1e3),
+                         '{0:.3f}'.format(stats['last'] * 1e3),
+                         '{0:.3f}'.format(stats['total']),
+                         '{0:.0%}'.format(stats['duty_cycle']),
+                         share])
+        if len(rows) != len(self._rows) or [r[0] for r in rows] != [r[0] for r in self._rows]:
+            self.beginResetModel()
+            self._rows = rows
+            self.endResetModel()
+        elif rows:
+            self._rows = rows
+            self.dataChanged.emit(self.index(0, 1),
+                                  self.index(len(rows) - 1, len(self.headers) - 1))
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        """ Gives the number of probes.
+
+          @return int: number of probes
+        """
+        return len(self._rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        """ Gives the number of data fields of a probe.
+
+          @return int: number of probe data fields
+        """
+        return len(self.headers)
+
+    def data(self, index, role):
+        """ Get data from model for a given cell.
+
+          @param QModelIndex index: cell for which data is requested
+          @param ItemDataRole role: role for which data is requested
+
+          @return QVariant: data for given cell and role
+        """
+        if not index.isValid() or role != QtCore.Qt.DisplayRole:
+            return None
+        if not 0 <= index.row() < len(self._rows):
+            return None
+        return self._rows[index.row()][index.column()]
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        """ Data for the table view headers.
+
+          @param int section: number of the column to get header data for
+          @param Qt.Orientation: orientation of header (horizontal or vertical)
+          @param ItemDataRole: role for which to get data
+
+          @return QVariant: header data for given column and role
+        """
+        if role != QtCore.Qt.DisplayRole or orientation != QtCore.Qt.Horizontal:
+            return None
+        if not 0 <= section < len(self.headers):
+            return None
+        return self.headers[section]
+
+
+class InstrumentationWidget(QWidget):
+    """ This widget shows the timing statistics of the instrumented measurement loops.
+    """
+
+    def __init__(self):
+        super().__init__()
+        this_dir = os.path.dirname(__file__)
+        ui_file = os.path.join(this_dir, 'ui_instrumentationwidget.ui')
+
+        # Load it
+        uic.loadUi(ui_file, self)
+        self.model = InstrumentationModel()
+        self.probeTableView.setModel(self.model)
@@ -33,10 +33,18 @@ import sys
 
 class LogModel(QtCore.QAbstractTableModel):
     """ This is a Qt model that represents the log for dislpay in a QTableView.
+
+    The log entries are kept in a ring buffer of fixed capacity. When new entries are appended to
+    a full model, the oldest entries are removed first, so appending costs O(number of new
+    entries) independent of the log length.
+    Each entry is a list [name, timestamp, level, message, repeat], where repeat is the number of
+    coalesced equal log messages. It is shown in the message column if it is larger than one.
     """
 
-    def __init__(self, **kwargs):
+    def __init__(self, capacity=1000, **kwargs):
         """ Set up the model.
+
+          @param int capacity: maximum number of log entries stored in the model
         """
         super().__init__(**kwargs)
         self.header = ['Name', 'Time', 'Level', 'Message']
@@ -47,14 +55,50 @@ class LogModel(QtCore.QAbstractTableModel):
             'error':    QtGui.QColor('#F11'),
             'critical': QtGui.QColor('#FF00FF')
         }
-        self.entries = list()
+        self._capacity = max(1, int(capacity))
+        self._buffer = [None] * self._capacity
+        # buffer index of row 0
+        self._start = 0
+        self._count = 0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def entries(self):
+        """ List of all log entries, oldest first. """
+        return [self._entry(row) for row in range(self._count)]
+
+    def _entry(self, row):
+        return self._buffer[(self._start + row) % self._capacity]
+
+    def _reset_buffer(self, entries):
+        """ Store a list of entries (oldest first) without emitting any signals. """
+        entries = entries[-self._capacity:]
+        self._buffer = list(entries) + [None] * (self._capacity - len(entries))
+        self._start = 0
+        self._count = len(entries)
+
+    def setCapacity(self, capacity):
+        """ Change the maximum number of stored log entries. Discards the oldest entries if the
+            model holds more entries than the new capacity.
+
+          @param int capacity: maximum number of log entries stored in the model
+        """
+        capacity = max(1, int(capacity))
+        if self._count > capacity:
+            self.removeRows(0, self._count - capacity)
+        entries = self.entries
+        self._capacity = capacity
+        self._reset_buffer(entries)
 
     def rowCount(self, parent=QtCore.QModelIndex()):
         """ Gives th number of log entries  stored in the model.
 
           @return int: number of log entries stored
         """
-        return len(self.entries)
+        return self._count
 
     def columnCount(self, parent=QtCore.QModelIndex()):
         """ Gives the number of columns each log entry has.
@@ -82,18 +126,21 @@ class LogModel(QtCore.QAbstractTableModel):
 
           @return QVariant: data for given cell and role
         """
-        if not index.isValid():
+        if not index.isValid() or not 0 <= index.row() < self._count:
             return None
-        elif role == QtCore.Qt.TextColorRole:
+        entry = self._entry(index.row())
+        if role == QtCore.Qt.TextColorRole:
             try:
-                return self.fgColor[self.entries[index.row()][2]]
+                return self.fgColor[entry[2]]
             except KeyError:
-                print('fgcolor', self.entries[index.row()][2])
+                print('fgcolor', entry[2])
                 return QtGui.QColor('#FFF')
         elif role == QtCore.Qt.DisplayRole:
-            return self.entries[index.row()][index.column()]
+            if index.column() == 3 and entry[4] > 1:
+                return '{0} [repeated {1:d} times]'.format(entry[3], entry[4])
+            return entry[index.column()]
         elif role == QtCore.Qt.EditRole:
-            return self.entries[index.row()][index.column()]
+            return entry[index.column()]
         else:
             return None
 
@@ -109,7 +156,9 @@ class LogModel(QtCore.QAbstractTableModel):
         """
         if role == QtCore.Qt.EditRole:
             try:
-                self.entries[index.row()][index.column()] = value
+                if not 0 <= index.row() < self._count:
+                    raise IndexError('Log entry {0} does not exist.'.format(index.row()))
+                self._entry(index.row())[index.column()] = value
             except Exception as e:
                 print(e)
                 return False
@@ -145,13 +194,7 @@ class LogModel(QtCore.QAbstractTableModel):
 
           @return bool: True if insertion succeeded, False otherwise
         """
-        self.beginInsertRows(parent, row, row + count - 1)
-        insertion = list()
-        for ii in range(count):
-            insertion.append([None, None, None, None])
-        self.entries[row:row] = insertion
-        self.endInsertRows()
-        return True
+        return self.addRows(row, [[None, None, None, None, 1] for ii in range(count)], parent)
 
     def addRow(self, row, data, parent=QtCore.QModelIndex()):
         """ Add a single log entry to model.
@@ -164,34 +207,85 @@ class LogModel(QtCore.QAbstractTableModel):
         return self.addRows(row, [data], parent)
 
     def addRows(self, row, data, parent=QtCore.QModelIndex()):
-        """ Add a log entries to model.
+        """ Add a log entries to model. If the model is full, the oldest entries are removed.
+
           @param int row: row before which to insert log entry
           @param list data: log entries in list format (list of lists of
-                            4 elements)
+                            4 or 5 elements)
           @param QModelIndex parent: parent model index
 
           @return bool: True if adding entry succeede, False otherwise
         """
-        count = len(data)
-        self.beginInsertRows(parent, row, row + count - 1)
-        self.entries[row:row] = data
+        if not 0 <= row <= self._count:
+            return False
+        data = [list(entry) + [1] * (5 - len(entry)) for entry in data]
+        if not data:
+            return True
+        if row != self._count:
+            # insertion in the middle, rare and therefore not optimized
+            self.beginInsertRows(parent, row, row + len(data) - 1)
+            entries = self.entries
+            entries[row:row] = data
+            capacity = self._capacity
+            self._capacity = max(capacity, len(entries))
+            self._reset_buffer(entries)
+            self.endInsertRows()
+            self.setCapacity(capacity)
+            return True
+
+        data = data[-self._capacity:]
+        overflow = self._count + len(data) - self._capacity
+        if overflow > 0:
+            self.removeRows(0, overflow, parent)
+        first = self._count
+        self.beginInsertRows(parent, first, first + len(data) - 1)
+        for offset, entry in enumerate(data):
+            self._buffer[(self._start + first + offset) % self._capacity] = entry
+        self._count += len(data)
         self.endInsertRows()
-        topleft = self.createIndex(row, 0)
-        bottomright = self.createIndex(row, 3)
-        self.dataChanged.emit(topleft, bottomright)
         return True
 
+    def appendEntries(self, data):
+        """ Append log entries to the model. An entry equal to the newest entry in the model
+            (same name, level and message) is merged into it by adding up the repeat counters.
+
+          @param list data: log entries in list format (list of lists of 5 elements)
+
+          @return bool: True if adding entries succeeded, False otherwise
+        """
+        if data and self._count > 0:
+            last = self._entry(self._count - 1)
+            first = data[0]
+            if (last[0], last[2], last[3]) == (first[0], first[2], first[3]):
+                last[1] = first[1]
+                last[4] += first[4]
+                self.dataChanged.emit(self.createIndex(self._count - 1, 0),
+                                      self.createIndex(self._count - 1, 3))
+                data = data[1:]
+        return self.addRows(self._count, data)
+
     def removeRows(self, row, count, parent=QtCore.QModelIndex()):
         """ Remove rows (log entries) from model.
 
           @param int row: from which row on to remove rows
           @param int count: how many rows to remove
-          @param QModelIndex parent: parent model index
+          @param QModelIndex parent: patent model index
 
           @return bool: True if removal succeeded, False otherwise
         """
+        count = min(count, self._count - row)
+        if row < 0 or count <= 0:
+            return False
         self.beginRemoveRows(parent, row, row + count - 1)
-        self.entries[row:row + count] = []
+        if row == 0:
+            for ii in range(count):
+                self._buffer[(self._start + ii) % self._capacity] = None
+            self._start = (self._start + count) % self._capacity
+            self._count -= count
+        else:
+            entries = self.entries
+            entries[row:row + count] = []
+            self._reset_buffer(entries)
         self.endRemoveRows()
         return True
 
@@ -289,6 +383,7 @@ class LogWidget(QtWidgets.QWidget):
     """
     sigDisplayEntry = QtCore.Signal(object)  # for thread-safetyness
     sigAddEntry = QtCore.Signal(object)  # for thread-safetyness
+    sigAddEntries = QtCore.Signal(object)  # for thread-safetyness
     sigScrollToAnchor = QtCore.Signal(object)  # for internal use.
 
     def __init__(self, manager=None, **kwargs):
@@ -308,7 +403,7 @@ class LogWidget(QtWidgets.QWidget):
         self.logLength = 1000
 
         # Set up data model and visibility filter
-        self.model = LogModel()
+        self.model = LogModel(capacity=self.logLength)
         self.filtermodel = LogFilter()
         self.filtermodel.setSourceModel(self.model)
         self.output.setModel(self.filtermodel)
@@ -345,6 +440,7 @@ class LogWidget(QtWidgets.QWidget):
         self.sigDisplayEntry.connect(self.displayEntry,
                                      QtCore.Qt.QueuedConnection)
         self.sigAddEntry.connect(self.addEntry, QtCore.Qt.QueuedConnection)
+        self.sigAddEntries.connect(self.addEntries, QtCore.Qt.QueuedConnection)
         self.filterTree.itemChanged.connect(self.setCheckStates)
 
     def setManager(self, manager):
@@ -373,25 +469,33 @@ class LogWidget(QtWidgets.QWidget):
 
           @param dict entry: log entry in dict format
         """
+        self.addEntries([entry])
+
+    def addEntries(self, entries):
+        """Add several log entries to the log view at once.
+
+          @param list entries: log entries in dict format
+        """
         # All incoming messages begin here
         # for thread-safetyness:
         isGuiThread = QtCore.QThread.currentThread(
         ) == QtCore.QCoreApplication.instance().thread()
         if not isGuiThread:
-            self.sigAddEntry.emit(entry)
+            self.sigAddEntries.emit(entries)
             return
-        if self.model.rowCount() > self.logLength:
-            self.model.removeRows(0, self.model.rowCount() - self.logLength)
-        text = entry['message']
-        if entry.get('exception') is not None:
-            if 'reasons' in entry['exception']:
-                text += '\n' + entry['exception']['reasons']
-            if 'message' in entry['exception']:
-                text += '\n' + entry['exception']['message']
-            for line in entry['exception']['traceback']:
-                text += '\n' + str(line)
-        logEntry = [entry['name'], entry['timestamp'], entry['level'], text]
-        self.model.addRow(self.model.rowCount(), logEntry)
+        logEntries = list()
+        for entry in entries:
+            text = entry['message']
+            if entry.get('exception') is not None:
+                if 'reasons' in entry['exception']:
+                    text += '\n' + entry['exception']['reasons']
+                if 'message' in entry['exception']:
+                    text += '\n' + entry['exception']['message']
+                for line in entry['exception']['traceback']:
+                    text += '\n' + str(line)
+            logEntries.append([entry['name'], entry['timestamp'], entry['level'], text,
+                               entry.get('repeat', 1)])
+        self.model.appendEntries(logEntries)
         self.output.scrollToBottom()
 
     def displayEntry(self, entry):
@@ -410,6 +514,7 @@ class LogWidget(QtWidgets.QWidget):
         """
         if length > 0:
             self.logLength = length
+            self.model.setCapacity(length)
 
     def setCheckStates(self, item, column):
         """ Set state of the checkbox in the filter list and update log view.
@@ -25,6 +25,7 @@ import numpy as np
 import os
 
 from collections import OrderedDict
+from core.instrumentation import instrumentation
 from core.statusvariable import StatusVar
 from core.util.modules import get_main_dir
 from .errordialog import ErrorDialog
@@ -145,7 +146,7 @@ class ManagerGui(GUIBase):
         self._mw.logwidget.setManager(self._manager)
         for loghandler in logging.getLogger().handlers:
             if isinstance(loghandler, core.logger.QtLogHandler):
-                loghandler.sigLoggedMessage.connect(self.handleLogEntry)
+                loghandler.sigLoggedMessages.connect(self.handleLogEntries)
         # Module widgets
         self.sigStartModule.connect(self._manager.startModule)
         self.sigReloadModule.connect(self._manager.restartModuleRecursive)
@@ -164,6 +165,16 @@ class ManagerGui(GUIBase):
         self.startIPythonWidget()
         # thread widget
         self._mw.threadWidget.threadListView.setModel(self._manager.tm)
+        self._mw.threadWidget.poolTableView.setModel(self._manager.tm.pools)
+        self.checkTimer.timeout.connect(self._manager.tm.pools.refresh)
+        # instrumentation widget
+        widget = self._mw.instrumentationWidget
+        widget.enabledCheckBox.setChecked(instrumentation.enabled)
+        widget.enabledCheckBox.toggled.connect(self._manager.setInstrumentationEnabled)
+        widget.resetButton.clicked.connect(self._manager.resetInstrumentation)
+        widget.resetButton.clicked.connect(widget.model.refresh)
+        widget.dumpButton.clicked.connect(lambda: self._manager.dumpInstrumentation())
+        self.checkTimer.timeout.connect(widget.model.refresh)
         # remote widget
         # hide remote menu item if rpyc is not available
         self._mw.actionRemoteView.setVisible(self._manager.rm is not None)
@@ -184,6 +195,7 @@ class ManagerGui(GUIBase):
         self._mw.configDisplayDockWidget.hide()
         self._mw.remoteDockWidget.hide()
         self._mw.threadDockWidget.hide()
+        self._mw.instrumentationDockWidget.hide()
         self._mw.show()
 
     def on_deactivate(self):
@@ -240,26 +252,41 @@ class ManagerGui(GUIBase):
         self._mw.consoleDockWidget.setVisible(True)
         self._mw.remoteDockWidget.setVisible(False)
         self._mw.threadDockWidget.setVisible(False)
+        self._mw.instrumentationDockWidget.setVisible(False)
         self._mw.logDockWidget.setVisible(True)
 
         self._mw.actionConfigurationView.setChecked(False)
         self._mw.actionConsoleView.setChecked(True)
         self._mw.actionRemoteView.setChecked(False)
         self._mw.actionThreadsView.setChecked(False)
+        self._mw.actionInstrumentationView.setChecked(False)
         self._mw.actionLogView.setChecked(True)
 
         self._mw.configDisplayDockWidget.setFloating(False)
         self._mw.consoleDockWidget.setFloating(False)
         self._mw.remoteDockWidget.setFloating(False)
         self._mw.threadDockWidget.setFloating(False)
+        self._mw.instrumentationDockWidget.setFloating(False)
         self._mw.logDockWidget.setFloating(False)
 
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.configDisplayDockWidget)
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(2), self._mw.consoleDockWidget)
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.remoteDockWidget)
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.threadDockWidget)
+        self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.instrumentationDockWidget)
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.logDockWidget)
 
+    def handleLogEntries(self, entries):
+        """ Forward a batch of log entries to the log widget and show an error
+            popup for error messages.
+
+            @param list entries: Log entries
+        """
+        self._mw.logwidget.addEntries(entries)
+        for entry in entries:
+            if entry['level'] == 'error' or entry['level'] == 'critical':
+                self.errorDialog.show(entry)
+
     def handleLogEntry(self, entry):
         """ Forward log entry to log widget and show an error popup if it is
             an error message.
@@ -251,6 +251,7 @@ class PoiManagerGui(GUIBase):
     sigPoiNameTagChanged = QtCore.Signal(str)
     sigRoiNameChanged = QtCore.Signal(str)
     sigAddPoiByClick = QtCore.Signal(np.ndarray)
+    sigSelectPoiByClick = QtCore.Signal(np.ndarray, float)
 
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
@@ -495,6 +496,8 @@ class PoiManagerGui(GUIBase):
         self.sigPoiNameTagChanged.connect(
             self.poimanagerlogic().set_poi_nametag, QtCore.Qt.QueuedConnection)
         self.sigAddPoiByClick.connect(self.poimanagerlogic().add_poi, QtCore.Qt.QueuedConnection)
+        self.sigSelectPoiByClick.connect(self.poimanagerlogic().set_active_poi_from_position,
+                                         QtCore.Qt.QueuedConnection)
         return
 
     def __disconnect_control_signals_to_logic(self):
@@ -518,6 +521,7 @@ class PoiManagerGui(GUIBase):
         self.sigPoiNameChanged.disconnect()
         self.sigPoiNameTagChanged.disconnect()
         self.sigAddPoiByClick.disconnect()
+        self.sigSelectPoiByClick.disconnect()
         for marker in self._markers.values():
             marker.sigPoiSelected.disconnect()
         return
@@ -533,6 +537,7 @@ class PoiManagerGui(GUIBase):
         self._mw.load_roi_Action.triggered.connect(self.load_roi)
         self._mw.blink_correction_view_Action.triggered.connect(self.toggle_blink_correction)
         self._mw.poi_selector_Action.toggled.connect(self.toggle_poi_selector)
+        self.roi_image.sigMouseClicked.connect(self.select_poi_from_click)
         self._mw.roi_cb_centiles_RadioButton.toggled.connect(self.update_cb)
         self._mw.roi_cb_manual_RadioButton.toggled.connect(self.update_cb)
         self._mw.roi_cb_min_SpinBox.valueChanged.connect(self.update_cb_absolute)
@@ -551,6 +556,7 @@ class PoiManagerGui(GUIBase):
         self._mw.load_roi_Action.triggered.disconnect()
         self._mw.blink_correction_view_Action.triggered.disconnect()
         self._mw.poi_selector_Action.toggled.disconnect()
+        self.roi_image.sigMouseClicked.disconnect(self.select_poi_from_click)
         self._mw.roi_cb_centiles_RadioButton.toggled.disconnect()
         self._mw.roi_cb_manual_RadioButton.toggled.disconnect()
         self._mw.roi_cb_min_SpinBox.valueChanged.disconnect()
@@ -611,7 +617,7 @@ class PoiManagerGui(GUIBase):
                 self.roi_image.sigMouseClicked.connect(self.create_poi_from_click)
                 self.roi_image.setCursor(QtCore.Qt.CrossCursor)
             else:
-                self.roi_image.sigMouseClicked.disconnect()
+                self.roi_image.sigMouseClicked.disconnect(self.create_poi_from_click)
                 self.roi_image.setCursor(QtCore.Qt.ArrowCursor)
         self.__poi_selector_active = is_active
         return
@@ -629,6 +635,16 @@ class PoiManagerGui(GUIBase):
         self.sigAddPoiByClick.emit(new_pos)
         return
 
+    @QtCore.Slot(object, QtCore.QPointF)
+    def select_poi_from_click(self, button, pos):
+        # Clicks create new POIs while the POI selector is active
+        if button != QtCore.Qt.LeftButton or self.__poi_selector_active:
+            return
+        # Select the nearest POI in xy if the click is within one refocus scan size of it
+        self.sigSelectPoiByClick.emit(np.array([pos.x(), pos.y()]),
+                                      float(self.poimanagerlogic().optimise_xy_size))
+        return
+
     @QtCore.Slot(dict)
     def update_roi(self, roi_dict):
         if not isinstance(roi_dict, dict):
@@ -921,11 +937,15 @@ class PoiManagerGui(GUIBase):
         # Delete markers accordingly
         for name in names_to_delete:
             self._remove_poi_marker(name)
-        # Update positions of all remaining markers
+        # Update size and position of all remaining markers (only if they have changed)
         size = self.poimanagerlogic().optimise_xy_size * np.sqrt(2)
         for name, marker in self._markers.items():
-            marker.setSize((size, size))
-            marker.set_position(poi_dict[name])
+            position = poi_dict[name][:2]
+            size_changed = marker.size()[0] != size
+            if size_changed:
+                marker.setSize((size, size))
+            if size_changed or np.any(marker.position[:2] != position):
+                marker.set_position(position)
         # Add new markers
         for name in names_to_add:
             self._add_poi_marker(name=name, position=poi_dict[name])
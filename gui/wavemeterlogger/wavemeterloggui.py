@@ -22,7 +22,6 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 
 
 import datetime
-import numpy as np
 import os
 import pyqtgraph as pg
 import pyqtgraph.exporters
@@ -206,9 +205,9 @@ class WavemeterLogGui(GUIBase):
                 - 6.0e17 / (self._wm_logger_logic.get_max_wavelength() + self._wm_logger_logic.get_min_wavelength())
             )
 
-        plotdata = np.array(self._wm_logger_logic.counts_with_wavelength)
-        if len(plotdata.shape) > 1 and plotdata.shape[1] == 3:
-            self.curve_data_points.setData(plotdata[:, 2:0:-1])
+        plotdata = self._wm_logger_logic.counts_with_wavelength
+        if len(plotdata) > 0:
+            self.curve_data_points.setData(x=plotdata[:, 2], y=plotdata[:, 1])
 
         self.curve_nm_counts.setData(x=x_axis, y=self._wm_logger_logic.histogram)
         self.curve_hz_counts.setData(x=x_axis_hz, y=self._wm_logger_logic.histogram)
@@ -24,14 +24,21 @@ from collections import OrderedDict
 from copy import copy
 import time
 import datetime
+import tempfile
+import weakref
+import zlib
 import numpy as np
-import matplotlib as mpl
-import matplotlib.pyplot as plt
 
 from logic.generic_logic import GenericLogic
 from core.util.mutex import Mutex
 from core.connector import Connector
+from core.instrumentation import instrumentation
+from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
+from core.util.lazy_import import lazy_import
+
+mpl = lazy_import('matplotlib')
+plt = lazy_import('matplotlib.pyplot')
 
 
 class OldConfigFileError(Exception):
@@ -41,6 +48,418 @@ class OldConfigFileError(Exception):
         super().__init__('Old configuration file detected. Ignoring confocal history.')
 
 
+class ConfocalImage:
+    """ Scan image of a confocal scan.
+
+    Pixel coordinates are not stored per pixel but implicitly as axis vectors: one for the
+    horizontal (scan line) axis, one for the vertical (line stepping) axis and one for the
+    remaining fixed axis holding one value per line (e.g. the z position of each line in an xy
+    scan).
+    The count data is stored per channel in an array of shape (channels, lines, pixels) so the
+    image of each channel is contiguous in memory. For large images this array can be memory-mapped
+    to a temporary file.
+
+    Snapshots (see ConfocalImageSnapshot) can be registered with an image. Before a scan line is
+    overwritten its old content is handed to all registered snapshots that do not have it yet.
+    """
+
+    # Index of the horizontal, vertical and fixed axis in (x, y, z) for each scan plane
+    _plane_axes = {'xy': (0, 1, 2), 'xz': (0, 2, 1), 'yz': (1, 2, 0)}
+
+    def __init__(self, plane, horizontal_axis, vertical_axis, fixed_axis, channel_number,
+                 memmap_threshold=None, memmap_dir=None):
+        """
+        @param str plane: scan plane, one of 'xy', 'xz' or 'yz'
+        @param numpy.ndarray horizontal_axis: position values along a scan line (pixels)
+        @param numpy.ndarray vertical_axis: position values for each scan line
+        @param fixed_axis: position value(s) of the third axis. Scalar or one value per line.
+        @param int channel_number: number of count channels
+        @param int memmap_threshold: optional, memory-map the count data if it needs more bytes
+        @param str memmap_dir: optional, directory for the memory-mapped file (default: temp dir)
+        """
+        if plane not in self._plane_axes:
+            raise ValueError('Unknown scan plane "{0}". Valid planes are {1}.'
+                             ''.format(plane, tuple(self._plane_axes)))
+        self.plane = plane
+        self.horizontal_axis = np.array(horizontal_axis, dtype=np.float64)
+        self.vertical_axis = np.array(vertical_axis, dtype=np.float64)
+        self.fixed_axis = np.empty(self.vertical_axis.size, dtype=np.float64)
+        self.fixed_axis[:] = fixed_axis
+
+        self._memmap_threshold = memmap_threshold
+        self._memmap_dir = memmap_dir
+        self._memmap_file = None
+        # zlib compressed count data. If set, self._counts is None.
+        self._compressed_counts = None
+        self._snapshots = weakref.WeakSet()
+        self._shape = (channel_number, self.vertical_axis.size, self.horizontal_axis.size)
+        nbytes = int(np.prod(self._shape)) * np.dtype(np.float64).itemsize
+        if memmap_threshold is not None and nbytes > memmap_threshold:
+            # The temporary file is deleted as soon as it is closed, i.e. when this object is gone
+            self._memmap_file = tempfile.TemporaryFile(dir=memmap_dir)
+            self._counts = np.memmap(
+                self._memmap_file, dtype=np.float64, mode='w+', shape=self._shape)
+        else:
+            self._counts = np.zeros(self._shape, dtype=np.float64)
+
+    @classmethod
+    def from_legacy_array(cls, image, plane, **kwargs):
+        """ Create an image from the old-style array of shape (lines, pixels, 3 + channels) holding
+        x, y, z and counts for every pixel.
+
+        @param numpy.ndarray image: old-style image array
+        @param str plane: scan plane, one of 'xy', 'xz' or 'yz'
+
+        @return ConfocalImage: new image instance
+        """
+        h_index, v_index, f_index = cls._plane_axes[plane]
+        new_image = cls(plane=plane,
+                        horizontal_axis=image[0, :, h_index],
+                        vertical_axis=image[:, 0, v_index],
+                        fixed_axis=image[:, 0, f_index],
+                        channel_number=image.shape[2] - 3,
+                        **kwargs)
+        new_image.counts[...] = np.moveaxis(image[:, :, 3:], 2, 0)
+        return new_image
+
+    @property
+    def counts(self):
+        """ Count data array of shape (channels, lines, pixels). Decompressed on first access if
+        the image has been compressed.
+        """
+        if self._counts is None:
+            self._counts = np.frombuffer(bytearray(zlib.decompress(self._compressed_counts)),
+                                         dtype=np.float64).reshape(self._shape)
+            self._compressed_counts = None
+        return self._counts
+
+    @property
+    def shape(self):
+        """ (lines, pixels, channels) """
+        return self._shape[1], self._shape[2], self._shape[0]
+
+    @property
+    def axis_indices(self):
+        """ Indices of the horizontal, vertical and fixed axis in (x, y, z) """
+        return self._plane_axes[self.plane]
+
+    @property
+    def is_memmapped(self):
+        return self._memmap_file is not None
+
+    @property
+    def is_compressed(self):
+        return self._compressed_counts is not None
+
+    @property
+    def nbytes(self):
+        """ Number of bytes occupied by the count data (compressed size if compressed). """
+        if self._compressed_counts is not None:
+            return len(self._compressed_counts)
+        return self._counts.nbytes
+
+    def compress(self):
+        """ Compress the count data in memory until it is accessed the next time.
+        Memory-mapped images are not compressed.
+        """
+        if self._counts is None or self.is_memmapped:
+            return
+        self._compressed_counts = zlib.compress(self._counts.tobytes(), 1)
+        self._counts = None
+
+    def register_snapshot(self, snapshot):
+        """ Register a snapshot that needs the old content of lines before they are overwritten.
+
+        @param ConfocalImageSnapshot snapshot: the snapshot to register
+        """
+        self._snapshots.add(snapshot)
+
+    def _save_line_for_snapshots(self, line):
+        """ Hand the current content of a line to all snapshots that do not have it yet. """
+        fixed_position = None
+        counts = None
+        for snapshot in self._snapshots:
+            if not snapshot.has_line(line):
+                if counts is None:
+                    fixed_position = self.fixed_axis[line]
+                    counts = self.counts[:, line, :].copy()
+                snapshot.save_line(line, fixed_position, counts)
+
+    def copy(self):
+        """ Returns a deep copy of this image. Memory-mapped images are copied into a new file. """
+        threshold = 0 if self.is_memmapped else None
+        new_image = ConfocalImage(plane=self.plane,
+                                  horizontal_axis=self.horizontal_axis,
+                                  vertical_axis=self.vertical_axis,
+                                  fixed_axis=self.fixed_axis,
+                                  channel_number=self.counts.shape[0],
+                                  memmap_threshold=threshold,
+                                  memmap_dir=self._memmap_dir)
+        new_image.counts[...] = self.counts
+        return new_image
+
+    def channel_image(self, channel):
+        """ View on the count data image of a single channel.
+
+        @param int channel: index of the count channel
+
+        @return numpy.ndarray: count data of shape (lines, pixels)
+        """
+        return self.counts[channel]
+
+    def set_line_counts(self, line, counts):
+        """ Write the counts of a scanned line into the image.
+
+        @param int line: index of the scan line
+        @param numpy.ndarray counts: count data of shape (pixels, channels) as returned by the
+                                     scanner hardware
+        """
+        self._save_line_for_snapshots(line)
+        self.counts[:, line, :] = np.transpose(counts)
+
+    def set_fixed_position(self, line, position):
+        """ Set the position of the fixed axis for a scan line.
+
+        @param int line: index of the scan line
+        @param float position: new position of the fixed axis
+        """
+        self._save_line_for_snapshots(line)
+        self.fixed_axis[line] = position
+
+    def line_positions(self, line):
+        """ Positions of all pixels of a scan line.
+
+        @param int line: index of the scan line
+
+        @return numpy.ndarray: array of shape (3, pixels) with x, y and z positions
+        """
+        h_index, v_index, f_index = self._plane_axes[self.plane]
+        positions = np.empty((3, self.horizontal_axis.size), dtype=np.float64)
+        positions[h_index] = self.horizontal_axis
+        positions[v_index] = self.vertical_axis[line]
+        positions[f_index] = self.fixed_axis[line]
+        return positions
+
+    def pixel_position(self, line, pixel):
+        """ Position of a single pixel.
+
+        @param int line: index of the scan line
+        @param int pixel: index of the pixel within the scan line
+
+        @return tuple: x, y and z position of the pixel
+        """
+        h_index, v_index, f_index = self._plane_axes[self.plane]
+        position = [0.0, 0.0, 0.0]
+        position[h_index] = self.horizontal_axis[pixel]
+        position[v_index] = self.vertical_axis[line]
+        position[f_index] = self.fixed_axis[line]
+        return tuple(position)
+
+    def block_positions(self, start, stop):
+        """ Positions of all pixels in a block of scan lines.
+
+        @param int start: index of the first line in the block
+        @param int stop: index after the last line in the block
+
+        @return tuple: three arrays of shape (stop - start, pixels) with x, y and z positions
+        """
+        h_index, v_index, f_index = self._plane_axes[self.plane]
+        shape = (len(self.vertical_axis[start:stop]), self.horizontal_axis.size)
+        positions = [None, None, None]
+        positions[h_index] = np.broadcast_to(self.horizontal_axis, shape)
+        positions[v_index] = np.broadcast_to(self.vertical_axis[start:stop, np.newaxis], shape)
+        positions[f_index] = np.broadcast_to(self.fixed_axis[start:stop, np.newaxis], shape)
+        return tuple(positions)
+
+    def iter_line_blocks(self, max_bytes=16 * 2**20):
+        """ Iterate over the image in blocks of lines for streaming the data.
+
+        @param int max_bytes: approximate maximum size of the raw data (positions and counts) of a
+                              single block
+
+        @return generator: yields (start, stop) line indices of each block
+        """
+        lines, pixels, channels = self.shape
+        line_bytes = max(1, pixels * (3 + channels) * np.dtype(np.float64).itemsize)
+        block_lines = max(1, int(max_bytes // line_bytes))
+        for start in range(0, lines, block_lines):
+            yield start, min(start + block_lines, lines)
+
+    def to_legacy_array(self):
+        """ Returns the image as old-style array of shape (lines, pixels, 3 + channels) holding
+        x, y, z and counts for every pixel. Expensive for large images.
+
+        @return numpy.ndarray: old-style image array
+        """
+        lines, pixels, channels = self.shape
+        image = np.empty((lines, pixels, 3 + channels), dtype=np.float64)
+        for index, positions in enumerate(self.block_positions(0, lines)):
+            image[:, :, index] = positions
+        image[:, :, 3:] = np.moveaxis(self.counts, 0, 2)
+        return image
+
+
+class ConfocalImageSnapshot:
+    """ Frozen state of a ConfocalImage for the confocal history.
+
+    The snapshot shares all buffers with the image it was taken from. Scan lines of that image that
+    are overwritten later on (e.g. when a scan is continued) are copied into the snapshot right
+    before they change (copy-on-write), so only changed lines occupy additional memory.
+    """
+
+    def __init__(self, image):
+        """
+        @param ConfocalImage image: the image to take the snapshot of
+        """
+        self.image = image
+        # line index -> (fixed axis position, counts of shape (channels, pixels))
+        self._saved_lines = dict()
+        image.register_snapshot(self)
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    @property
+    def plane(self):
+        return self.image.plane
+
+    @property
+    def nbytes(self):
+        """ Number of bytes occupied by the saved lines, not including the shared image. """
+        return sum(counts.nbytes for _, counts in self._saved_lines.values())
+
+    def has_line(self, line):
+        return line in self._saved_lines
+
+    def save_line(self, line, fixed_position, counts):
+        """ Keep the old content of a line that is about to be overwritten in the image.
+
+        @param int line: index of the scan line
+        @param float fixed_position: old position of the fixed axis for this line
+        @param numpy.ndarray counts: old counts of shape (channels, pixels). Must not be altered.
+        """
+        self._saved_lines[line] = (fixed_position, counts)
+
+    def get_image(self):
+        """ Returns the image in the state the snapshot was taken in.
+
+        @return ConfocalImage: the shared image if no line has changed since, a new image otherwise
+        """
+        if not self._saved_lines:
+            return self.image
+        image = self.image.copy()
+        for line, (fixed_position, counts) in self._saved_lines.items():
+            image.fixed_axis[line] = fixed_position
+            image.counts[:, line, :] = counts
+        return image
+
+    def to_legacy_array(self):
+        return self.get_image().to_legacy_array()
+
+
+class ConfocalScanPlan:
+    """ Scanner paths for all lines of a confocal scan.
+
+    Like ConfocalImage the plan keeps the pixel coordinates implicit: the horizontal and vertical
+    axis vectors and the position of the fixed axis for each line. The path of a scan line or
+    return line is written into one of two buffers of shape (axes_number, pixels) and
+    (axes_number, return_slowness), which are allocated once when a scan is (re)started. Only the
+    rows of the vertical and fixed axis change from line to line.
+    A returned path is only valid until the next call of the same method, so the scanner must not
+    keep a reference to it.
+    Tilt correction is not part of the plan since it is applied by the scanner (interfuse) itself.
+    """
+
+    def __init__(self, image, axes_number, return_slowness, a_position=0.0):
+        """
+        @param ConfocalImage image: the image to scan
+        @param int axes_number: number of scanner axes (length of the first path dimension)
+        @param int return_slowness: number of steps of return lines and of the start line
+        @param float a_position: position of the fourth scanner axis (if present)
+        """
+        self.axes_number = axes_number
+        self.return_slowness = return_slowness
+        self._horizontal_index, self._vertical_index, self._fixed_index = image.axis_indices
+        self._vertical_axis = image.vertical_axis.copy()
+        self._fixed_positions = image.fixed_axis.copy()
+        self._first_pixel = image.horizontal_axis[0]
+
+        self._scan_path = np.empty((axes_number, image.horizontal_axis.size), dtype=np.float64)
+        self._return_path = np.empty((axes_number, return_slowness), dtype=np.float64)
+        self._scan_path[3:] = a_position
+        self._return_path[3:] = a_position
+        # Return lines go back along the horizontal axis to the first pixel of the scanned line
+        if self._horizontal_index < axes_number:
+            self._scan_path[self._horizontal_index] = image.horizontal_axis
+            self._return_path[self._horizontal_index] = np.linspace(
+                image.horizontal_axis[-1], image.horizontal_axis[0], return_slowness)
+
+    def set_fixed_position(self, line, position):
+        """ Update the position of the fixed axis of a scan line and its return line.
+
+        @param int line: index of the scan line
+        @param float position: new position of the fixed axis
+        """
+        self._fixed_positions[line] = position
+
+    def _set_line_rows(self, path, line):
+        """ Write the positions of the vertical and fixed axis of a scan line into a path. """
+        if self._vertical_index < self.axes_number:
+            path[self._vertical_index] = self._vertical_axis[line]
+        if self._fixed_index < self.axes_number:
+            path[self._fixed_index] = self._fixed_positions[line]
+        return path
+
+    def scan_path(self, line):
+        """ Path of a scan line.
+
+        @param int line: index of the scan line
+
+        @return numpy.ndarray: path of shape (axes_number, pixels), valid until the next call
+        """
+        return self._set_line_rows(self._scan_path, line)
+
+    def return_path(self, line):
+        """ Path from the last pixel back to the first pixel of a scan line.
+
+        @param int line: index of the scan line
+
+        @return numpy.ndarray: path of shape (axes_number, return_slowness), valid until the next
+                               call
+        """
+        return self._set_line_rows(self._return_path, line)
+
+    def first_pixel(self, line):
+        """ Position of the first pixel of a scan line.
+
+        @param int line: index of the scan line
+
+        @return list: position with axes_number entries
+        """
+        position = [self._scan_path[axis, 0] for axis in range(self.axes_number)]
+        if self._horizontal_index < self.axes_number:
+            position[self._horizontal_index] = self._first_pixel
+        if self._vertical_index < self.axes_number:
+            position[self._vertical_index] = self._vertical_axis[line]
+        if self._fixed_index < self.axes_number:
+            position[self._fixed_index] = self._fixed_positions[line]
+        return position
+
+    def get_start_path(self, line, position):
+        """ Path from a position to the first pixel of a scan line.
+
+        @param int line: index of the scan line
+        @param list position: the position to start from (at least axes_number entries)
+
+        @return numpy.ndarray: path of shape (axes_number, return_slowness)
+        """
+        path = np.empty((self.axes_number, self.return_slowness), dtype=np.float64)
+        for axis, target in enumerate(self.first_pixel(line)):
+            path[axis] = np.linspace(position[axis], target, self.return_slowness)
+        return path
+
+
 class ConfocalHistoryEntry(QtCore.QObject):
     """ This class contains all relevant parameters of a Confocal scan.
         It provides methods to extract, restore and serialize this data.
@@ -132,18 +551,19 @@ class ConfocalHistoryEntry(QtCore.QObject):
 
         confocal.initialize_image()
         try:
-            if confocal.xy_image.shape == self.xy_image.shape:
-                confocal.xy_image = np.copy(self.xy_image)
+            if confocal.xy_image_data.shape == self.xy_image_snapshot.shape:
+                confocal.xy_image_data = self.xy_image_snapshot.get_image()
         except AttributeError:
-            self.xy_image = np.copy(confocal.xy_image)
+            self.xy_image_snapshot = ConfocalImageSnapshot(confocal.xy_image_data)
 
         confocal._zscan = True
         confocal.initialize_image()
         try:
-            if confocal.depth_image.shape == self.depth_image.shape:
-                confocal.depth_image = np.copy(self.depth_image)
+            if (confocal.depth_image_data.shape == self.depth_image_snapshot.shape
+                    and confocal.depth_image_data.plane == self.depth_image_snapshot.plane):
+                confocal.depth_image_data = self.depth_image_snapshot.get_image()
         except AttributeError:
-            self.depth_image = np.copy(confocal.depth_image)
+            self.depth_image_snapshot = ConfocalImageSnapshot(confocal.depth_image_data)
         confocal._zscan = False
 
     def snapshot(self, confocal):
@@ -172,8 +592,8 @@ class ConfocalHistoryEntry(QtCore.QObject):
         self.point1 = np.copy(confocal.point1)
         self.point2 = np.copy(confocal.point2)
         self.point3 = np.copy(confocal.point3)
-        self.xy_image = np.copy(confocal.xy_image)
-        self.depth_image = np.copy(confocal.depth_image)
+        self.xy_image_snapshot = ConfocalImageSnapshot(confocal.xy_image_data)
+        self.depth_image_snapshot = ConfocalImageSnapshot(confocal.depth_image_data)
 
     def serialize(self):
         """ Give out a dictionary that can be saved via the usual means """
@@ -197,8 +617,8 @@ class ConfocalHistoryEntry(QtCore.QObject):
         serialized['tilt_point3'] = list(self.point3)
         serialized['tilt_reference'] = [self.tilt_reference_x, self.tilt_reference_y]
         serialized['tilt_slope'] = [self.tilt_slope_x, self.tilt_slope_y]
-        serialized['xy_image'] = self.xy_image
-        serialized['depth_image'] = self.depth_image
+        serialized['xy_image'] = self.xy_image_snapshot.to_legacy_array()
+        serialized['depth_image'] = self.depth_image_snapshot.to_legacy_array()
         return serialized
 
     def deserialize(self, serialized):
@@ -238,12 +658,14 @@ class ConfocalHistoryEntry(QtCore.QObject):
             self.point3 = np.array(serialized['tilt_point3'])
         if 'xy_image' in serialized:
             if isinstance(serialized['xy_image'], np.ndarray):
-                self.xy_image = serialized['xy_image']
+                self.xy_image_snapshot = ConfocalImageSnapshot(
+                    ConfocalImage.from_legacy_array(serialized['xy_image'], 'xy'))
             else:
                 raise OldConfigFileError()
         if 'depth_image' in serialized:
             if isinstance(serialized['depth_image'], np.ndarray):
-                self.depth_image = serialized['depth_image'].copy()
+                self.depth_image_snapshot = ConfocalImageSnapshot(ConfocalImage.from_legacy_array(
+                    serialized['depth_image'], 'xz' if self.depth_img_is_xz else 'yz'))
             else:
                 raise OldConfigFileError()
 
@@ -257,6 +679,16 @@ class ConfocalLogic(GenericLogic):
     confocalscanner1 = Connector(interface='ConfocalScannerInterface')
     savelogic = Connector(interface='SaveLogic')
 
+    # config options
+    # Scan images with count data larger than this number of bytes are memory-mapped to a file
+    _image_memmap_threshold = ConfigOption('image_memmap_threshold', 2**30)
+    _image_memmap_dir = ConfigOption('image_memmap_directory', None)
+    # Maximum number of bytes the image data of the scan history may occupy in addition to the
+    # current images. The oldest entries are dropped first.
+    _history_memory_budget = ConfigOption('history_memory_budget', 512 * 2**20)
+    # If set, the images of history entries older than this number of entries are compressed
+    _history_compression_age = ConfigOption('history_compression_age', None)
+
     # status vars
     _clock_frequency = StatusVar('clock_frequency', 500)
     return_slowness = StatusVar(default=50)
@@ -485,85 +917,62 @@ class ConfocalLogic(GenericLogic):
                 self._Y = np.linspace(y1, y2, max(self.xy_resolution, 2))
                 self._X = np.linspace(x1, x2, max(int(self.xy_resolution*(x2-x1)/(y2-y1)), 2))
 
-        self._XL = self._X
-        self._YL = self._Y
-        self._AL = np.zeros(self._XL.shape)
-
-        # Arrays for retrace line
-        self._return_XL = np.linspace(self._XL[-1], self._XL[0], self.return_slowness)
-        self._return_AL = np.zeros(self._return_XL.shape)
-
         if self._zscan:
             self._image_vert_axis = self._Z
             # update image scan direction from setting
             self.depth_img_is_xz = self.depth_scan_dir_is_xz
             # depth scan is in xz plane
             if self.depth_img_is_xz:
-                #self._image_horz_axis = self._X
-                # creates an image where each pixel will be [x,y,z,counts]
-                self.depth_image = np.zeros((
-                        len(self._image_vert_axis),
-                        len(self._X),
-                        3 + len(self.get_scanner_count_channels())
-                    ))
-
-                self.depth_image[:, :, 0] = np.full(
-                    (len(self._image_vert_axis), len(self._X)), self._XL)
-
-                self.depth_image[:, :, 1] = self._current_y * np.ones(
-                    (len(self._image_vert_axis), len(self._X)))
-
-                z_value_matrix = np.full((len(self._X), len(self._image_vert_axis)), self._Z)
-                self.depth_image[:, :, 2] = z_value_matrix.transpose()
-
+                self.depth_image_data = ConfocalImage(
+                    plane='xz',
+                    horizontal_axis=self._X,
+                    vertical_axis=self._Z,
+                    fixed_axis=self._current_y,
+                    channel_number=len(self.get_scanner_count_channels()),
+                    memmap_threshold=self._image_memmap_threshold,
+                    memmap_dir=self._image_memmap_dir)
             # depth scan is yz plane instead of xz plane
             else:
-                #self._image_horz_axis = self._Y
-                # creats an image where each pixel will be [x,y,z,counts]
-                self.depth_image = np.zeros((
-                        len(self._image_vert_axis),
-                        len(self._Y),
-                        3 + len(self.get_scanner_count_channels())
-                    ))
-
-                self.depth_image[:, :, 0] = self._current_x * np.ones(
-                    (len(self._image_vert_axis), len(self._Y)))
-
-                self.depth_image[:, :, 1] = np.full(
-                    (len(self._image_vert_axis), len(self._Y)), self._YL)
-
-                z_value_matrix = np.full((len(self._Y), len(self._image_vert_axis)), self._Z)
-                self.depth_image[:, :, 2] = z_value_matrix.transpose()
-
-                # now we are scanning along the y-axis, so we need a new return line along Y:
-                self._return_YL = np.linspace(self._YL[-1], self._YL[0], self.return_slowness)
-                self._return_AL = np.zeros(self._return_YL.shape)
+                self.depth_image_data = ConfocalImage(
+                    plane='yz',
+                    horizontal_axis=self._Y,
+                    vertical_axis=self._Z,
+                    fixed_axis=self._current_x,
+                    channel_number=len(self.get_scanner_count_channels()),
+                    memmap_threshold=self._image_memmap_threshold,
+                    memmap_dir=self._image_memmap_dir)
 
             self.sigImageDepthInitialized.emit()
 
         # xy scan is in xy plane
         else:
-            #self._image_horz_axis = self._X
             self._image_vert_axis = self._Y
-            # creats an image where each pixel will be [x,y,z,counts]
-            self.xy_image = np.zeros((
-                    len(self._image_vert_axis),
-                    len(self._X),
-                    3 + len(self.get_scanner_count_channels())
-                ))
-
-            self.xy_image[:, :, 0] = np.full(
-                (len(self._image_vert_axis), len(self._X)), self._XL)
-
-            y_value_matrix = np.full((len(self._X), len(self._image_vert_axis)), self._Y)
-            self.xy_image[:, :, 1] = y_value_matrix.transpose()
-
-            self.xy_image[:, :, 2] = self._current_z * np.ones(
-                (len(self._image_vert_axis), len(self._X)))
+            self.xy_image_data = ConfocalImage(
+                plane='xy',
+                horizontal_axis=self._X,
+                vertical_axis=self._Y,
+                fixed_axis=self._current_z,
+                channel_number=len(self.get_scanner_count_channels()),
+                memmap_threshold=self._image_memmap_threshold,
+                memmap_dir=self._image_memmap_dir)
 
             self.sigImageXYInitialized.emit()
         return 0
 
+    @property
+    def xy_image(self):
+        """ Old-style xy image array of shape (lines, pixels, 3 + channels) holding x, y, z and
+        counts for every pixel. Built on each access, use xy_image_data where possible.
+        """
+        return self.xy_image_data.to_legacy_array()
+
+    @property
+    def depth_image(self):
+        """ Old-style depth image array of shape (lines, pixels, 3 + channels) holding x, y, z and
+        counts for every pixel. Built on each access, use depth_image_data where possible.
+        """
+        return self.depth_image_data.to_legacy_array()
+
     def start_scanner(self):
         """Setting up the scanner device and starts the scanning procedure
 
@@ -576,6 +985,7 @@ class ConfocalLogic(GenericLogic):
             self._scanning_device.module_state.unlock()
             self.module_state.unlock()
             return -1
+        self._create_scan_plan()
 
         clock_status = self._scanning_device.set_up_scanner_clock(
             clock_frequency=self._clock_frequency)
@@ -605,6 +1015,7 @@ class ConfocalLogic(GenericLogic):
         """
         self.module_state.lock()
         self._scanning_device.module_state.lock()
+        self._create_scan_plan()
 
         clock_status = self._scanning_device.set_up_scanner_clock(
             clock_frequency=self._clock_frequency)
@@ -627,6 +1038,15 @@ class ConfocalLogic(GenericLogic):
         self.signal_scan_lines_next.emit()
         return 0
 
+    def _create_scan_plan(self):
+        """ Precompute the scanner paths for all lines of the current scan image. """
+        image = self.depth_image_data if self._zscan else self.xy_image_data
+        self._scan_plan = ConfocalScanPlan(image=image,
+                                           axes_number=len(self.get_scanner_axes()),
+                                           return_slowness=self.return_slowness,
+                                           a_position=self._current_a)
+        return
+
     def kill_scanner(self):
         """Closing the scanner device.
 
@@ -712,6 +1132,7 @@ class ConfocalLogic(GenericLogic):
         """
         return self._scanning_device.get_scanner_count_channels()
 
+    @instrumentation.timed()
     def _scan_line(self):
         """scanning an image in either depth or xy
 
@@ -733,103 +1154,54 @@ class ConfocalLogic(GenericLogic):
                 new_history = ConfocalHistoryEntry(self)
                 new_history.snapshot(self)
                 self.history.append(new_history)
-                if len(self.history) > self.max_history_length:
-                    self.history.pop(0)
+                self._trim_history()
                 self.history_index = len(self.history) - 1
                 return
 
-        image = self.depth_image if self._zscan else self.xy_image
-        n_ch = len(self.get_scanner_axes())
-        s_ch = len(self.get_scanner_count_channels())
+        image = self.depth_image_data if self._zscan else self.xy_image_data
+        plan = self._scan_plan
 
         try:
             if self._scan_counter == 0:
-                # make a line from the current cursor position to
-                # the starting position of the first scan line of the scan
-                rs = self.return_slowness
-                lsx = np.linspace(self._current_x, image[self._scan_counter, 0, 0], rs)
-                lsy = np.linspace(self._current_y, image[self._scan_counter, 0, 1], rs)
-                lsz = np.linspace(self._current_z, image[self._scan_counter, 0, 2], rs)
-                if n_ch <= 3:
-                    start_line = np.vstack([lsx, lsy, lsz][0:n_ch])
-                else:
-                    start_line = np.vstack(
-                        [lsx, lsy, lsz, np.ones(lsx.shape) * self._current_a])
-                # move to the start position of the scan, counts are thrown away
-                start_line_counts = self._scanning_device.scan_line(start_line)
+                # move from the current cursor position to the start position of the first scan
+                # line of the scan, counts are thrown away
+                start_line = plan.get_start_path(
+                    0, (self._current_x, self._current_y, self._current_z, self._current_a))
+                with instrumentation.measure('hardware'):
+                    start_line_counts = self._scanning_device.scan_line(start_line)
                 if np.any(start_line_counts == -1):
                     self.stopRequested = True
                     self.signal_scan_lines_next.emit()
                     return
 
-            # adjust z of line in image to current z before building the line
+            # adjust z of line in image to current z before scanning the line
             if not self._zscan:
-                z_shape = image[self._scan_counter, :, 2].shape
-                image[self._scan_counter, :, 2] = self._current_z * np.ones(z_shape)
-
-            # make a line in the scan, _scan_counter says which one it is
-            lsx = image[self._scan_counter, :, 0]
-            lsy = image[self._scan_counter, :, 1]
-            lsz = image[self._scan_counter, :, 2]
-            if n_ch <= 3:
-                line = np.vstack([lsx, lsy, lsz][0:n_ch])
-            else:
-                line = np.vstack(
-                    [lsx, lsy, lsz, np.ones(lsx.shape) * self._current_a])
+                image.set_fixed_position(self._scan_counter, self._current_z)
+                plan.set_fixed_position(self._scan_counter, self._current_z)
 
-            # scan the line in the scan
-            line_counts = self._scanning_device.scan_line(line, pixel_clock=True)
+            # scan the line in the scan, _scan_counter says which one it is
+            with instrumentation.measure('hardware'):
+                line_counts = self._scanning_device.scan_line(
+                    plan.scan_path(self._scan_counter), pixel_clock=True)
             if np.any(line_counts == -1):
                 self.stopRequested = True
                 self.signal_scan_lines_next.emit()
                 return
 
-            # make a line to go to the starting position of the next scan line
-            if self.depth_img_is_xz or not self._zscan:
-                if n_ch <= 3:
-                    return_line = np.vstack([
-                        self._return_XL,
-                        image[self._scan_counter, 0, 1] * np.ones(self._return_XL.shape),
-                        image[self._scan_counter, 0, 2] * np.ones(self._return_XL.shape)
-                    ][0:n_ch])
-                else:
-                    return_line = np.vstack([
-                            self._return_XL,
-                            image[self._scan_counter, 0, 1] * np.ones(self._return_XL.shape),
-                            image[self._scan_counter, 0, 2] * np.ones(self._return_XL.shape),
-                            np.ones(self._return_XL.shape) * self._current_a
-                        ])
-            else:
-                if n_ch <= 3:
-                    return_line = np.vstack([
-                            image[self._scan_counter, 0, 1] * np.ones(self._return_YL.shape),
-                            self._return_YL,
-                            image[self._scan_counter, 0, 2] * np.ones(self._return_YL.shape)
-                        ][0:n_ch])
-                else:
-                    return_line = np.vstack([
-                            image[self._scan_counter, 0, 1] * np.ones(self._return_YL.shape),
-                            self._return_YL,
-                            image[self._scan_counter, 0, 2] * np.ones(self._return_YL.shape),
-                            np.ones(self._return_YL.shape) * self._current_a
-                        ])
-
             # return the scanner to the start of next line, counts are thrown away
-            return_line_counts = self._scanning_device.scan_line(return_line)
+            with instrumentation.measure('hardware'):
+                return_line_counts = self._scanning_device.scan_line(
+                    plan.return_path(self._scan_counter))
             if np.any(return_line_counts == -1):
                 self.stopRequested = True
                 self.signal_scan_lines_next.emit()
                 return
 
             # update image with counts from the line we just scanned
+            image.set_line_counts(self._scan_counter, line_counts)
             if self._zscan:
-                if self.depth_img_is_xz:
-                    self.depth_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
-                else:
-                    self.depth_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
                 self.signal_depth_image_updated.emit()
             else:
-                self.xy_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
                 self.signal_xy_image_updated.emit()
 
             # next line in scan
@@ -898,7 +1270,6 @@ class ConfocalLogic(GenericLogic):
         parameters['Return Slowness (Steps during retrace line)'] = self.return_slowness
 
         # Prepare a figure to be saved
-        figure_data = self.xy_image[:, :, 3]
         image_extent = [self.image_x_range[0],
                         self.image_x_range[1],
                         self.image_y_range[0],
@@ -906,7 +1277,7 @@ class ConfocalLogic(GenericLogic):
         axes = ['X', 'Y']
         crosshair_pos = [self.get_position()[0], self.get_position()[1]]
 
-        figs = {ch: self.draw_figure(data=self.xy_image[:, :, 3 + n],
+        figs = {ch: self.draw_figure(data=self.xy_image_data.channel_image(n),
                                      image_extent=image_extent,
                                      scan_axis=axes,
                                      cbar_range=colorscale_range,
@@ -921,7 +1292,7 @@ class ConfocalLogic(GenericLogic):
             image_data['Confocal pure XY scan image data without axis.\n'
                 'The upper left entry represents the signal at the upper left pixel position.\n'
                 'A pixel-line in the image corresponds to a row '
-                'of entries where the Signal is in counts/s:'] = self.xy_image[:, :, 3 + n]
+                'of entries where the Signal is in counts/s:'] = self.xy_image_data.channel_image(n)
 
             filelabel = 'confocal_xy_image_{0}'.format(ch.replace('/', ''))
             self._save_logic.save_data(image_data,
@@ -933,24 +1304,12 @@ class ConfocalLogic(GenericLogic):
                                        delimiter='\t',
                                        plotfig=figs[ch])
 
-        # prepare the full raw data in an OrderedDict:
-        data = OrderedDict()
-        data['x position (m)'] = self.xy_image[:, :, 0].flatten()
-        data['y position (m)'] = self.xy_image[:, :, 1].flatten()
-        data['z position (m)'] = self.xy_image[:, :, 2].flatten()
-
-        for n, ch in enumerate(self.get_scanner_count_channels()):
-            data['count rate {0} (Hz)'.format(ch)] = self.xy_image[:, :, 3 + n].flatten()
-
         # Save the raw data to file
-        filelabel = 'confocal_xy_data'
-        self._save_logic.save_data(data,
-                                   filepath=filepath,
-                                   timestamp=timestamp,
-                                   parameters=parameters,
-                                   filelabel=filelabel,
-                                   fmt='%.6e',
-                                   delimiter='\t')
+        self._save_raw_image_data(self.xy_image_data,
+                                  filepath=filepath,
+                                  timestamp=timestamp,
+                                  parameters=parameters,
+                                  filelabel='confocal_xy_data')
 
         self.log.debug('Confocal Image saved.')
         self.signal_xy_data_saved.emit()
@@ -1015,7 +1374,7 @@ class ConfocalLogic(GenericLogic):
                         self.image_z_range[0],
                         self.image_z_range[1]]
 
-        figs = {ch: self.draw_figure(data=self.depth_image[:, :, 3 + n],
+        figs = {ch: self.draw_figure(data=self.depth_image_data.channel_image(n),
                                      image_extent=image_extent,
                                      scan_axis=axes,
                                      cbar_range=colorscale_range,
@@ -1030,7 +1389,7 @@ class ConfocalLogic(GenericLogic):
             image_data['Confocal pure depth scan image data without axis.\n'
                 'The upper left entry represents the signal at the upper left pixel position.\n'
                 'A pixel-line in the image corresponds to a row in '
-                'of entries where the Signal is in counts/s:'] = self.depth_image[:, :, 3 + n]
+                'of entries where the Signal is in counts/s:'] = self.depth_image_data.channel_image(n)
 
             filelabel = 'confocal_depth_image_{0}'.format(ch.replace('/', ''))
             self._save_logic.save_data(image_data,
@@ -1042,29 +1401,63 @@ class ConfocalLogic(GenericLogic):
                                        delimiter='\t',
                                        plotfig=figs[ch])
 
-        # prepare the full raw data in an OrderedDict:
-        data = OrderedDict()
-        data['x position (m)'] = self.depth_image[:, :, 0].flatten()
-        data['y position (m)'] = self.depth_image[:, :, 1].flatten()
-        data['z position (m)'] = self.depth_image[:, :, 2].flatten()
-
-        for n, ch in enumerate(self.get_scanner_count_channels()):
-            data['count rate {0} (Hz)'.format(ch)] = self.depth_image[:, :, 3 + n].flatten()
-
         # Save the raw data to file
-        filelabel = 'confocal_depth_data'
-        self._save_logic.save_data(data,
-                                   filepath=filepath,
-                                   timestamp=timestamp,
-                                   parameters=parameters,
-                                   filelabel=filelabel,
-                                   fmt='%.6e',
-                                   delimiter='\t')
+        self._save_raw_image_data(self.depth_image_data,
+                                  filepath=filepath,
+                                  timestamp=timestamp,
+                                  parameters=parameters,
+                                  filelabel='confocal_depth_data')
 
         self.log.debug('Confocal Image saved.')
         self.signal_depth_data_saved.emit()
         return
 
+    def _save_raw_image_data(self, image, filepath, timestamp, parameters, filelabel):
+        """ Save x, y, z and counts of every pixel of a scan image to a text file.
+
+        The file is written in blocks of scan lines so the full raw data table of a large image is
+        never held in memory at once.
+
+        @param ConfocalImage image: the scan image to save
+        @param str filepath: directory to save the file in
+        @param datetime timestamp: timestamp for the file name
+        @param dict parameters: parameters to write into the file header
+        @param str filelabel: label for the file name
+        """
+        # The file name needs to be known in advance to append the following blocks
+        if self._save_logic.active_poi_name != '':
+            filelabel = self._save_logic.active_poi_name.replace(' ', '_') + '_' + filelabel
+        filename = timestamp.strftime('%Y%m%d-%H%M-%S' + '_' + filelabel + '.dat')
+
+        channels = self.get_scanner_count_channels()
+        for start, stop in image.iter_line_blocks():
+            positions = image.block_positions(start, stop)
+            if start == 0:
+                # The first block creates the file including the header
+                data = OrderedDict()
+                data['x position (m)'] = positions[0].flatten()
+                data['y position (m)'] = positions[1].flatten()
+                data['z position (m)'] = positions[2].flatten()
+                for n, ch in enumerate(channels):
+                    data['count rate {0} (Hz)'.format(ch)] = image.counts[n, start:stop].flatten()
+                self._save_logic.save_data(data,
+                                           filepath=filepath,
+                                           filename=filename,
+                                           timestamp=timestamp,
+                                           parameters=parameters,
+                                           fmt='%.6e',
+                                           delimiter='\t')
+            else:
+                columns = [pos.ravel() for pos in positions]
+                columns.extend(image.counts[n, start:stop].ravel() for n in range(len(channels)))
+                self._save_logic.save_array_as_text(np.column_stack(columns),
+                                                    filename=filename,
+                                                    filepath=filepath,
+                                                    fmt='%.6e',
+                                                    delimiter='\t',
+                                                    append=True)
+        return
+
     def draw_figure(self, data, image_extent, scan_axis=None, cbar_range=None, percentile_range=None,  crosshair_pos=None):
         """ Create a 2-D color map figure of the scan image.
 
@@ -1242,6 +1635,44 @@ class ConfocalLogic(GenericLogic):
         self._scanning_device.tilt_reference_y = self._scanning_device.get_scanner_position()[1]
         self.signal_tilt_correction_active.emit(enabled)
 
+    def get_history_nbytes(self):
+        """ Number of bytes occupied by the image data of the history in addition to the current
+        images. Image buffers shared between several entries are counted once.
+
+        @return int: memory used by the history in bytes
+        """
+        counted_images = {id(self.xy_image_data), id(self.depth_image_data)}
+        nbytes = 0
+        for entry in self.history:
+            for snapshot in (getattr(entry, 'xy_image_snapshot', None),
+                             getattr(entry, 'depth_image_snapshot', None)):
+                if snapshot is None:
+                    continue
+                nbytes += snapshot.nbytes
+                if id(snapshot.image) not in counted_images:
+                    counted_images.add(id(snapshot.image))
+                    nbytes += snapshot.image.nbytes
+        return nbytes
+
+    def _trim_history(self):
+        """ Compress old history entries (if configured) and remove the oldest entries until the
+        history fits into the maximum length and the memory budget. The latest entry is always kept.
+        """
+        while len(self.history) > max(1, self.max_history_length):
+            self.history.pop(0)
+
+        if self._history_compression_age is not None:
+            current_images = (self.xy_image_data, self.depth_image_data)
+            for entry in self.history[:max(0, len(self.history) - self._history_compression_age)]:
+                for snapshot in (getattr(entry, 'xy_image_snapshot', None),
+                                 getattr(entry, 'depth_image_snapshot', None)):
+                    if snapshot is not None and snapshot.image not in current_images:
+                        snapshot.image.compress()
+
+        while len(self.history) > 1 and self.get_history_nbytes() > self._history_memory_budget:
+            self.history.pop(0)
+        return
+
     def history_forward(self):
         """ Move forward in confocal image history.
         """
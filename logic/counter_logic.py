@@ -23,13 +23,16 @@ from qtpy import QtCore
 from collections import OrderedDict
 import numpy as np
 import time
-import matplotlib.pyplot as plt
 
 from core.connector import Connector
+from core.instrumentation import instrumentation
 from core.statusvariable import StatusVar
 from logic.generic_logic import GenericLogic
 from interface.slow_counter_interface import CountingMode
 from core.util.mutex import Mutex
+from core.util.lazy_import import lazy_import
+
+plt = lazy_import('matplotlib.pyplot')
 
 
 class CounterLogic(GenericLogic):
@@ -446,6 +449,7 @@ class CounterLogic(GenericLogic):
                 self.stopRequested = True
         return
 
+    @instrumentation.timed()
     def count_loop_body(self):
         """ This method gets the count data from the hardware for the continuous counting mode (default).
 
@@ -468,7 +472,9 @@ class CounterLogic(GenericLogic):
                     return
 
                 # read the current counter value
-                self.rawdata = self._counting_device.get_counter(samples=self._counting_samples)
+                with instrumentation.measure('hardware'):
+                    self.rawdata = self._counting_device.get_counter(
+                        samples=self._counting_samples)
                 if self.rawdata[0, 0] < 0:
                     self.log.error('The counting went wrong, killing the counter.')
                     self.stopRequested = True
@@ -20,6 +20,10 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import ast
+import concurrent.futures
+import copy
+import functools
 import importlib
 import inspect
 import lmfit
@@ -27,16 +31,88 @@ from qtpy import QtCore
 import numpy as np
 import os
 import sys
+import threading
+import time
 from collections import OrderedDict
 from distutils.version import LooseVersion
 
 from logic.generic_logic import GenericLogic
+from core.util.batch_fit import BatchModelFitter
 from core.util.modules import get_main_dir
 from core.util.mutex import Mutex
 from core.config import load, save
 from core.configoption import ConfigOption
 
 
+def _cached_model_method(make_model):
+    """ Wrap a make_*_model method so that the created model is cached per FitLogic instance,
+    thread and set of arguments (e.g. prefix). Every call returns the cached model together with a
+    copy of its initial parameters. lmfit models are not safe to be used by several threads at
+    once, so each thread (e.g. each fit worker thread) gets its own models.
+
+    Only the outermost make_*_model call is cached. Models created inside another make_*_model
+    call are always built from scratch since they are modified (e.g. by parameter hints) while
+    composing the outer model.
+    """
+    signature = inspect.signature(make_model)
+
+    @functools.wraps(make_model)
+    def wrapper(self, *args, **kwargs):
+        state = self._model_cache_state
+        if getattr(state, 'depth', 0) > 0:
+            return make_model(self, *args, **kwargs)
+        try:
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            key = (make_model.__name__, ) + tuple(bound.arguments.items())[1:]
+            hash(key)
+        except TypeError:
+            return make_model(self, *args, **kwargs)
+
+        cache = self._thread_model_cache()
+        cached = cache.get(key)
+        if cached is None:
+            state.depth = 1
+            try:
+                model, params = make_model(self, *args, **kwargs)
+            finally:
+                state.depth = 0
+            try:
+                params_copy = copy.deepcopy(params)
+            except Exception:
+                # Parameters with invalid expressions can not be copied. Do not cache them.
+                return model, params
+            cache[key] = (model, params)
+            return model, params_copy
+        model, params = cached
+        return model, copy.deepcopy(params)
+    return wrapper
+
+
+class _LazyFitMethod:
+    """ Callable reference to a fit method of a FitLogic instance as stored in FitLogic.fit_list.
+    The module defining the fit method is only imported on the first call.
+    """
+    __slots__ = ('_fit_logic', '_name', '_method')
+
+    def __init__(self, fit_logic, name):
+        self._fit_logic = fit_logic
+        self._name = name
+        self._method = None
+
+    def __repr__(self):
+        return '<fit method {0}>'.format(self._name)
+
+    @property
+    def __name__(self):
+        return self._name
+
+    def __call__(self, *args, **kwargs):
+        if self._method is None:
+            self._method = getattr(self._fit_logic, self._name)
+        return self._method(*args, **kwargs)
+
+
 class FitLogic(GenericLogic):
     """
     Documentation to add a new fit model/estimator/function can be found in
@@ -54,13 +130,25 @@ class FitLogic(GenericLogic):
     _additional_methods_import_path = ConfigOption(name='additional_fit_methods_path',
                                                    default=None,
                                                    missing='nothing')
+    # Number of worker threads for asynchronous fits
+    _fit_worker_threads = ConfigOption(name='fit_worker_threads', default=2, missing='nothing')
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         # locking for thread safety
         self.lock = Mutex()
 
-        filenames = []
+        # Per thread cache of the models created by the make_*_model methods, see
+        # _cached_model_method. Increasing the generation invalidates the caches of all threads.
+        self._model_cache_state = threading.local()
+        self._model_cache_generation = 0
+
+        # Thread pool running asynchronous fits and the fit jobs per fit container.
+        # Each job entry holds the currently running fit (future, cancel event) and the latest
+        # waiting fit request (request, future, timeout) per request key of a container.
+        self._fit_executor = None
+        self._fit_jobs = dict()
+
         # for path in directories:
         path_list = [os.path.join(get_main_dir(), 'logic', 'fitmethods')]
         # adding additional path, to be defined in the config
@@ -82,12 +170,11 @@ class FitLogic(GenericLogic):
                 self.log.error('ConfigOption additional_predefined_methods_path needs to either be a string or '
                                'a list of strings.')
 
-        for path in path_list:
-            for f in os.listdir(path):
-                if os.path.isfile(os.path.join(path, f)) and f.endswith('.py'):
-                    filenames.append(f[:-3])
-                    if path not in sys.path:
-                        sys.path.append(path)
+        # The fit method modules are not imported here. Their function names are read from the
+        # source files (see _scan_fit_methods) and a module is imported on first use of one of its
+        # functions (see __getattr__).
+        self._fit_module_lock = threading.RLock()
+        self._fit_method_index = self._scan_fit_methods(path_list)
 
         # A dictionary containing all fit methods and their estimators.
         self.fit_list = OrderedDict()
@@ -95,31 +182,18 @@ class FitLogic(GenericLogic):
         self.fit_list['2d'] = OrderedDict()
         self.fit_list['3d'] = OrderedDict()
 
-        # Go through the fitmethods files and import all methods.
-        # Also determine which methods need to be added to the fit_list dictionary
+        # Determine which methods need to be added to the fit_list dictionary
         estimators_for_dict = list()
         models_for_dict = list()
         fits_for_dict = list()
 
-        for files in filenames:
-            mod = importlib.import_module('{0}'.format(files))
-            for method in dir(mod):
-                ref = getattr(mod, method)
-                if callable(ref) and (inspect.ismethod(ref) or inspect.isfunction(ref)):
-                    method_str = str(method)
-                    try:
-                        # import methods in Fitlogic
-                        setattr(FitLogic, method, ref)
-                        # append method to a list of methods to include in the fit_list dictionary
-                        if method_str.startswith('make_') and method_str.endswith('_fit'):
-                            fits_for_dict.append(method_str.split('_', 1)[1].rsplit('_', 1)[0])
-                        elif method_str.startswith('make_') and method_str.endswith('_model'):
-                            models_for_dict.append(method_str.split('_', 1)[1].rsplit('_', 1)[0])
-                        elif method_str.startswith('estimate_'):
-                            estimators_for_dict.append(method_str.split('_', 1)[1])
-                    except:
-                        self.log.error('Method "{0}" could not be imported to FitLogic.'
-                                       ''.format(str(method)))
+        for method_str in self._fit_method_index:
+            if method_str.startswith('make_') and method_str.endswith('_fit'):
+                fits_for_dict.append(method_str.split('_', 1)[1].rsplit('_', 1)[0])
+            elif method_str.startswith('make_') and method_str.endswith('_model'):
+                models_for_dict.append(method_str.split('_', 1)[1].rsplit('_', 1)[0])
+            elif method_str.startswith('estimate_'):
+                estimators_for_dict.append(method_str.split('_', 1)[1])
 
         fits_for_dict.sort()
         models_for_dict.sort()
@@ -140,11 +214,12 @@ class FitLogic(GenericLogic):
             # Attach make_*_fit method to fit_list
             if fit_name not in self.fit_list[dimension]:
                 self.fit_list[dimension][fit_name] = OrderedDict()
-            self.fit_list[dimension][fit_name]['make_fit'] = getattr(self, fit_method)
+            self.fit_list[dimension][fit_name]['make_fit'] = _LazyFitMethod(self, fit_method)
 
             # Attach make_*_model method to fit_list
             if fit_name in models_for_dict:
-                self.fit_list[dimension][fit_name]['make_model'] = getattr(self, model_method)
+                self.fit_list[dimension][fit_name]['make_model'] = _LazyFitMethod(self,
+                                                                                  model_method)
             else:
                 self.log.error('No make_*_model method for fit "{0}" found in FitLogic.'
                                ''.format(fit_name))
@@ -154,11 +229,13 @@ class FitLogic(GenericLogic):
             for estimator_name in estimators_for_dict:
                 estimator_method = 'estimate_' + estimator_name
                 if fit_name == estimator_name:
-                    self.fit_list[dimension][fit_name]['generic'] = getattr(self, estimator_method)
+                    self.fit_list[dimension][fit_name]['generic'] = _LazyFitMethod(self,
+                                                                                   estimator_method)
                     found_estimator = True
                 elif estimator_name.startswith(fit_name + '_'):
                     custom_name = estimator_name.split('_', 1)[1]
-                    self.fit_list[dimension][fit_name][custom_name] = getattr(self, estimator_method)
+                    self.fit_list[dimension][fit_name][custom_name] = _LazyFitMethod(
+                        self, estimator_method)
                     found_estimator = True
             if not found_estimator:
                 self.log.error('No estimator method for fit "{0}" found in FitLogic.'
@@ -174,10 +251,135 @@ class FitLogic(GenericLogic):
         fitversion = LooseVersion(lmfit.__version__)
         if fitversion < LooseVersion('0.9.2'):
             raise Exception('lmfit needs to be at least version 0.9.2!')
+        self._fit_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, int(self._fit_worker_threads)),
+            thread_name_prefix='fit_worker')
 
     def on_deactivate(self):
         """ """
-        pass
+        with self.lock:
+            containers = list(self._fit_jobs)
+        for container in containers:
+            self.cancel_fit(container)
+        with self.lock:
+            executor, self._fit_executor = self._fit_executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def __getattr__(self, name):
+        """ Import the fit method module defining a requested fit method on first access.
+        Only called if the attribute has not been found the normal way.
+        """
+        index = self.__dict__.get('_fit_method_index')
+        if index is None or name not in index:
+            raise AttributeError('{0} object has no attribute {1}'.format(
+                type(self).__name__, name))
+        self._import_fit_module(index[name][0])
+        try:
+            return object.__getattribute__(self, name)
+        except AttributeError:
+            raise AttributeError('Fit method "{0}" could not be imported to FitLogic from module '
+                                 '"{1}".'.format(name, index[name][0])) from None
+
+    def _scan_fit_methods(self, path_list):
+        """ Find all functions defined in the fit method files without importing them.
+
+        @param list path_list: directories containing the fit method files
+
+        @return OrderedDict: function name -> (module name, file path)
+
+        The top level function definitions are read from the syntax tree of each file. The result
+        is cached per file (by modification time and size) in the app status directory.
+        """
+        cache_file = None
+        cache = dict()
+        if self._manager is not None:
+            try:
+                cache_file = os.path.join(self._manager.getStatusDir(), 'fit_method_index.cfg')
+                if os.path.isfile(cache_file):
+                    cache = load(cache_file)
+            except:
+                self.log.warning('Unable to load cached fit method index. Scanning all fit '
+                                 'method files.')
+                cache = dict()
+        if not isinstance(cache, dict):
+            cache = dict()
+
+        index = OrderedDict()
+        new_cache = dict()
+        for path in path_list:
+            if path not in sys.path:
+                sys.path.append(path)
+            for f in os.listdir(path):
+                file_path = os.path.abspath(os.path.join(path, f))
+                if not (os.path.isfile(file_path) and f.endswith('.py')):
+                    continue
+                stat = os.stat(file_path)
+                entry = cache.get(file_path)
+                if not isinstance(entry, dict) or entry.get('mtime') != stat.st_mtime \
+                        or entry.get('size') != stat.st_size:
+                    try:
+                        with open(file_path, 'rb') as source:
+                            tree = ast.parse(source.read(), filename=file_path)
+                    except:
+                        self.log.exception('Unable to read fit method file "{0}".'
+                                           ''.format(file_path))
+                        continue
+                    functions = [node.name for node in tree.body if isinstance(
+                        node, (ast.FunctionDef, ast.AsyncFunctionDef))]
+                    entry = {'mtime': stat.st_mtime, 'size': stat.st_size,
+                             'functions': functions}
+                new_cache[file_path] = entry
+                for function in entry['functions']:
+                    index[function] = (f[:-3], file_path)
+
+        if cache_file is not None and new_cache != cache:
+            try:
+                save(cache_file, new_cache)
+            except:
+                self.log.warning('Unable to save fit method index to "{0}".'.format(cache_file))
+        return index
+
+    def _import_fit_module(self, module_name):
+        """ Import a fit method module and attach its fit methods to FitLogic.
+
+        @param str module_name: name of the fit method module
+        """
+        with self._fit_module_lock:
+            try:
+                mod = importlib.import_module(module_name)
+            except:
+                self.log.exception('Fit method module "{0}" could not be imported.'
+                                   ''.format(module_name))
+                return
+            for method, (method_module, file_path) in self._fit_method_index.items():
+                if method_module != module_name or method in FitLogic.__dict__:
+                    continue
+                ref = getattr(mod, method, None)
+                if not inspect.isfunction(ref):
+                    self.log.error('Method "{0}" could not be imported to FitLogic.'
+                                   ''.format(method))
+                    continue
+                # import methods in Fitlogic. Models are cached.
+                if method.startswith('make_') and method.endswith('_model'):
+                    setattr(FitLogic, method, _cached_model_method(ref))
+                else:
+                    setattr(FitLogic, method, ref)
+
+    def clear_model_cache(self):
+        """ Remove all cached fit models. They will be created again on next use. """
+        self._model_cache_generation += 1
+
+    def _thread_model_cache(self):
+        """ Get the model cache of the calling thread.
+
+            @return dict: cache key -> (model, parameters)
+        """
+        state = self._model_cache_state
+        if getattr(state, 'generation', None) != self._model_cache_generation:
+            state.cache = dict()
+            state.generation = self._model_cache_generation
+        return state.cache
 
     def validate_load_fits(self, fits):
         """ Take fit names and estimators from a dict and check if they are valid.
@@ -214,7 +416,8 @@ class FitLogic(GenericLogic):
                     new_fit = {'fit_name': fname, 'est_name': fit['estimator'],
                                'make_fit': self.fit_list[dim][fname]['make_fit'],
                                'make_model': self.fit_list[dim][fname]['make_model'],
-                               'estimator': self.fit_list[dim][fname][fit['estimator']]}
+                               'estimator': self.fit_list[dim][fname][fit['estimator']],
+                               'warm_start': bool(fit.get('warm_start', False))}
                     try:
                         par = lmfit.parameter.Parameters()
                         par.loads(fit['parameters'])
@@ -243,7 +446,8 @@ class FitLogic(GenericLogic):
             for name, fit in dfits.items():
                 try:
                     new_fit = {'fit_function': fit['fit_name'], 'estimator': fit['est_name'],
-                               'parameters': fit['parameters'].dumps()}
+                               'parameters': fit['parameters'].dumps(),
+                               'warm_start': bool(fit.get('warm_start', False))}
                     save_fits[dim][name] = new_fit
                 except KeyError:
                     self.log.exception('Error while preparing fit {0} for saving.'.format(name))
@@ -283,6 +487,226 @@ class FitLogic(GenericLogic):
       
         return FitContainer(self, container_name, dimension)
 
+    def batch_fit(self, x_axis, traces, fit_function, estimator='generic', add_params=None,
+                  estimate_each=True):
+        """ Fit the same 1D fit function to a stack of traces sharing one x axis.
+
+            @param x_axis array: 1D x values of all traces
+            @param traces array: 2D array of shape (number of traces, len(x_axis))
+            @param fit_function str: name of the 1D fit function, e.g. 'lorentzian'
+            @param estimator str: name of the estimator of the fit function
+            @param add_params Parameters: optional, parameters overriding the estimated ones
+            @param estimate_each bool: run the estimator on each trace (True) or only once on the
+                                       mean of all traces (False)
+
+            @return numpy.ndarray: structured array with one entry per trace and the fields
+                                   <param name>, <param name>_error, 'chisqr', 'redchi' and
+                                   'success'. None if the fit function or estimator is invalid.
+
+        All traces are fitted simultaneously by a Levenberg-Marquardt algorithm vectorized over
+        the traces (see core.util.batch_fit). Fit functions whose models can not be evaluated for
+        several parameter sets at once are fitted trace by trace with lmfit instead.
+        If the fit method files define a vectorized estimator batch_estimate_<fit>_<estimator>
+        (e.g. for the lorentzian and gaussian peak/dip estimators), it estimates all traces at
+        once. Other estimators run trace by trace with estimate_each.
+        """
+        if fit_function not in self.fit_list['1d']:
+            self.log.error('Batch fit failed. Unknown 1D fit function "{0}".'.format(fit_function))
+            return None
+        fit = self.fit_list['1d'][fit_function]
+        if estimator not in fit or estimator in ('make_fit', 'make_model'):
+            self.log.error('Batch fit failed. Unknown estimator "{0}" for fit function "{1}".'
+                           ''.format(estimator, fit_function))
+            return None
+        x_axis = np.asarray(x_axis, dtype=float)
+        traces = np.atleast_2d(np.asarray(traces, dtype=float))
+        if traces.shape[1] != x_axis.size:
+            self.log.error('Batch fit failed. Traces must have the same length as the x axis.')
+            return None
+
+        model, params = fit['make_model']()
+        initial_values = None
+        batch_estimator = 'batch_' + getattr(fit[estimator], '__name__', '')
+        if estimate_each and batch_estimator in self._fit_method_index:
+            # vectorized estimator: shared bounds and initial values per trace
+            error, estimated, initial_values = getattr(self, batch_estimator)(
+                x_axis, traces, copy.deepcopy(params))
+            initial_params = [
+                self._substitute_params(initial_params=estimated, update_params=add_params)]
+            for name in self._params_with_value(add_params):
+                initial_values.pop(name, None)
+        else:
+            if estimate_each:
+                trace_list = traces
+            else:
+                trace_list = [np.mean(traces, axis=0)]
+            initial_params = list()
+            for trace in trace_list:
+                error, estimated = fit[estimator](x_axis, trace, copy.deepcopy(params))
+                initial_params.append(
+                    self._substitute_params(initial_params=estimated, update_params=add_params))
+            if not estimate_each:
+                initial_params = initial_params * traces.shape[0]
+
+        fitter = BatchModelFitter(model, x_axis)
+        if fitter.supports(model, initial_params[0], x_axis):
+            if initial_values is None:
+                return fitter.fit(traces, initial_params)
+            return fitter.fit(traces, initial_params[0], initial_values)
+
+        if initial_values is not None:
+            initial_params = list()
+            for index in range(traces.shape[0]):
+                trace_params = copy.deepcopy(initial_params[0])
+                for name, values in initial_values.items():
+                    trace_params[name].set(value=values[index])
+                initial_params.append(trace_params)
+
+        self.log.debug('Model of fit function "{0}" can not be evaluated vectorized. Fitting '
+                       'traces one by one.'.format(fit_function))
+        result = np.zeros(traces.shape[0], dtype=fitter.result_dtype(initial_params[0]))
+        for index, (trace, trace_params) in enumerate(zip(traces, initial_params)):
+            try:
+                fit_result = model.fit(trace, x=x_axis, params=trace_params)
+            except:
+                self.log.exception('Fit of trace {0:d} failed.'.format(index))
+                continue
+            for name, param in fit_result.params.items():
+                result[name][index] = param.value
+                result['{0}_error'.format(name)][index] = \
+                    np.nan if param.stderr is None else param.stderr
+            result['chisqr'][index] = fit_result.chisqr
+            result['redchi'][index] = fit_result.redchi
+            result['success'][index] = fit_result.success
+        return result
+
+    @staticmethod
+    def _params_with_value(params):
+        """ Names of the parameters for which a Parameters object or a dict of parameter settings
+            (see _substitute_params) sets a value.
+        """
+        if params is None:
+            return list()
+        if isinstance(params, lmfit.Parameters):
+            return [name for name, param in params.items() if param.value is not None]
+        return [name for name, settings in params.items()
+                if isinstance(settings, dict) and settings.get('value') is not None]
+
+    def submit_fit(self, container, x_data, y_data, timeout=None, key=None):
+        """ Perform the current fit of a fit container asynchronously on a worker thread.
+
+            @param container FitContainer: fit container to perform the fit with
+            @param x_data array: x values of the data to fit
+            @param y_data array: y values of the data to fit
+            @param timeout float: optional, time in seconds after which a running fit is aborted
+            @param key: optional, hashable key of the data set (e.g. channel and range) the fit
+                        request is for
+
+            @return concurrent.futures.Future: future resolving to the tuple (fit_x, fit_y, result)
+
+        The fits of a container are performed one after another. Requests are coalesced per
+        container and key: While a fit of the container is running, only the most recent request
+        of each key is kept waiting and older waiting requests of the same key are cancelled.
+        An aborted fit (see cancel_fit and timeout) sets a CancelledError or TimeoutError as
+        exception of the future. The fit container is only updated by completed fits, in the
+        thread of the container.
+        """
+        future = concurrent.futures.Future()
+        request = container.prepare_fit_request(x_data, y_data)
+
+        superseded = None
+        with self.lock:
+            active = self._fit_executor is not None
+            if active:
+                job = self._fit_jobs.setdefault(container,
+                                                {'running': None, 'pending': OrderedDict()})
+                if job['running'] is None:
+                    self._start_fit_job(container, request, future, timeout)
+                else:
+                    superseded = job['pending'].pop(key, None)
+                    job['pending'][key] = (request, future, timeout)
+        if not active:
+            future.set_exception(RuntimeError('FitLogic is not active. Unable to perform fit.'))
+            return future
+        # Cancel outside of the lock since done callbacks of the future are called immediately
+        if superseded is not None:
+            superseded[1].cancel()
+        return future
+
+    def cancel_fit(self, container):
+        """ Cancel the waiting fit requests and abort the running fit of a fit container.
+
+            @param container FitContainer: fit container to cancel the fits for
+        """
+        with self.lock:
+            job = self._fit_jobs.get(container)
+            if job is None:
+                return
+            pending, job['pending'] = job['pending'], OrderedDict()
+            if job['running'] is not None:
+                job['running'][1].set()
+        for request, future, timeout in pending.values():
+            future.cancel()
+
+    def _start_fit_job(self, container, request, future, timeout):
+        """ Submit a fit request to the worker threads. Must be called with self.lock held.
+
+            @return bool: True if the fit has been started, False if the future was cancelled
+        """
+        if not future.set_running_or_notify_cancel():
+            return False
+        cancel_event = threading.Event()
+        self._fit_jobs[container]['running'] = (future, cancel_event)
+        self._fit_executor.submit(
+            self._run_fit_job, container, request, future, cancel_event, timeout)
+        return True
+
+    def _run_fit_job(self, container, request, future, cancel_event, timeout):
+        """ Perform a fit request on a worker thread and start the next waiting request. """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        aborted = list()
+
+        def iter_cb(params, iteration, residual, *args, **kwargs):
+            # Returning True aborts the minimization in lmfit
+            if cancel_event.is_set() or (deadline is not None and time.monotonic() > deadline):
+                aborted.append(iteration)
+                return True
+            return False
+
+        try:
+            fit_x, fit_y, result = container.compute_fit(request, iter_cb=iter_cb)
+            if cancel_event.is_set():
+                future.set_exception(concurrent.futures.CancelledError(
+                    'Fit "{0}" in "{1}" has been cancelled.'.format(request['fit_name'],
+                                                                   container.name)))
+            elif aborted:
+                future.set_exception(concurrent.futures.TimeoutError(
+                    'Fit "{0}" in "{1}" has been aborted after {2} s.'.format(request['fit_name'],
+                                                                             container.name,
+                                                                             timeout)))
+            else:
+                # The container is updated in its own thread. Queued signals are delivered in
+                # order, so the result is applied before a queued done callback of the future.
+                container.sigApplyFitResult.emit(request, result)
+                future.set_result((fit_x, fit_y, result))
+        except Exception as e:
+            self.log.exception('Fit "{0}" in "{1}" failed.'.format(request['fit_name'],
+                                                                   container.name))
+            future.set_exception(e)
+        finally:
+            dropped = list()
+            with self.lock:
+                job = self._fit_jobs[container]
+                job['running'] = None
+                while job['pending']:
+                    pending = job['pending'].popitem(last=False)[1]
+                    if self._fit_executor is None:
+                        dropped.append(pending)
+                    elif self._start_fit_job(container, *pending):
+                        break
+            for request, future, timeout in dropped:
+                future.cancel()
+
 
 class FitContainer(QtCore.QObject):
     """ A class for managing a single flexible fit setting in a logic module.
@@ -291,6 +715,7 @@ class FitContainer(QtCore.QObject):
     sigCurrentFit = QtCore.Signal(str)
     sigNewFitResult = QtCore.Signal(str, lmfit.model.ModelResult)
     sigNewFitParameters = QtCore.Signal(str, lmfit.parameter.Parameters)
+    sigApplyFitResult = QtCore.Signal(object, object)
 
     def __init__(self, fit_logic, name, dimension):
         """ Create a fit container.
@@ -321,6 +746,16 @@ class FitContainer(QtCore.QObject):
         self.use_settings = None
         self.units = ['independent variable {0}'.format(i+1) for i in range(self.dim)]
         self.units.append('dependent variable')
+        # Result of the previous converged fit, which seeds the next fit if warm_start is enabled
+        self._warm_start_state = None
+        # Results of asynchronous fits are applied in the thread of this container
+        self.sigApplyFitResult.connect(self.apply_fit_result, QtCore.Qt.QueuedConnection)
+
+    @property
+    def warm_start(self):
+        """ Warm start setting of the current fit, see set_warm_start. """
+        fit = self.fit_list.get(self.current_fit)
+        return fit is not None and bool(fit.get('warm_start', False))
 
     def set_units(self, units):
         """ Set units for this fit.
@@ -385,10 +820,30 @@ class FitContainer(QtCore.QObject):
                         self.use_settings[para]=self.fit_list[self.current_fit]['parameters'][para]
             else:
                 self.use_settings=None
+        self._warm_start_state = None
         self.clear_result()
         self.sigCurrentFit.emit(self.current_fit)
         return self.current_fit, self.use_settings
 
+    @QtCore.Slot(bool)
+    def set_warm_start(self, enabled):
+        """ Enable or disable warm starts for the current fit of this container.
+            @param enabled bool: If True, a fit starts from the parameters (values, bounds and
+                                 vary flags) of the previous converged fit instead of running the
+                                 estimator, provided fit function, x values, data shape and units
+                                 are the same. Useful for periodic refits of a slowly changing
+                                 signal.
+
+        The setting is part of the configured fit (see the fit settings dialog) and saved with it.
+        """
+        if self.current_fit not in self.fit_list:
+            self.fit_logic.log.warning('No fit selected in "{0}". Unable to set warm start.'
+                                       ''.format(self.name))
+            return
+        self.fit_list[self.current_fit]['warm_start'] = bool(enabled)
+        if not enabled:
+            self._warm_start_state = None
+
     def do_fit(self, x_data, y_data):
         """Performs the chosen fit on the measured data.
         @param array x_data: optional, 1D np.array or 1D list with the x values.
@@ -416,49 +871,168 @@ class FitContainer(QtCore.QObject):
                             then result is set to None.
         """
         self.clear_result()
+        request = self.prepare_fit_request(x_data, y_data)
+        fit_x, fit_y, result = self.compute_fit(request)
+        self.apply_fit_result(request, result)
+        return fit_x, fit_y, result
 
-        fit_x = np.linspace(
-            start=x_data[0],
-            stop=x_data[-1],
-            num=int(len(x_data) * self.fit_granularity_fact))
+    def do_fit_async(self, x_data, y_data, timeout=None, key=None):
+        """ Performs the chosen fit on the measured data on a worker thread of the fit logic.
+        The fit result is applied to this container and signalled like in do_fit once the fit has
+        finished. This happens in the thread of this container, which therefore needs a running
+        event loop.
 
-        # set the keyword arguments, which will be passed to the fit.
-        kwargs = {
-            'x_axis': x_data,
-            'data': y_data,
-            'units': self.units,
-            'add_params': self.use_settings}
+        @param array x_data: 1D np.array or 1D list with the x values.
+        @param array y_data: 1D np.array or 1D list with the y values.
+        @param float timeout: optional, time in seconds after which the fit is aborted
+        @param key: optional, hashable key of the data set the fit is for. Only requests with the
+                    same key are coalesced.
 
-        result = None
+        @return concurrent.futures.Future: future resolving to the tuple (fit_x, fit_y, result)
+                                           as returned by do_fit.
 
-        if self.current_fit in self.fit_list:
-            result = self.fit_list[self.current_fit]['make_fit'](
-                estimator=self.fit_list[self.current_fit]['estimator'],
-                **kwargs)
+        Repeated calls with the same key while a fit is still running are coalesced, i.e. only
+        the data of the most recent call is fitted next. See FitLogic.submit_fit for details.
+        """
+        return self.fit_logic.submit_fit(self, x_data, y_data, timeout=timeout, key=key)
 
-        elif self.current_fit == 'No Fit':
-            fit_y = np.zeros(fit_x.shape)
+    def cancel_fit(self):
+        """ Cancel the waiting asynchronous fits and abort the running one of this container. """
+        self.fit_logic.cancel_fit(self)
 
-        else:
+    def batch_fit(self, x_data, traces, estimate_each=True):
+        """ Fit the current fit of this container to a stack of traces at once.
+        The fit result of the container is not changed.
+
+        @param array x_data: 1D np.array or 1D list with the x values.
+        @param array traces: 2D np.array of shape (number of traces, len(x_data))
+        @param bool estimate_each: run the estimator on each trace (True) or only once on the mean
+                                   of all traces (False)
+
+        @return numpy.ndarray: structured array with the fit results, see FitLogic.batch_fit.
+                               None if no fit is selected.
+        """
+        if self.dimension != '1d' or self.current_fit not in self.fit_list:
+            self.fit_logic.log.error('Batch fits require a selected 1D fit in "{0}".'
+                                     ''.format(self.name))
+            return None
+        fit = self.fit_list[self.current_fit]
+        return self.fit_logic.batch_fit(x_data,
+                                        traces,
+                                        fit['fit_name'],
+                                        estimator=fit['est_name'],
+                                        add_params=self.use_settings,
+                                        estimate_each=estimate_each)
+
+    def prepare_fit_request(self, x_data, y_data):
+        """ Collect everything needed to perform the current fit on the given data.
+        Later changes to the fit settings of this container do not affect the returned request.
+
+        @param array x_data: 1D np.array or 1D list with the x values.
+        @param array y_data: 1D np.array or 1D list with the y values.
+
+        @return dict: fit request for compute_fit
+        """
+        if self.current_fit not in self.fit_list and self.current_fit != 'No Fit':
             self.fit_logic.log.warning(
                 'The Fit Function "{0}" is not implemented to be used in the ODMR Logic. '
                 'Correct that! Fit Call will be skipped and Fit Function will be set to '
                 '"No Fit".'.format(self.current_fit))
-
             self.current_fit = 'No Fit'
 
-        if self.current_fit != 'No Fit':
-            # after the fit was performed, retrieve the fitting function and
-            # evaluate the fitted parameters according to the function:
-            model, params = self.fit_list[self.current_fit]['make_model']()
-            fit_y = model.eval(x=fit_x, params=result.params)
+        request = {'fit_name': self.current_fit,
+                   'fit': self.fit_list.get(self.current_fit),
+                   'x_data': np.array(x_data),
+                   'y_data': np.array(y_data),
+                   'units': list(self.units),
+                   'add_params': self.use_settings,
+                   'fit_granularity_fact': self.fit_granularity_fact,
+                   'warm_params': None}
+
+        state = self._warm_start_state
+        if self.warm_start and state is not None and state['fit_name'] == request['fit_name'] \
+                and state['shape'] == request['y_data'].shape and state['units'] == request['units'] \
+                and np.array_equal(state['x_data'], request['x_data']):
+            request['warm_params'] = state['params']
+        return request
+
+    def compute_fit(self, request, iter_cb=None):
+        """ Perform a fit request without changing the state of this container.
+
+        @param dict request: fit request as returned by prepare_fit_request
+        @param callable iter_cb: optional, iteration callback passed to lmfit
+
+        @return tuple: (fit_x, fit_y, result), see do_fit
+        """
+        x_data = request['x_data']
+        fit_x = np.linspace(
+            start=x_data[0],
+            stop=x_data[-1],
+            num=int(len(x_data) * request['fit_granularity_fact']))
+
+        if request['fit'] is None:
+            return fit_x, np.zeros(fit_x.shape), None
 
+        # set the keyword arguments, which will be passed to the fit.
+        kwargs = {
+            'x_axis': x_data,
+            'data': request['y_data'],
+            'units': request['units'],
+            'add_params': request['add_params']}
+        if iter_cb is not None:
+            kwargs['iter_cb'] = iter_cb
+
+        if request.get('warm_params') is None:
+            estimator = request['fit']['estimator']
+        else:
+            estimator = functools.partial(self._warm_start_estimator, request['warm_params'])
+        result = request['fit']['make_fit'](estimator=estimator, **kwargs)
+
+        # after the fit was performed, evaluate the fitted parameters with the model of the fit
+        model = getattr(result, 'model', None)
+        if model is None:
+            model, params = request['fit']['make_model']()
+        fit_y = model.eval(x=fit_x, params=result.params)
+        return fit_x, fit_y, result
+
+    @staticmethod
+    def _warm_start_estimator(warm_params, x_axis, data, params, *args, **kwargs):
+        """ Estimator taking the parameters of a previous fit result instead of estimating them.
+
+        @param lmfit.Parameters warm_params: parameters of the previous fit result
+        @param array x_axis: x values of the data (unused)
+        @param array data: data to fit (unused)
+        @param lmfit.Parameters params: initial parameters of the fit model
+
+        Additional arguments of specific estimators are ignored.
+
+        @return tuple: (error, params) like all estimators
+        """
+        for name, param in warm_params.items():
+            if name in params and not params[name].expr and np.isfinite(param.value):
+                params[name].set(min=-np.inf if param.min is None else param.min,
+                                 max=np.inf if param.max is None else param.max,
+                                 vary=param.vary)
+                params[name].set(value=param.value)
+        return 0, params
+
+    @QtCore.Slot(object, object)
+    def apply_fit_result(self, request, result):
+        """ Store a fit result in this container and signal it.
+
+        @param dict request: fit request the result has been obtained for
+        @param lmfit.model.ModelResult result: fit result or None
+        """
         if result is not None:
             self.current_fit_param = result.params
             self.current_fit_result = result
-            self.sigNewFitParameters.emit(self.current_fit, result.params)
-            self.sigNewFitResult.emit(self.current_fit, result)
+            if self.warm_start and result.success:
+                self._warm_start_state = {'fit_name': request['fit_name'],
+                                          'x_data': request['x_data'],
+                                          'shape': request['y_data'].shape,
+                                          'units': request['units'],
+                                          'params': result.params}
+            self.sigNewFitParameters.emit(request['fit_name'], result.params)
+            self.sigNewFitResult.emit(request['fit_name'], result)
 
         self.sigFitUpdated.emit()
-
-        return fit_x, fit_y, result
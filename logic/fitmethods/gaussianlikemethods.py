@@ -470,6 +470,70 @@ def estimate_gaussian_dip(self, x_axis, data, params):
 
     return error, params
 
+def batch_estimate_gaussian_peak(self, x_axis, data, params):
+    """ Vectorized estimate_gaussian_peak for a stack of traces sharing the x axis.
+
+    @param numpy.array x_axis: 1D axis values
+    @param numpy.array data: 2D data of shape (number of traces, len(x_axis))
+    @param lmfit.Parameters params: object includes parameter dictionary which
+                                    can be set, the bounds are shared by all traces
+
+    @return tuple (error, params, values):
+
+        Explanation of the return parameter:
+            int error: error code (0:OK, -1:error)
+            Parameters object params: set parameters of initial values (of the first trace) and
+                                      bounds
+            dict values: parameter name -> array of the initial values of all traces
+    """
+    error = self._check_1D_input(x_axis=x_axis, data=data[0], params=params)
+
+    # auxiliary variables
+    stepsize = abs(x_axis[1] - x_axis[0])
+    n_steps = len(x_axis)
+
+    # same smoothing and moments as estimate_gaussian_peak, for all traces at once
+    data_smoothed = filters.gaussian_filter1d(data, 2, axis=1)
+
+    offset = data_smoothed.min(axis=1)
+    norm = np.sum(data_smoothed, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_val_calc = np.sum(x_axis * data_smoothed, axis=1) / norm
+        mom2 = np.sum(x_axis ** 2 * data_smoothed, axis=1) / norm
+    values = {'offset': offset,
+              'center': x_axis[np.argmax(data_smoothed, axis=1)],
+              'sigma': np.sqrt(np.abs(mom2 - mean_val_calc**2)),
+              'amplitude': data_smoothed.max(axis=1) - offset}
+
+    params['offset'].set(value=values['offset'][0])
+    params['center'].set(value=values['center'][0],
+                         min=(x_axis[0]) - n_steps * stepsize,
+                         max=(x_axis[-1]) + n_steps * stepsize)
+    params['sigma'].set(value=values['sigma'][0],
+                        min=stepsize, max=3 * (x_axis[-1] - x_axis[0]))
+    params['amplitude'].set(value=values['amplitude'][0], min=0)
+
+    return error, params, values
+
+def batch_estimate_gaussian_dip(self, x_axis, data, params):
+    """ Vectorized estimate_gaussian_dip for a stack of traces sharing the x axis.
+
+    @param numpy.array x_axis: 1D axis values
+    @param numpy.array data: 2D data of shape (number of traces, len(x_axis))
+    @param lmfit.Parameters params: object includes parameter dictionary which
+                                    can be set, the bounds are shared by all traces
+
+    @return tuple (error, params, values): see batch_estimate_gaussian_peak
+    """
+    error, params, values = self.batch_estimate_gaussian_peak(x_axis, -data, params)
+
+    values['offset'] = -values['offset']
+    values['amplitude'] = -values['amplitude']
+    params['offset'].set(value=values['offset'][0])
+    params['amplitude'].set(value=values['amplitude'][0], min=-np.inf, max=1e-12)
+
+    return error, params, values
+
 ##############################################
 # 1D Gaussian with linear inclined offset    #
 ##############################################
@@ -482,6 +482,48 @@ def find_offset_parameter(self, x_values=None, data=None):
 
     return data_smooth, offset
 
+def batch_find_offset_parameter(self, x_values=None, data=None):
+    """ Vectorized find_offset_parameter for a stack of traces sharing the x values.
+
+    @param array x_values: x values
+    @param array data: 2D array of shape (number of traces, len(x_values))
+
+    @return float array data_smooth: smoothed data of each trace
+    @return float array offset: estimated offset of each trace
+    """
+    mod, params = self.make_lorentzian_model()
+
+    if len(x_values) < 20.:
+        len_x = 5
+    elif len(x_values) >= 100.:
+        len_x = 10
+    else:
+        len_x = int(len(x_values)/10.)+1
+
+    lorentz = mod.eval(x=np.linspace(0, len_x, len_x), amplitude=1, offset=0.,
+                       sigma=len_x/4., center=len_x/2.)
+    # the maximum of each trace as constant boundary value: the normalized filter adds it back
+    data_max = data.max(axis=1)[:, np.newaxis]
+    data_smooth = filters.convolve1d(data - data_max, lorentz/lorentz.sum(), axis=1,
+                                     mode='constant', cval=0.) + data_max
+
+    # most frequent value of each trace (10 bins like np.histogram)
+    n_bins = 10
+    low = data_smooth.min(axis=1)
+    high = data_smooth.max(axis=1)
+    flat = high == low
+    low = np.where(flat, low - 0.5, low)
+    high = np.where(flat, high + 0.5, high)
+    width = (high - low) / n_bins
+    bins = ((data_smooth - low[:, np.newaxis]) / width[:, np.newaxis]).astype(int)
+    bins = np.clip(bins, 0, n_bins - 1)
+    rows = np.arange(data_smooth.shape[0])[:, np.newaxis]
+    hist = np.bincount((bins + rows * n_bins).ravel(),
+                       minlength=data_smooth.shape[0] * n_bins).reshape(-1, n_bins)
+    offset = low + (hist.argmax(axis=1) + 0.5) * width
+
+    return data_smooth, offset
+
 ############################################################################
 #                                                                          #
 #             Additional routines with gaussian-like filter              #
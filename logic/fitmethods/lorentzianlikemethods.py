@@ -429,6 +429,72 @@ def estimate_lorentzian_peak (self, x_axis, data, params):
 
     return error, params
 
+def batch_estimate_lorentzian_dip(self, x_axis, data, params):
+    """ Vectorized estimate_lorentzian_dip for a stack of traces sharing the x axis.
+
+    @param numpy.array x_axis: 1D axis values
+    @param numpy.array data: 2D data of shape (number of traces, len(x_axis))
+    @param lmfit.Parameters params: object includes parameter dictionary which
+                                    can be set, the bounds are shared by all traces
+
+    @return tuple (error, params, values):
+
+    Explanation of the return parameter:
+        int error: error code (0:OK, -1:error)
+        Parameters object params: set parameters of initial values (of the first trace) and bounds
+        dict values: parameter name -> array of the initial values of all traces
+    """
+    error = self._check_1D_input(x_axis=x_axis, data=data[0], params=params)
+
+    # check if input x-axis is ordered and increasing
+    sorted_indices = np.argsort(x_axis)
+    if not np.all(sorted_indices == np.arange(len(x_axis))):
+        x_axis = x_axis[sorted_indices]
+        data = data[:, sorted_indices]
+
+    data_smooth, offset = self.batch_find_offset_parameter(x_axis, data)
+    data_level = data_smooth - offset[:, np.newaxis]
+    amplitude = data_level.min(axis=1)
+    # the integral of a linear spline is the trapezoidal sum
+    numerical_integral = np.sum((data_level[:, 1:] + data_level[:, :-1]) * np.diff(x_axis) / 2,
+                                axis=1)
+    x_zero = x_axis[np.argmin(data_smooth, axis=1)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma = np.abs(numerical_integral / (np.pi * amplitude))
+
+    # auxiliary variables
+    stepsize = x_axis[1] - x_axis[0]
+    n_steps = len(x_axis)
+
+    values = {'amplitude': amplitude, 'sigma': sigma, 'center': x_zero, 'offset': offset}
+    params['amplitude'].set(value=amplitude[0], max=-1e-12)
+    params['sigma'].set(value=sigma[0], min=stepsize / 2,
+                        max=(x_axis[-1] - x_axis[0]) * 10)
+    params['center'].set(value=x_zero[0], min=(x_axis[0]) - n_steps * stepsize,
+                         max=(x_axis[-1]) + n_steps * stepsize)
+    params['offset'].set(value=offset[0])
+
+    return error, params, values
+
+def batch_estimate_lorentzian_peak(self, x_axis, data, params):
+    """ Vectorized estimate_lorentzian_peak for a stack of traces sharing the x axis.
+
+    @param numpy.array x_axis: 1D axis values
+    @param numpy.array data: 2D data of shape (number of traces, len(x_axis))
+    @param lmfit.Parameters params: object includes parameter dictionary which
+                                    can be set, the bounds are shared by all traces
+
+    @return tuple (error, params, values): see batch_estimate_lorentzian_dip
+    """
+    error, params, values = self.batch_estimate_lorentzian_dip(x_axis, -data, params)
+
+    values['offset'] = -values['offset']
+    values['amplitude'] = -values['amplitude']
+    params['offset'].set(value=values['offset'][0])
+    params['amplitude'].set(value=values['amplitude'][0], min=-1e-12, max=np.inf)
+
+    return error, params, values
+
 
 ################################################################################
 #                   Double Lorentzian with offset fitting                      #
@@ -20,6 +20,7 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 from qtpy import QtCore
 from core.module import Base
+from core.threadmanager import WorkerJob
 from core.util.mutex import Mutex
 
 
@@ -47,6 +48,56 @@ class GenericLogic(Base):
         """
         return self._manager.tm._threads['mod-logic-' + self._name].thread
 
+    def submitJob(self, function, *args, **kwargs):
+        """ Execute a function in the shared worker thread pool of the manager.
+
+          @param callable function: function to execute, e.g. a numpy-heavy analysis
+          @param args: positional arguments of the function
+          @param kwargs: keyword arguments of the function
+
+          @return WorkerJob: job, connect its signals sigFinished(result) and sigFailed(exception)
+                             to slots of this module to receive the result in its thread
+
+        Do not change the arguments while the job is running, pass copies if necessary. If there is
+        no worker thread pool (e.g. worker_threads: 0 in the global config), the function is
+        executed immediately in the calling thread.
+        """
+        return self._submitToPool('worker-threads', function, *args, **kwargs)
+
+    def submitProcessJob(self, function, *args, **kwargs):
+        """ Execute a function in the shared worker process pool of the manager.
+
+          @param callable function: picklable function to execute (defined on module level)
+          @param args: picklable positional arguments of the function
+          @param kwargs: picklable keyword arguments of the function
+
+          @return WorkerJob: job, connect its signals sigFinished(result) and sigFailed(exception)
+                             to slots of this module to receive the result in its thread
+
+        Use it for pure python code which does not release the GIL. The arguments and the result
+        are copied between the processes. If there is no worker process pool (e.g.
+        worker_processes: 0 in the global config), the function is executed immediately in the
+        calling thread.
+        """
+        return self._submitToPool('worker-processes', function, *args, **kwargs)
+
+    def _submitToPool(self, pool_name, function, *args, **kwargs):
+        """ Submit a job to a worker pool of the manager or run it synchronously without the pool.
+
+          @param str pool_name: name of the worker pool
+          @param callable function: function to execute
+          @param args: positional arguments of the function
+          @param kwargs: keyword arguments of the function
+
+          @return WorkerJob: job with the signals sigFinished and sigFailed
+        """
+        pool = self._manager.tm.getPool(pool_name)
+        if pool is None:
+            self.log.debug('No worker pool {0}, running {1} synchronously.'.format(
+                pool_name, getattr(function, '__qualname__', repr(function))))
+            return WorkerJob.runSynchronously(function, *args, **kwargs)
+        return pool.submit(function, *args, **kwargs)
+
     def getTaskRunner(self):
         """ Get a reference to the task runner module registered in the manager.
 
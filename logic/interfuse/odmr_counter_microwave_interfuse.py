@@ -20,9 +20,12 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import threading
+import time
 import numpy as np
 
 from core.connector import Connector
+from core.configoption import ConfigOption
 from logic.generic_logic import GenericLogic
 from interface.odmr_counter_interface import ODMRCounterInterface
 from interface.microwave_interface import MicrowaveInterface
@@ -36,24 +39,62 @@ class ODMRCounterMicrowaveInterfuse(GenericLogic, ODMRCounterInterface,
 
     This interfuse connects the ODMR logic with a slowcounter and a microwave
     device.
+
+    The sweep_mode config option selects how a line of the sweep is recorded:
+     - 'software' (default): trigger the microwave and read one sample of the counter per
+       frequency.
+     - 'emulated': arm the counter for the whole line and trigger the microwave from a
+       background thread at the clock frequency of the counter, so the line takes
+       length / clock frequency instead of length times the latency of both devices. The
+       slow counter runs freely and the trigger thread is not phase-locked to its clock, so a
+       bin can contain counts of two adjacent frequencies. Only use it if the dwell time is
+       long compared to the trigger latency of the microwave source.
+     - 'hardware': the trigger input of the microwave source is connected to the clock output
+       of the counter, so the counter only has to be read for the whole line. The list
+       position of the microwave source is reset before each line, and each clock pulse ends a
+       bin and steps the list to the next frequency. This assumes that the clock only produces
+       pulses while get_counter reads a line (e.g. the clock output is gated by the counter).
+       With a free running clock, pulses between two lines step the list as well and the bins
+       drift away from their frequencies, so use 'software' then.
+    If a buffered line fails (error of the counter, wrong number of samples or, for 'emulated',
+    a microwave trigger too slow for the clock frequency), a warning is logged and the
+    software loop is used until the ODMR counter is set up again.
+
+    Example config:
+
+    odmr_counter_microwave_interfuse:
+        module.Class: 'interfuse.odmr_counter_microwave_interfuse.ODMRCounterMicrowaveInterfuse'
+        sweep_mode: 'software'
+        connect:
+            slowcounter: 'mydummycounter'
+            microwave: 'microwave_dummy'
     """
 
     slowcounter = Connector(interface='SlowCounterInterface')
     microwave = Connector(interface='MicrowaveInterface')
 
+    _sweep_mode = ConfigOption('sweep_mode', 'software')
+
+    _sweep_modes = ('software', 'emulated', 'hardware')
+
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
         self._pulse_out_channel = 'dummy'
         self._lock_in_active = False
         self._oversampling = 10
         self._odmr_length = 100
-
+        self._clock_frequency = None
+        self._active_sweep_mode = 'software'
 
     def on_activate(self):
         """ Initialisation performed during activation of the module."""
         self._mw_device = self.microwave()
         self._sc_device = self.slowcounter()  # slow counter device
-        pass
+        if self._sweep_mode not in self._sweep_modes:
+            self.log.error('Unknown sweep_mode "{0}", use one of {1}. Falling back to '
+                           '"software".'.format(self._sweep_mode, self._sweep_modes))
+            self._sweep_mode = 'software'
+        self._active_sweep_mode = self._sweep_mode
 
     def on_deactivate(self):
         pass
@@ -70,6 +111,7 @@ class ODMRCounterMicrowaveInterfuse(GenericLogic, ODMRCounterInterface,
 
         @return int: error code (0:OK, -1:error)
         """
+        self._clock_frequency = clock_frequency
         return self._sc_device.set_up_clock(clock_frequency=clock_frequency,
                                                    clock_channel=clock_channel)
 
@@ -88,7 +130,8 @@ class ODMRCounterMicrowaveInterfuse(GenericLogic, ODMRCounterInterface,
 
         @return int: error code (0:OK, -1:error)
         """
-
+        # try the buffered sweep again after a fallback to the software loop
+        self._active_sweep_mode = self._sweep_mode
         return self._sc_device.set_up_counter(counter_channels=counter_channel,
                                                 sources=photon_source,
                                                 clock_channel=clock_channel,
@@ -109,16 +152,121 @@ class ODMRCounterMicrowaveInterfuse(GenericLogic, ODMRCounterInterface,
 
         @param int length: length of microwave sweep in pixel
 
-        @return float[]: the photon counts per second
+        @return (bool, float[]): tuple: was there an error, the photon counts per second
+        """
+        channels = len(self.get_odmr_channels())
+        if self._active_sweep_mode != 'software':
+            try:
+                if self._active_sweep_mode == 'hardware':
+                    counts = self._count_odmr_hardware(length)
+                else:
+                    counts = self._count_odmr_emulated(length)
+                counts = self._check_line(counts, channels, length)
+            except Exception as e:
+                self.log.warning('Buffered ODMR sweep ({0}) failed: {1}\nFalling back to '
+                                 'the software triggered sweep.'.format(
+                                     self._active_sweep_mode, e))
+                self._active_sweep_mode = 'software'
+                self.reset_listpos()
+            else:
+                return False, counts
+        return False, self._count_odmr_software(length, channels)
+
+    def _check_line(self, counts, channels, length):
+        """ Check the counts of a buffered line for the error value of the slow counter.
+
+        @param numpy.ndarray counts: counts returned by get_counter
+        @param int channels: number of counter channels
+        @param int length: length of microwave sweep in pixel
+
+        @return numpy.ndarray: counts of shape (channels, length)
         """
+        counts = np.asarray(counts)
+        if np.any(counts < 0):
+            raise ValueError('The counter returned an error.')
+        if counts.size != channels * length:
+            raise ValueError('The counter returned {0:d} instead of {1:d} samples.'.format(
+                counts.size, channels * length))
+        return np.reshape(counts, (channels, length))
+
+    def _count_odmr_software(self, length, channels):
+        """ Trigger the microwave and read one sample of the counter for each frequency.
+
+        @param int length: length of microwave sweep in pixel
+        @param int channels: number of counter channels
 
-        counts = np.zeros((len(self.get_odmr_channels()), length))
-        # self.trigger()
+        @return numpy.ndarray: counts of shape (channels, length)
+        """
+        counts = np.zeros((channels, length))
+        trigger = self._mw_device.trigger
+        get_counter = self._sc_device.get_counter
         for i in range(length):
-            self.trigger()
-            counts[:, i] = self._sc_device.get_counter(samples=1)[0]
+            trigger()
+            counts[:, i] = np.reshape(get_counter(samples=1), (channels, -1))[:, 0]
+        trigger()
+        return counts
+
+    def _count_odmr_hardware(self, length):
+        """ Read a whole line while the counter clock steps the microwave list.
+        The list position is reset right before the read, so the first bin belongs to the first
+        frequency (see the wiring required for sweep_mode 'hardware').
+
+        @param int length: length of microwave sweep in pixel
+
+        @return numpy.ndarray: counts of the line
+        """
+        if self._mw_device.reset_listpos() < 0:
+            raise RuntimeError('Unable to reset the list position of the microwave source.')
+        return self._sc_device.get_counter(samples=length)
+
+    def _count_odmr_emulated(self, length):
+        """ Read a whole line while a thread triggers the microwave at the counter clock.
+
+        @param int length: length of microwave sweep in pixel
+
+        @return numpy.ndarray: counts of the line
+        """
+        if not self._clock_frequency:
+            raise ValueError('The clock frequency of the counter is unknown.')
+        period = 1 / self._clock_frequency
+        stop_event = threading.Event()
+        # number of triggers finished after the end of their bin
+        late_triggers = [0]
+        errors = list()
+        trigger = self._mw_device.trigger
+
+        def trigger_line(start):
+            try:
+                for i in range(1, length):
+                    time.sleep(max(0.0, start + i * period - time.perf_counter()))
+                    if stop_event.is_set():
+                        return
+                    trigger()
+                    if time.perf_counter() > start + (i + 1) * period:
+                        late_triggers[0] += 1
+            except Exception as e:
+                errors.append(e)
+
+        trigger()
+        thread = threading.Thread(target=trigger_line, args=(time.perf_counter(), ),
+                                  name='odmr-trigger')
+        thread.start()
+        try:
+            counts = self._sc_device.get_counter(samples=length)
+        except Exception:
+            stop_event.set()
+            raise
+        finally:
+            thread.join()
         self.trigger()
-        return False, counts
+        if errors:
+            raise errors[0]
+        # tolerate single delays caused by the scheduling of the operating system
+        if late_triggers[0] > length // 100:
+            raise RuntimeError('{0:d} microwave triggers took longer than the counter clock '
+                               'period ({1:.3g} ms), lower the clock frequency.'.format(
+                                   late_triggers[0], period * 1e3))
+        return counts
 
     def close_odmr(self):
         """ Close the odmr and clean up afterwards.
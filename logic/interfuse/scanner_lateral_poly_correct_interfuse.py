@@ -22,6 +22,8 @@ import numpy as np
 
 from core.connector import Connector
 from core.configoption import ConfigOption
+from core.util.coordinate_transforms import ComposedTransform, LateralPolynomialTransform
+from core.util.coordinate_transforms import TransformCache
 from logic.generic_logic import GenericLogic
 from interface.confocal_scanner_interface import ConfocalScannerInterface
 
@@ -38,6 +40,11 @@ class ScannerLateralPolyCorrectInterfuse(GenericLogic, ConfocalScannerInterface)
     The idea is to use multiple scans or optical design software to fit polynomially the deformation induced by the
      setup, then invert it with this module.
 
+    The transformed line paths are cached (up to transform_cache_size bytes), so repeated scans do
+    not evaluate the polynomials again. If the connected scanner is another interfuse providing
+    get_coordinate_transform (e.g. the ScannerTiltInterfuse), both corrections are fused into one
+    transform and the line is passed directly to the scanner behind it.
+
     Example config:
 
     scanner_aberration_interfuse:
@@ -48,6 +55,7 @@ class ScannerLateralPolyCorrectInterfuse(GenericLogic, ConfocalScannerInterface)
         range_y: [0, 50e-6]
         poly2d_x: [[0, 1], [0.5, 0]]
         poly2d_y: [[0, 0.5], [1, 0]]
+        transform_cache_size: 67108864  # optional, in bytes
 
     """
 
@@ -57,15 +65,23 @@ class ScannerLateralPolyCorrectInterfuse(GenericLogic, ConfocalScannerInterface)
     config_poly2d_y = ConfigOption('poly2d_y', [[0, 0], [1, 0]], missing='warn')
     config_range_x = ConfigOption('range_x')
     config_range_y = ConfigOption('range_y')
+    _transform_cache_size = ConfigOption('transform_cache_size', 64 * 2**20)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
     def on_activate(self):
         """ Initialisation performed during activation of the module """
+        self._transform_cache = TransformCache(self._transform_cache_size)
         try:
             self._poly2d_x = np.array(self.config_poly2d_x)
             self._poly2d_y = np.array(self.config_poly2d_y)
+            # absolute tolerance of the inverse relative to the lateral range of the scanner, so
+            # positions at the origin converge as well
+            scanner_range = np.array(self.scanner().get_position_range(), dtype=float)
+            span = np.max(np.abs(scanner_range[:2, 1] - scanner_range[:2, 0]))
+            self._transform = LateralPolynomialTransform(self._poly2d_x, self._poly2d_y,
+                                                         absolute_tolerance=1e-12 * span)
             _, _ = self._convert_point(0,0) # checks if works
         except ValueError:
             self.log.error('Configuration options poly2d_x or poly2d_y are not correct.')
@@ -89,7 +105,7 @@ class ScannerLateralPolyCorrectInterfuse(GenericLogic, ConfocalScannerInterface)
 
     def on_deactivate(self):
         """ Deinitialisation performed during deactivation of the module """
-        pass
+        self._transform_cache.clear()
 
     def reset_hardware(self):
         """ Resets the hardware, so the connection is lost and other programs
@@ -165,8 +181,16 @@ class ScannerLateralPolyCorrectInterfuse(GenericLogic, ConfocalScannerInterface)
         """ Get the current position of the scanner hardware.
 
         @return float[]: current position in (x, y, z, a)
+
+        Before the first call of scanner_set_position the lateral position is calculated from the
+        hardware position with the inverse transform.
         """
         scanner_position = np.array(self.scanner().get_scanner_position())
+        if self._position[0] is None or self._position[1] is None:
+            try:
+                return list(self._transform.inverse(scanner_position))
+            except ValueError as e:
+                self.log.warning('Could not convert the scanner position: {0}'.format(e))
         return list(np.array([*self._position, *scanner_position[2:]]))
 
     def set_up_line(self, length=100):
@@ -181,11 +205,20 @@ class ScannerLateralPolyCorrectInterfuse(GenericLogic, ConfocalScannerInterface)
 
         @return float[]: the photon counts per second
         """
-        transformed = line_path.copy()
-        points_x, points_y = self._convert_point(line_path[0, :], line_path[1, :])
-        transformed[0, :] = points_x
-        transformed[1, :] = points_y
-        return self.scanner().scan_line(transformed, pixel_clock)
+        transform, scanner = self.get_coordinate_transform()
+        return scanner.scan_line(self._transform_cache.forward(transform, line_path), pixel_clock)
+
+    def get_coordinate_transform(self):
+        """ Transform of the line paths by this interfuse and the interfuses connected to it.
+
+        @return CoordinateTransform, ConfocalScannerInterface: the fused transform and the scanner
+                                                               which gets the transformed paths
+        """
+        scanner = self.scanner()
+        if hasattr(scanner, 'get_coordinate_transform'):
+            inner_transform, scanner = scanner.get_coordinate_transform()
+            return ComposedTransform([self._transform, inner_transform]), scanner
+        return self._transform, scanner
 
     def close_scanner(self):
         """ Closes the scanner and cleans up afterwards """
@@ -197,6 +230,4 @@ class ScannerLateralPolyCorrectInterfuse(GenericLogic, ConfocalScannerInterface)
 
     def _convert_point(self, x, y):
         """ Convert one point or an array of point from input coordinate to output coordinate """
-        res_x = np.polynomial.polynomial.polyval2d(x, y, self._poly2d_x.T)
-        res_y = np.polynomial.polynomial.polyval2d(x, y, self._poly2d_y.T)
-        return res_x, res_y
+        return self._transform.evaluate(x, y)
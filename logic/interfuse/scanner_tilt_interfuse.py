@@ -21,6 +21,7 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 import copy
 
 from core.connector import Connector
+from core.util.coordinate_transforms import ComposedTransform, TiltTransform
 from logic.generic_logic import GenericLogic
 from interface.confocal_scanner_interface import ConfocalScannerInterface
 
@@ -160,8 +161,7 @@ class ScannerTiltInterfuse(GenericLogic, ConfocalScannerInterface):
         """
         position = copy.copy(self._scanning_device.get_scanner_position())    # not tested atm
         if self.tiltcorrection:
-            position[2] -= self._calc_dz(position[0], position[1])
-            return position
+            return list(self._get_transform().inverse(position))
         else:
             return position
 
@@ -182,9 +182,26 @@ class ScannerTiltInterfuse(GenericLogic, ConfocalScannerInterface):
 
         @return float[]: the photon counts per second
         """
-        if self.tiltcorrection:
-            line_path[:][2] += self._calc_dz(line_path[:][0], line_path[:][1])
-        return self._scanning_device.scan_line(line_path, pixel_clock)
+        transform, scanner = self.get_coordinate_transform()
+        return scanner.scan_line(transform.forward(line_path), pixel_clock)
+
+    def get_coordinate_transform(self):
+        """ Transform of the line paths by this interfuse and the interfuses connected to it.
+
+        @return CoordinateTransform, ConfocalScannerInterface: the fused transform and the scanner
+                                                               which gets the transformed paths
+        """
+        transform = self._get_transform()
+        scanner = self._scanning_device
+        if hasattr(scanner, 'get_coordinate_transform'):
+            inner_transform, scanner = scanner.get_coordinate_transform()
+            return ComposedTransform([transform, inner_transform]), scanner
+        return transform, scanner
+
+    def _get_transform(self):
+        """ Tilt transform with the current tilt parameters. """
+        return TiltTransform(self.tilt_variable_ax, self.tilt_variable_ay, self.tilt_reference_x,
+                             self.tilt_reference_y, enabled=self.tiltcorrection)
 
     def close_scanner(self):
         """ Closes the scanner and cleans up afterwards.
@@ -202,11 +219,4 @@ class ScannerTiltInterfuse(GenericLogic, ConfocalScannerInterface):
 
     def _calc_dz(self, x, y):
         """Calculates the change in z for given tilt correction."""
-        if not self.tiltcorrection:
-            return 0.
-        else:
-            dz = -(
-                (x - self.tilt_reference_x) * self.tilt_variable_ax
-                + (y - self.tilt_reference_y) * self.tilt_variable_ay
-            )
-            return dz
+        return self._get_transform().dz(x, y)
@@ -23,6 +23,7 @@ import datetime as dt
 from collections import OrderedDict
 
 from core.module import Connector
+from core.instrumentation import instrumentation
 from logic.generic_logic import GenericLogic
 from qtpy import QtCore
 from core.util.mutex import Mutex
@@ -504,6 +505,7 @@ class LockInLogic(GenericLogic):
         return 0
 
     @QtCore.Slot()
+    @instrumentation.timed()
     def acquire_data_block(self):
         """
         In principle this thing should repeatedly get data from lock-in
@@ -533,7 +535,8 @@ class LockInLogic(GenericLogic):
                     return
 
                 # read the current counter values
-                data = self._lock_in.read_data(number_of_samples=samples_to_read)
+                with instrumentation.measure('hardware'):
+                    data = self._lock_in.read_data(number_of_samples=samples_to_read)
                 if data.shape[1] != samples_to_read:
                     self.log.error('Reading data from streamer went wrong; '
                                    'killing the stream with next data frame.')
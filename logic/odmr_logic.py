@@ -27,13 +27,17 @@ from interface.microwave_interface import TriggerEdge
 import numpy as np
 import time
 import datetime
-import matplotlib.pyplot as plt
 
 from logic.generic_logic import GenericLogic
 from core.util.mutex import Mutex
+from core.util.ringbuffer import RingBuffer
 from core.connector import Connector
+from core.instrumentation import instrumentation
 from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
+from core.util.lazy_import import lazy_import
+
+plt = lazy_import('matplotlib.pyplot')
 
 
 class ODMRLogic(GenericLogic):
@@ -71,6 +75,7 @@ class ODMRLogic(GenericLogic):
 
     # Internal signals
     sigNextLine = QtCore.Signal()
+    sigFitFinished = QtCore.Signal(object, str, object)  # future, result key, fit function
 
     # Update signals, e.g. for GUI module
     sigParameterUpdated = QtCore.Signal(dict)
@@ -129,11 +134,7 @@ class ODMRLogic(GenericLogic):
         # Initalize the ODMR data arrays (mean signal and sweep matrix)
         self._initialize_odmr_plots()
         # Raw data array
-        self.odmr_raw_data = np.zeros(
-            [self.number_of_lines,
-             len(self._odmr_counter.get_odmr_channels()),
-             self.odmr_plot_x.size]
-        )
+        self._initialize_odmr_raw_data(self.number_of_lines)
 
         # Switch off microwave and set CW frequency and power
         self.mw_off()
@@ -141,6 +142,7 @@ class ODMRLogic(GenericLogic):
 
         # Connect signals
         self.sigNextLine.connect(self._scan_odmr_line, QtCore.Qt.QueuedConnection)
+        self.sigFitFinished.connect(self._fit_finished, QtCore.Qt.QueuedConnection)
         return
 
     def on_deactivate(self):
@@ -162,6 +164,7 @@ class ODMRLogic(GenericLogic):
         self._mw_device.off()
         # Disconnect signals
         self.sigNextLine.disconnect()
+        self.sigFitFinished.disconnect()
 
     @fc.constructor
     def sv_set_fits(self, val):
@@ -237,6 +240,92 @@ class ODMRLogic(GenericLogic):
         self.sigOdmrFitUpdated.emit(self.odmr_fit_x, self.odmr_fit_y, {}, current_fit)
         return
 
+    def _initialize_odmr_raw_data(self, number_of_lines):
+        """ (Re-)allocate the raw data array, the sweep matrix buffer and the running sums.
+
+        @param int number_of_lines: Number of raw data lines to preallocate
+        """
+        data_shape = (len(self.get_odmr_channels()), self.odmr_plot_x.size)
+        # Raw data lines in chronological order. Only the first self._odmr_raw_lines are valid.
+        self._odmr_raw_data = np.zeros((max(1, number_of_lines),) + data_shape)
+        self._odmr_raw_lines = 0
+        # Running sums over all lines and over the last self.lines_to_average lines
+        self._odmr_sum_all = np.zeros(data_shape)
+        self._odmr_sum_average = np.zeros(data_shape)
+        self._initialize_odmr_matrix()
+        return
+
+    def _initialize_odmr_matrix(self):
+        """ (Re-)create the sweep matrix ring buffer and fill it with the latest raw data lines.
+
+        The buffer holds twice the number of displayed lines so a matrix view handed out to the
+        GUI stays untouched for another self.number_of_lines sweeps.
+        """
+        number_of_lines = max(1, self.number_of_lines)
+        self._odmr_matrix_buffer = RingBuffer(capacity=2 * number_of_lines,
+                                              item_shape=self._odmr_raw_data.shape[1:])
+        start = max(0, self._odmr_raw_lines - number_of_lines)
+        for line in self._odmr_raw_data[start:self._odmr_raw_lines]:
+            self._odmr_matrix_buffer.append(line)
+        self.odmr_plot_xy = self._odmr_matrix_buffer.newest(number_of_lines)
+        return
+
+    def _clear_odmr_raw_data(self):
+        """ Discard all raw data lines and reset the running sums. """
+        self._odmr_raw_lines = 0
+        self._odmr_sum_all[...] = 0
+        self._odmr_sum_average[...] = 0
+        self._odmr_matrix_buffer.clear()
+        return
+
+    def _add_odmr_raw_line(self, new_counts):
+        """ Append a new sweep to the raw data and update the running sums and matrix buffer.
+
+        @param numpy.ndarray new_counts: count data of shape (channels, frequencies)
+        """
+        # Expand the raw data array if it is too small
+        if self._odmr_raw_lines == self._odmr_raw_data.shape[0]:
+            old_lines = self._odmr_raw_data.shape[0]
+            self._odmr_raw_data = np.concatenate(
+                (self._odmr_raw_data, np.zeros(self._odmr_raw_data.shape)), axis=0)
+            self.log.warning('raw data array in ODMRLogic was not big enough for the entire '
+                             'measurement. Array will be expanded.\nOld array shape was '
+                             '({0:d}, {1:d}), new shape is ({2:d}, {3:d}).'
+                             ''.format(old_lines,
+                                       self._odmr_raw_data.shape[1],
+                                       self._odmr_raw_data.shape[0],
+                                       self._odmr_raw_data.shape[1]))
+
+        # Remove the line dropping out of the averaging window from the running average sum
+        if 0 < self.lines_to_average <= self._odmr_raw_lines:
+            self._odmr_sum_average -= self._odmr_raw_data[
+                self._odmr_raw_lines - self.lines_to_average]
+
+        self._odmr_raw_data[self._odmr_raw_lines] = new_counts
+        self._odmr_raw_lines += 1
+        self._odmr_sum_all += new_counts
+        self._odmr_sum_average += new_counts
+        self._odmr_matrix_buffer.append(new_counts)
+        return
+
+    def _update_odmr_plot_data(self):
+        """ Calculate the mean signal from the running sums and update the matrix view. """
+        if self.lines_to_average <= 0:
+            self.odmr_plot_y = self._odmr_sum_all / max(1, self._odmr_raw_lines)
+        else:
+            self.odmr_plot_y = self._odmr_sum_average / max(
+                1, min(self.lines_to_average, self._odmr_raw_lines))
+        self.odmr_plot_xy = self._odmr_matrix_buffer.newest(max(1, self.number_of_lines))
+        return
+
+    @property
+    def odmr_raw_data(self):
+        """ View on all recorded raw data lines with the most recent sweep at index 0.
+
+        @return numpy.ndarray: raw data of shape (sweeps, channels, frequencies)
+        """
+        return self._odmr_raw_data[:self._odmr_raw_lines][::-1]
+
     def set_trigger(self, trigger_pol, frequency):
         """
         Set trigger polarity of external microwave trigger (for list and sweep mode).
@@ -266,20 +355,13 @@ class ODMRLogic(GenericLogic):
 
         @return int: actually set lines to average
         """
-        self.lines_to_average = int(lines_to_average)
-
-        if self.lines_to_average <= 0:
-            self.odmr_plot_y = np.mean(
-                self.odmr_raw_data[:max(1, self.elapsed_sweeps), :, :],
-                axis=0,
-                dtype=np.float64
-            )
-        else:
-            self.odmr_plot_y = np.mean(
-                self.odmr_raw_data[:max(1, min(self.lines_to_average, self.elapsed_sweeps)), :, :],
-                axis=0,
-                dtype=np.float64
-            )
+        with self.threadlock:
+            self.lines_to_average = int(lines_to_average)
+            # Recalculate the running sum for the new averaging window once
+            start = max(0, self._odmr_raw_lines - self.lines_to_average)
+            self._odmr_sum_average = np.sum(
+                self._odmr_raw_data[start:self._odmr_raw_lines], axis=0, dtype=np.float64)
+            self._update_odmr_plot_data()
 
         self.sigOdmrPlotsUpdated.emit(self.odmr_plot_x, self.odmr_plot_y, self.odmr_plot_xy)
         self.sigParameterUpdated.emit({'average_length': self.lines_to_average})
@@ -364,7 +446,9 @@ class ODMRLogic(GenericLogic):
         @return int: actually set number of matrix lines
         """
         if isinstance(number_of_lines, int):
-            self.number_of_lines = number_of_lines
+            with self.threadlock:
+                self.number_of_lines = number_of_lines
+                self._initialize_odmr_matrix()
         else:
             self.log.warning('set_matrix_line_number failed. '
                              'Input parameter number_of_lines is no integer.')
@@ -670,11 +754,7 @@ class ODMRLogic(GenericLogic):
                 estimated_number_of_lines = self.number_of_lines
             self.log.debug('Estimated number of raw data lines: {0:d}'
                            ''.format(estimated_number_of_lines))
-            self.odmr_raw_data = np.zeros(
-                [estimated_number_of_lines,
-                 len(self._odmr_counter.get_odmr_channels()),
-                 self.odmr_plot_x.size]
-            )
+            self._initialize_odmr_raw_data(estimated_number_of_lines)
             self.sigNextLine.emit()
             return 0
 
@@ -733,6 +813,7 @@ class ODMRLogic(GenericLogic):
                 self._clearOdmrData = True
         return
 
+    @instrumentation.timed()
     def _scan_odmr_line(self):
         """ Scans one line in ODMR
 
@@ -760,52 +841,21 @@ class ODMRLogic(GenericLogic):
             self.reset_sweep()
 
             # Acquire count data
-            error, new_counts = self._odmr_counter.count_odmr(length=self.odmr_plot_x.size)
+            with instrumentation.measure('hardware'):
+                error, new_counts = self._odmr_counter.count_odmr(length=self.odmr_plot_x.size)
 
             if error:
                 self.stopRequested = True
                 self.sigNextLine.emit()
                 return
 
-            # Add new count data to raw_data array and append if array is too small
+            # Add new count data to raw data and update the running sums
             if self._clearOdmrData:
-                self.odmr_raw_data[:, :, :] = 0
+                self._clear_odmr_raw_data()
                 self._clearOdmrData = False
-            if self.elapsed_sweeps == (self.odmr_raw_data.shape[0] - 1):
-                expanded_array = np.zeros(self.odmr_raw_data.shape)
-                self.odmr_raw_data = np.concatenate((self.odmr_raw_data, expanded_array), axis=0)
-                self.log.warning('raw data array in ODMRLogic was not big enough for the entire '
-                                 'measurement. Array will be expanded.\nOld array shape was '
-                                 '({0:d}, {1:d}), new shape is ({2:d}, {3:d}).'
-                                 ''.format(self.odmr_raw_data.shape[0] - self.number_of_lines,
-                                           self.odmr_raw_data.shape[1],
-                                           self.odmr_raw_data.shape[0],
-                                           self.odmr_raw_data.shape[1]))
-
-            # shift data in the array "up" and add new data at the "bottom"
-            self.odmr_raw_data = np.roll(self.odmr_raw_data, 1, axis=0)
-
-            self.odmr_raw_data[0] = new_counts
-
-            # Add new count data to mean signal
-            if self._clearOdmrData:
-                self.odmr_plot_y[:, :] = 0
-
-            if self.lines_to_average <= 0:
-                self.odmr_plot_y = np.mean(
-                    self.odmr_raw_data[:max(1, self.elapsed_sweeps), :, :],
-                    axis=0,
-                    dtype=np.float64
-                )
-            else:
-                self.odmr_plot_y = np.mean(
-                    self.odmr_raw_data[:max(1, min(self.lines_to_average, self.elapsed_sweeps)), :, :],
-                    axis=0,
-                    dtype=np.float64
-                )
-
-            # Set plot slice of matrix
-            self.odmr_plot_xy = self.odmr_raw_data[:self.number_of_lines, :, :]
+            with instrumentation.measure('processing'):
+                self._add_odmr_raw_line(new_counts)
+                self._update_odmr_plot_data()
 
             # Update elapsed time/sweeps
             self.elapsed_sweeps += 1
@@ -859,8 +909,31 @@ class ODMRLogic(GenericLogic):
                     self.log.warning('Fit function "{0}" not available in ODMRLogic fit container.'
                                      ''.format(fit_function))
 
-        self.odmr_fit_x, self.odmr_fit_y, result = self.fc.do_fit(x_data, y_data)
         key = 'channel: {0}, range: {1}'.format(channel_index, fit_range)
+        if self.module_state() == 'locked':
+            # Do not stall the running sweep loop. The fit is performed by a fit logic worker
+            # thread and repeated requests for the same channel and range are coalesced to a fit
+            # of the most recent data.
+            future = self.fc.do_fit_async(x_data, y_data, key=key)
+            future.add_done_callback(
+                lambda finished: self.sigFitFinished.emit(finished, key, fit_function))
+            return
+
+        fit_x, fit_y, result = self.fc.do_fit(x_data, y_data)
+        self._update_fit_result(fit_x, fit_y, result, key, fit_function)
+        return
+
+    def _fit_finished(self, future, key, fit_function):
+        """ Handle the result of an asynchronous fit started by do_fit. """
+        # Superseded, aborted or failed fits (failures are logged by the fit logic) are ignored
+        if future.cancelled() or future.exception() is not None:
+            return
+        fit_x, fit_y, result = future.result()
+        self._update_fit_result(fit_x, fit_y, result, key, fit_function)
+        return
+
+    def _update_fit_result(self, fit_x, fit_y, result, key, fit_function):
+        self.odmr_fit_x, self.odmr_fit_y = fit_x, fit_y
         if fit_function != 'No Fit':
             self.fits_performed[key] = (self.odmr_fit_x, self.odmr_fit_y, result, self.fc.current_fit)
         else:
@@ -22,6 +22,7 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 from qtpy import QtCore
 import numpy as np
 import time
+from scipy.ndimage import uniform_filter, uniform_filter1d
 
 from logic.generic_logic import GenericLogic
 from core.connector import Connector
@@ -50,9 +51,17 @@ class OptimizerLogic(GenericLogic):
     do_surface_subtraction = StatusVar('surface_subtraction', False)
     surface_subtr_scan_offset = StatusVar('surface_subtraction_offset', 1e-6)
     opt_channel = StatusVar('optimization_channel', 0)
+    # 'fit' for lmfit Gaussian fits, 'analytic' for closed form estimates with fit fallback
+    refocus_estimator = StatusVar('refocus_estimator', 'fit')
+    # 'raster' scans the full xy image, 'adaptive' scans single lines through the estimated peak
+    refocus_scan_mode = StatusVar('refocus_scan_mode', 'raster')
+    adaptive_line_points = StatusVar('adaptive_line_points', 11)
+    adaptive_max_lines = StatusVar('adaptive_max_lines', 8)
+    adaptive_tolerance = StatusVar('adaptive_tolerance', 10e-9)
 
     # "private" signals to keep track of activities here in the optimizer logic
     _sigScanNextXyLine = QtCore.Signal()
+    _sigScanNextAdaptiveLine = QtCore.Signal()
     _sigScanZLine = QtCore.Signal()
     _sigCompletedXyOptimizerScan = QtCore.Signal()
     _sigDoNextOptimizationStep = QtCore.Signal()
@@ -103,6 +112,11 @@ class OptimizerLogic(GenericLogic):
         self.optim_sigma_z = 0.
 
         self._max_offset = 3.
+        # Quality limits of the analytic refocus estimates: minimum ratio of the peak height to the
+        # background noise and maximum rms deviation of the estimated Gaussian from the data
+        # (relative to the peak height)
+        self._analytic_min_snr = 5.
+        self._analytic_max_residual = 0.2
 
         # Sets the current position to the center of the maximal scanning range
         self._current_x = (self.x_range[0] + self.x_range[1]) / 2
@@ -124,6 +138,8 @@ class OptimizerLogic(GenericLogic):
 
         # Sets connections between signals and functions
         self._sigScanNextXyLine.connect(self._refocus_xy_line, QtCore.Qt.QueuedConnection)
+        self._sigScanNextAdaptiveLine.connect(self._refocus_adaptive_line,
+                                              QtCore.Qt.QueuedConnection)
         self._sigScanZLine.connect(self.do_z_optimization, QtCore.Qt.QueuedConnection)
         self._sigCompletedXyOptimizerScan.connect(self._set_optimized_xy_from_fit, QtCore.Qt.QueuedConnection)
 
@@ -188,6 +204,50 @@ class OptimizerLogic(GenericLogic):
         self.refocus_Z_size = size
         self.sigRefocusZSizeChanged.emit()
 
+    def set_refocus_estimator(self, estimator):
+        """ Set the method used to determine the optimized position from the refocus scans.
+
+            @param str estimator: 'fit' for full Gaussian fits of the refocus scans or 'analytic'
+                                  for closed form estimates from the peak neighbourhood. The
+                                  analytic estimate falls back to the fit if it fails its quality
+                                  checks.
+        """
+        if estimator not in ('fit', 'analytic'):
+            self.log.error('Unknown refocus estimator "{0}". Use "fit" or "analytic".'
+                           ''.format(estimator))
+            return
+        self.refocus_estimator = estimator
+
+    def set_refocus_scan_mode(self, mode, line_points=None, max_lines=None, tolerance=None):
+        """ Set how the xy optimization step scans the sample.
+
+            @param str mode: 'raster' for the full xy refocus image or 'adaptive' for line scans
+                             alternating between x and y through the current peak estimate. The
+                             line range shrinks to the peak after each line. The adaptive scan stops
+                             when the position uncertainty of both axes is below tolerance and
+                             falls back to the raster scan if a line can not be evaluated.
+            @param int line_points: optional, number of points per adaptive line (>= 7)
+            @param int max_lines: optional, maximum number of adaptive lines (>= 2)
+            @param float tolerance: optional, position uncertainty in m to stop the adaptive scan
+        """
+        if mode not in ('raster', 'adaptive'):
+            self.log.error('Unknown refocus scan mode "{0}". Use "raster" or "adaptive".'
+                           ''.format(mode))
+            return
+        if line_points is not None:
+            if line_points < 7:
+                self.log.error('Adaptive refocus lines need at least 7 points.')
+                return
+            self.adaptive_line_points = int(line_points)
+        if max_lines is not None:
+            if max_lines < 2:
+                self.log.error('Adaptive refocus needs at least 2 lines.')
+                return
+            self.adaptive_max_lines = int(max_lines)
+        if tolerance is not None:
+            self.adaptive_tolerance = float(tolerance)
+        self.refocus_scan_mode = mode
+
     def start_refocus(self, initial_pos=None, caller_tag='unknown', tag='logic'):
         """ Starts the optimization scan around initial_pos
 
@@ -382,20 +442,145 @@ class OptimizerLogic(GenericLogic):
         else:
             self._sigCompletedXyOptimizerScan.emit()
 
+    def _start_adaptive_xy_scan(self):
+        """ Initialise the adaptive xy optimization and scan the first line. """
+        self._adaptive_line_count = 0
+        self._adaptive_half_range = np.full(2, 0.5 * self.refocus_XY_size)
+        self._adaptive_uncertainty = np.full(2, np.inf)
+        self._sigScanNextAdaptiveLine.emit()
+
+    def _refocus_adaptive_line(self):
+        """ Scan a line through the current xy peak estimate and refine the estimate.
+        This method repeats itself using the _sigScanNextAdaptiveLine alternating between x and y
+        until the estimate has converged.
+        """
+        n_ch = len(self._scanning_device.get_scanner_axes())
+        # stop scanning if instructed
+        if self.stopRequested:
+            with self.threadlock:
+                self.stopRequested = False
+                self.finish_refocus()
+                self.sigImageUpdated.emit()
+                self.sigRefocusFinished.emit(
+                    self._caller_tag,
+                    [self.optim_pos_x, self.optim_pos_y, self.optim_pos_z, 0][0:n_ch])
+                return
+
+        axis = self._adaptive_line_count % 2
+        position = np.array([self.optim_pos_x, self.optim_pos_y, self.optim_pos_z])
+        axis_range = (self.x_range, self.y_range)[axis]
+        half_range = self._adaptive_half_range[axis]
+        scan_positions = np.linspace(max(position[axis] - half_range, axis_range[0]),
+                                     min(position[axis] + half_range, axis_range[1]),
+                                     self.adaptive_line_points)
+        line = np.tile(position[:, np.newaxis], (1, scan_positions.size))
+        line[axis] = scan_positions
+
+        status = self._move_to_start_pos(line[:, 0])
+        if status < 0:
+            self.log.error('Error during move to starting point.')
+            self.stop_refocus()
+            self._sigScanNextAdaptiveLine.emit()
+            return
+
+        if n_ch <= 3:
+            scan_line = line[0:n_ch]
+        else:
+            scan_line = np.vstack((line, np.zeros(scan_positions.shape)))
+        line_counts = self._scanning_device.scan_line(scan_line)
+        if np.any(line_counts == -1):
+            self.log.error('The scan went wrong, killing the scanner.')
+            self.stop_refocus()
+            self._sigScanNextAdaptiveLine.emit()
+            return
+
+        self._add_adaptive_line_to_image(line, line_counts)
+        self._adaptive_line_count += 1
+
+        estimate = self._estimate_line_peak(scan_positions, line_counts[:, self.opt_channel])
+        initial_position = (self._initial_pos_x, self._initial_pos_y)[axis]
+        if estimate is not None and not (
+                abs(estimate['center'] - initial_position) < self._max_offset
+                and axis_range[0] <= estimate['center'] <= axis_range[1]):
+            self.log.debug('Adaptive refocus estimate is too far from the initial position or '
+                           'out of the scanner range.')
+            estimate = None
+        if estimate is None:
+            self.log.debug('Adaptive refocus line could not be evaluated. Scanning the full xy '
+                           'refocus image.')
+            self.optim_pos_x = self._initial_pos_x
+            self.optim_pos_y = self._initial_pos_y
+            self._initialize_xy_refocus_image()
+            self._sigScanNextXyLine.emit()
+            return
+
+        # Statistical uncertainty of the center (photon number from count rate and dwell time)
+        # or the change of the estimate, whichever is larger
+        profile = line_counts[:, self.opt_channel] - (estimate['offset']
+                                                      + estimate['slope'] * scan_positions)
+        photons = max(np.sum(profile[profile > 0]) / self._clock_frequency, 1)
+        self._adaptive_uncertainty[axis] = max(estimate['sigma'] / np.sqrt(photons),
+                                               abs(estimate['center'] - position[axis]))
+        self._adaptive_half_range[axis] = min(3 * estimate['sigma'], 0.5 * self.refocus_XY_size)
+        if axis == 0:
+            self.optim_pos_x = estimate['center']
+            self.optim_sigma_x = estimate['sigma']
+        else:
+            self.optim_pos_y = estimate['center']
+            self.optim_sigma_y = estimate['sigma']
+        self.sigImageUpdated.emit()
+
+        converged = np.all(self._adaptive_uncertainty < self.adaptive_tolerance)
+        if (converged and self._adaptive_line_count >= 2) \
+                or self._adaptive_line_count >= self.adaptive_max_lines:
+            self._sigDoNextOptimizationStep.emit()
+        else:
+            self._sigScanNextAdaptiveLine.emit()
+
+    def _add_adaptive_line_to_image(self, line, line_counts):
+        """ Write the counts of an adaptive line scan into the nearest pixels of the xy refocus
+        image for display.
+
+        @param numpy.ndarray line: scanned positions, shape (3, number of points)
+        @param numpy.ndarray line_counts: counts, shape (number of points, number of channels)
+        """
+        def nearest_index(values, positions):
+            if values[-1] == values[0]:
+                return np.zeros(positions.shape, dtype=int)
+            scaled = (positions - values[0]) / (values[-1] - values[0]) * (values.size - 1)
+            return np.rint(scaled).astype(int)
+
+        ix = nearest_index(self._X_values, line[0])
+        iy = nearest_index(self._Y_values, line[1])
+        valid = (ix >= 0) & (ix < self._X_values.size) & (iy >= 0) & (iy < self._Y_values.size)
+        s_ch = len(self.get_scanner_count_channels())
+        self.xy_refocus_image[iy[valid], ix[valid], 3:3 + s_ch] = line_counts[valid]
+
     def _set_optimized_xy_from_fit(self):
         """Fit the completed xy optimizer scan and set the optimized xy position."""
-        fit_x, fit_y = np.meshgrid(self._X_values, self._Y_values)
-        xy_fit_data = self.xy_refocus_image[:, :, 3+self.opt_channel].ravel()
-        axes = np.empty((len(self._X_values) * len(self._Y_values), 2))
-        axes = (fit_x.flatten(), fit_y.flatten())
-        result_2D_gaus = self._fit_logic.make_twoDgaussian_fit(
-            xy_axes=axes,
-            data=xy_fit_data,
-            estimator=self._fit_logic.estimate_twoDgaussian_MLE
-        )
-        # print(result_2D_gaus.fit_report())
-
-        if result_2D_gaus.success is False:
+        best_values = None
+        if self.refocus_estimator == 'analytic':
+            best_values = self._estimate_xy_peak()
+            if best_values is None:
+                self.log.debug('Analytic xy refocus estimate failed. Using 2D Gaussian fit.')
+
+        if best_values is not None:
+            success = True
+        else:
+            fit_x, fit_y = np.meshgrid(self._X_values, self._Y_values)
+            xy_fit_data = self.xy_refocus_image[:, :, 3+self.opt_channel].ravel()
+            axes = np.empty((len(self._X_values) * len(self._Y_values), 2))
+            axes = (fit_x.flatten(), fit_y.flatten())
+            result_2D_gaus = self._fit_logic.make_twoDgaussian_fit(
+                xy_axes=axes,
+                data=xy_fit_data,
+                estimator=self._fit_logic.estimate_twoDgaussian_MLE
+            )
+            # print(result_2D_gaus.fit_report())
+            success = result_2D_gaus.success
+            best_values = result_2D_gaus.best_values
+
+        if success is False:
             self.log.error('Error: 2D Gaussian Fit was not successfull!.')
             print('2D gaussian fit not successfull')
             self.optim_pos_x = self._initial_pos_x
@@ -404,13 +589,13 @@ class OptimizerLogic(GenericLogic):
             self.optim_sigma_y = 0.
         else:
             #                @reviewer: Do we need this. With constraints not one of these cases will be possible....
-            if abs(self._initial_pos_x - result_2D_gaus.best_values['center_x']) < self._max_offset and abs(self._initial_pos_x - result_2D_gaus.best_values['center_x']) < self._max_offset:
-                if self.x_range[0] <= result_2D_gaus.best_values['center_x'] <= self.x_range[1]:
-                    if self.y_range[0] <= result_2D_gaus.best_values['center_y'] <= self.y_range[1]:
-                        self.optim_pos_x = result_2D_gaus.best_values['center_x']
-                        self.optim_pos_y = result_2D_gaus.best_values['center_y']
-                        self.optim_sigma_x = result_2D_gaus.best_values['sigma_x']
-                        self.optim_sigma_y = result_2D_gaus.best_values['sigma_y']
+            if abs(self._initial_pos_x - best_values['center_x']) < self._max_offset and abs(self._initial_pos_x - best_values['center_x']) < self._max_offset:
+                if self.x_range[0] <= best_values['center_x'] <= self.x_range[1]:
+                    if self.y_range[0] <= best_values['center_y'] <= self.y_range[1]:
+                        self.optim_pos_x = best_values['center_x']
+                        self.optim_pos_y = best_values['center_y']
+                        self.optim_sigma_x = best_values['sigma_x']
+                        self.optim_sigma_y = best_values['sigma_y']
             else:
                 self.optim_pos_x = self._initial_pos_x
                 self.optim_pos_y = self._initial_pos_y
@@ -421,14 +606,221 @@ class OptimizerLogic(GenericLogic):
         self.sigImageUpdated.emit()
         self._sigDoNextOptimizationStep.emit()
 
+    @staticmethod
+    def _contiguous_extent(profile, index, threshold):
+        """ Count the points next to profile[index] that are above threshold without interruption.
+
+        @param numpy.ndarray profile: 1D data
+        @param int index: index of the start point
+        @param float threshold: threshold value
+
+        @return tuple: number of points (left, right) of index
+        """
+        above = profile > threshold
+        left = 0
+        while index - left - 1 >= 0 and above[index - left - 1]:
+            left += 1
+        right = 0
+        while index + right + 1 < profile.size and above[index + right + 1]:
+            right += 1
+        return max(1, left), max(1, right)
+
+    @staticmethod
+    def _fit_log_parabola(coordinates, signal):
+        """ Fit a Gaussian to positive data by a weighted least squares fit of a parabola (without
+        mixed terms) to the logarithm of the data.
+
+        @param list coordinates: list of 1D arrays, one per dimension
+        @param numpy.ndarray signal: 1D array of positive data
+
+        @return tuple: (amplitude, centers, sigmas) with one center and sigma per dimension, None
+                       if the logarithm of the data is not described by a downward parabola
+        """
+        design = np.column_stack([np.ones(signal.size)] + list(coordinates)
+                                 + [c ** 2 for c in coordinates])
+        # Weighting the rows with the signal compensates the noise amplification of the logarithm
+        coefficients = np.linalg.lstsq(design * signal[:, np.newaxis],
+                                       np.log(signal) * signal,
+                                       rcond=None)[0]
+        dims = len(coordinates)
+        linear = coefficients[1:1 + dims]
+        quadratic = coefficients[1 + dims:]
+        if np.any(quadratic >= 0):
+            return None
+        centers = -linear / (2 * quadratic)
+        sigmas = np.sqrt(-1 / (2 * quadratic))
+        amplitude = np.exp(coefficients[0] - np.sum(linear ** 2 / (4 * quadratic)))
+        return amplitude, centers, sigmas
+
+    def _estimate_xy_peak(self):
+        """ Closed form estimate of the peak position in the xy refocus image.
+
+        A Gaussian is estimated by a log-parabola fit to the background corrected counts of the
+        pixels around the brightest spot.
+
+        @return dict: center_x, center_y, sigma_x and sigma_y or None if the estimate fails one of
+                      the quality checks (signal to noise ratio, peak at the image border,
+                      width and deviation of the estimated Gaussian from the data)
+        """
+        data = self.xy_refocus_image[:, :, 3 + self.opt_channel]
+        if min(data.shape) < 3 or not np.all(np.isfinite(data)):
+            return None
+        step_x = self._X_values[1] - self._X_values[0]
+        step_y = self._Y_values[1] - self._Y_values[0]
+        if step_x == 0 or step_y == 0:
+            return None
+
+        # Background level and noise from the image border
+        border = np.concatenate((data[0], data[-1], data[1:-1, 0], data[1:-1, -1]))
+        background = np.median(border)
+        noise = 1.4826 * np.median(np.abs(border - background))
+        signal = data - background
+
+        smoothed = uniform_filter(signal, size=3, mode='nearest')
+        iy, ix = np.unravel_index(np.argmax(smoothed), signal.shape)
+        peak = smoothed[iy, ix]
+        if peak <= 0 or peak <= self._analytic_min_snr * noise:
+            return None
+        if ix in (0, data.shape[1] - 1) or iy in (0, data.shape[0] - 1):
+            return None
+
+        threshold = 0.2 * peak
+        left, right = self._contiguous_extent(signal[iy], ix, threshold)
+        below, above = self._contiguous_extent(signal[:, ix], iy, threshold)
+        window = signal[iy - below:iy + above + 1, ix - left:ix + right + 1]
+        u, v = np.meshgrid(np.arange(-left, right + 1), np.arange(-below, above + 1))
+        mask = window > threshold
+        if np.unique(u[mask]).size < 3 or np.unique(v[mask]).size < 3:
+            return None
+
+        estimate = self._fit_log_parabola([u[mask], v[mask]], window[mask])
+        if estimate is None:
+            return None
+        amplitude, (center_u, center_v), (sigma_u, sigma_v) = estimate
+        if not (-left - 0.5 <= center_u <= right + 0.5 and -below - 0.5 <= center_v <= above + 0.5):
+            return None
+        if not (0.3 <= sigma_u <= data.shape[1] and 0.3 <= sigma_v <= data.shape[0]):
+            return None
+        model = amplitude * np.exp(-(u - center_u) ** 2 / (2 * sigma_u ** 2)
+                                   - (v - center_v) ** 2 / (2 * sigma_v ** 2))
+        if np.sqrt(np.mean((model - window) ** 2)) > self._analytic_max_residual * peak:
+            return None
+
+        return {'center_x': self._X_values[ix] + center_u * step_x,
+                'center_y': self._Y_values[iy] + center_v * step_y,
+                'sigma_x': sigma_u * abs(step_x),
+                'sigma_y': sigma_v * abs(step_y)}
+
+    def _estimate_line_peak(self, positions, data):
+        """ Closed form estimate of a Gaussian peak on a linear background in a line scan.
+
+        The Gaussian is estimated by a log-parabola fit to the background corrected counts around
+        the maximum. Starting from a background through the outer points of the line, amplitude and
+        background are then solved by linear least squares for the estimated center and width and
+        the log-parabola fit is repeated until the center has converged.
+
+        @param numpy.ndarray positions: equidistant positions of the line scan
+        @param numpy.ndarray data: counts of the line scan
+
+        @return dict: amplitude, center, sigma, offset and slope of the peak or None if the
+                      estimate fails one of the quality checks
+        """
+        if data.size < 7 or not np.all(np.isfinite(data)):
+            return None
+        step = positions[1] - positions[0]
+        if step == 0:
+            return None
+        # Work in units of points
+        points = np.arange(data.size)
+
+        edge = max(2, data.size // 5)
+        edges = np.r_[0:edge, data.size - edge:data.size]
+        background = np.polyval(np.polyfit(points[edges], data[edges], 1), points)
+        center = None
+        for iteration in range(5):
+            signal = data - background
+            smoothed = uniform_filter1d(signal, size=3, mode='nearest')
+            index = np.argmax(smoothed)
+            peak = smoothed[index]
+            if peak <= 0 or index in (0, data.size - 1):
+                return None
+
+            threshold = 0.2 * peak
+            left, right = self._contiguous_extent(signal, index, threshold)
+            window = signal[index - left:index + right + 1]
+            u = np.arange(-left, right + 1)
+            mask = window > threshold
+            if np.count_nonzero(mask) < 3:
+                return None
+            estimate = self._fit_log_parabola([u[mask]], window[mask])
+            if estimate is None:
+                return None
+            amplitude, (center_u, ), (sigma_u, ) = estimate
+            if not (-left - 0.5 <= center_u <= right + 0.5 and 0.3 <= sigma_u <= data.size):
+                return None
+
+            last_center, center = center, index + center_u
+            gaussian = np.exp(-(points - center) ** 2 / (2 * sigma_u ** 2))
+            design = np.column_stack((gaussian, np.ones(data.size), points))
+            amplitude, offset, slope = np.linalg.lstsq(design, data, rcond=None)[0]
+            background = offset + slope * points
+            if last_center is not None and abs(center - last_center) < 1e-3:
+                break
+
+        # Quality of the final estimate
+        residual = data - amplitude * gaussian - background
+        noise = np.sqrt(np.sum(residual ** 2) / (data.size - 5))
+        if amplitude <= self._analytic_min_snr * noise:
+            return None
+        near_peak = np.abs(points - center) <= 2 * sigma_u
+        if np.sqrt(np.mean(residual[near_peak] ** 2)) > self._analytic_max_residual * amplitude:
+            return None
+
+        return {'amplitude': amplitude,
+                'center': positions[0] + center * step,
+                'sigma': sigma_u * abs(step),
+                'offset': offset - slope * positions[0] / step,
+                'slope': slope / step}
+
+    def _estimate_z_peak(self):
+        """ Closed form estimate of the peak in the z refocus line.
+
+        @return lmfit.Parameters: parameters of the gaussianlinearoffset model or None if the
+                                  estimate fails one of the quality checks
+        """
+        estimate = self._estimate_line_peak(self._zimage_Z_values,
+                                            np.asarray(self.z_refocus_line)[:, self.opt_channel])
+        if estimate is None:
+            return None
+
+        # The slope model of gaussianlinearoffset is a constant, so the background is represented
+        # by its value at the peak center.
+        model, params = self._fit_logic.make_gaussianlinearoffset_model()
+        params['amplitude'].set(value=estimate['amplitude'])
+        params['center'].set(value=estimate['center'])
+        params['sigma'].set(value=estimate['sigma'])
+        params['offset'].set(value=estimate['offset'] + estimate['slope'] * estimate['center'])
+        params['slope'].set(value=0)
+        return params
+
     def do_z_optimization(self):
         """ Do the z axis optimization."""
         # z scaning
         self._scan_z_line()
 
+        # Closed form estimate of the z peak. Custom fit parameters always require the fit.
+        estimate = None
+        if self.refocus_estimator == 'analytic' and not any(self.use_custom_params.values()):
+            estimate = self._estimate_z_peak()
+            if estimate is None:
+                self.log.debug('Analytic z refocus estimate failed. Using Gaussian fit.')
+
         # z-fit
         # If subtracting surface, then data can go negative and the gaussian fit offset constraints need to be adjusted
-        if self.do_surface_subtraction:
+        if estimate is not None:
+            success = True
+            params = estimate
+        elif self.do_surface_subtraction:
             adjusted_param = {'offset': {
                 'value': 1e-12,
                 'min': -self.z_refocus_line[:, self.opt_channel].max(),
@@ -452,9 +844,13 @@ class OptimizerLogic(GenericLogic):
                     units='m',
                     estimator=self._fit_logic.estimate_gaussianlinearoffset_peak
                     )
-        self.z_params = result.params
+        if estimate is None:
+            success = result.success
+            params = result.params
+        best_values = params.valuesdict()
+        self.z_params = params
 
-        if result.success is False:
+        if success is False:
             self.log.error('error in 1D Gaussian Fit.')
             self.optim_pos_z = self._initial_pos_z
             self.optim_sigma_z = 0.
@@ -462,18 +858,18 @@ class OptimizerLogic(GenericLogic):
         else:  # move to new position
             #                @reviewer: Do we need this. With constraints not one of these cases will be possible....
             # checks if new pos is too far away
-            if abs(self._initial_pos_z - result.best_values['center']) < self._max_offset:
+            if abs(self._initial_pos_z - best_values['center']) < self._max_offset:
                 # checks if new pos is within the scanner range
-                if self.z_range[0] <= result.best_values['center'] <= self.z_range[1]:
-                    self.optim_pos_z = result.best_values['center']
-                    self.optim_sigma_z = result.best_values['sigma']
-                    gauss, params = self._fit_logic.make_gaussianlinearoffset_model()
+                if self.z_range[0] <= best_values['center'] <= self.z_range[1]:
+                    self.optim_pos_z = best_values['center']
+                    self.optim_sigma_z = best_values['sigma']
+                    gauss, model_params = self._fit_logic.make_gaussianlinearoffset_model()
                     self.z_fit_data = gauss.eval(
-                        x=self._fit_zimage_Z_values, params=result.params)
+                        x=self._fit_zimage_Z_values, params=params)
                 else:  # new pos is too far away
                     # checks if new pos is too high
                     self.optim_sigma_z = 0.
-                    if result.best_values['center'] > self._initial_pos_z:
+                    if best_values['center'] > self._initial_pos_z:
                         if self._initial_pos_z + 0.5 * self.refocus_Z_size <= self.z_range[1]:
                             # moves to higher edge of scan range
                             self.optim_pos_z = self._initial_pos_z + 0.5 * self.refocus_Z_size
@@ -630,7 +1026,10 @@ class OptimizerLogic(GenericLogic):
         # Launch the next step
         if this_step == 'XY':
             self._initialize_xy_refocus_image()
-            self._sigScanNextXyLine.emit()
+            if self.refocus_scan_mode == 'adaptive':
+                self._start_adaptive_xy_scan()
+            else:
+                self._sigScanNextXyLine.emit()
         elif this_step == 'Z':
             self._initialize_z_refocus_image()
             self._sigScanZLine.emit()
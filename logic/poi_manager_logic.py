@@ -28,7 +28,9 @@ import time
 from collections import OrderedDict
 from core.connector import Connector
 from core.statusvariable import StatusVar
-from datetime import datetime
+from datetime import datetime, timedelta
+from scipy.ndimage import maximum_filter
+from scipy.spatial import cKDTree
 from logic.generic_logic import GenericLogic
 from qtpy import QtCore
 from core.util.mutex import Mutex
@@ -60,17 +62,24 @@ class RegionOfInterest:
         # Nametag for POIs. If you add a POI without explicitly setting a name, the name will be
         # generated by using the nametag and appending it with consecutive integer numbers.
         self._poi_tag = None
-        # dictionary of POIs contained in this ROI with keys being the name
-        self._pois = dict()
+        # Names of the POIs contained in this ROI (in order of addition)
+        self._poi_names = list()
+        # Index of each POI (by name) in the POI anchor array
+        self._poi_index = dict()
+        # Anchors (x, y, z) of all POIs relative to the initial ROI origin, one row per POI
+        self._poi_anchors = np.zeros((0, 3), dtype=float)
+        # KD-trees of the POI anchors for nearest neighbour and range queries.
+        # Keys are the number of dimensions used (2 for xy or 3 for xyz). Built on demand.
+        self._poi_trees = dict()
 
         self.creation_time = creation_time
         self.name = name
         self.poi_nametag = poi_nametag
         self.pos_history = history
         self.set_scan_image(scan_image, scan_image_extent)
-        if poi_list is not None:
-            for poi in poi_list:
-                self.add_poi(poi)
+        if poi_list is not None and len(poi_list) > 0:
+            self._insert_pois(np.array([poi.position for poi in poi_list], dtype=float),
+                              [poi.name for poi in poi_list])
         return
 
     @property
@@ -151,82 +160,231 @@ class RegionOfInterest:
 
     @property
     def poi_names(self):
-        return list(self._pois)
+        return list(self._poi_names)
 
     @property
     def poi_positions(self):
-        origin = self.origin
-        return {name: poi.position + origin for name, poi in self._pois.items()}
+        return dict(zip(self._poi_names, self._poi_anchors + self.origin))
 
     @property
     def poi_anchors(self):
-        return {name: poi.position for name, poi in self._pois.items()}
+        return dict(zip(self._poi_names, self._poi_anchors.copy()))
 
-    def get_poi_position(self, name):
+    @property
+    def poi_position_array(self):
+        """ Positions of all POIs as array of shape (n, 3) in the order of poi_names. """
+        return self._poi_anchors + self.origin
+
+    @property
+    def poi_anchor_array(self):
+        """ Anchors of all POIs as array of shape (n, 3) in the order of poi_names. """
+        return self._poi_anchors.copy()
+
+    def _get_poi_index(self, name):
         if not isinstance(name, str):
             raise TypeError('POI name must be of type str.')
-        if name not in self._pois:
+        if name not in self._poi_index:
             raise KeyError('No POI with name "{0}" found in POI list.'.format(name))
-        return self._pois[name].position + self.origin
+        return self._poi_index[name]
+
+    def _get_poi_tree(self, dimensions):
+        """ Returns a KD-tree of the POI anchors in the first <dimensions> coordinates.
+        The trees are built on demand and discarded on every change of the POI anchors.
+        """
+        if dimensions not in self._poi_trees:
+            self._poi_trees[dimensions] = cKDTree(self._poi_anchors[:, :dimensions])
+        return self._poi_trees[dimensions]
+
+    def _anchors_changed(self):
+        self._poi_trees = dict()
+        return
+
+    def get_poi_position(self, name):
+        return self._poi_anchors[self._get_poi_index(name)] + self.origin
 
     def get_poi_anchor(self, name):
-        if not isinstance(name, str):
-            raise TypeError('POI name must be of type str.')
-        if name not in self._pois:
-            raise KeyError('No POI with name "{0}" found in POI list.'.format(name))
-        return self._pois[name].position
+        return self._poi_anchors[self._get_poi_index(name)].copy()
 
     def set_poi_position(self, name, new_pos):
-        if name not in self._pois:
+        if name not in self._poi_index:
             raise KeyError('POI with name "{0}" not found in ROI "{1}".\n'
                            'Unable to change POI position.'.format(name, self.name))
-        self._pois[name].position = np.array(new_pos, dtype=float) - self.origin
+        self.set_poi_anchor(name, np.array(new_pos, dtype=float) - self.origin)
         return
 
     def set_poi_anchor(self, name, new_pos):
-        if name not in self._pois:
+        if name not in self._poi_index:
             raise KeyError('POI with name "{0}" not found in ROI "{1}".\n'
                            'Unable to change POI position.'.format(name, self.name))
-        self._pois[name].position = new_pos
+        if len(new_pos) != 3:
+            raise ValueError('POI position to set must be iterable of length 3 (X, Y, Z).')
+        self._poi_anchors[self._poi_index[name]] = new_pos
+        self._anchors_changed()
         return
 
+    def get_nearest_poi(self, position, max_distance=None):
+        """
+        Find the POI closest to a given position.
+
+        @param float[] position: (x, y) or (x, y, z) position (absolute coordinates). If only x and
+                                 y are given, the z coordinate of the POIs is ignored.
+        @param float max_distance: optional maximum distance of the POI to the given position
+
+        @return str: Name of the nearest POI, None if there is no POI (within max_distance)
+        """
+        if len(self._poi_names) == 0:
+            return None
+        dimensions = len(position)
+        anchor = np.array(position, dtype=float) - self.origin[:dimensions]
+        if max_distance is None:
+            max_distance = np.inf
+        distance, index = self._get_poi_tree(dimensions).query(anchor,
+                                                               distance_upper_bound=max_distance)
+        if not np.isfinite(distance):
+            return None
+        return self._poi_names[index]
+
+    def get_pois_in_range(self, position, radius):
+        """
+        Find all POIs within a certain distance of a given position.
+
+        @param float[] position: (x, y) or (x, y, z) position (absolute coordinates). If only x and
+                                 y are given, the z coordinate of the POIs is ignored.
+        @param float radius: maximum distance of the POIs to the given position
+
+        @return list: Names of the POIs found (in order of poi_names)
+        """
+        if len(self._poi_names) == 0:
+            return list()
+        dimensions = len(position)
+        anchor = np.array(position, dtype=float) - self.origin[:dimensions]
+        indices = self._get_poi_tree(dimensions).query_ball_point(anchor, radius)
+        return [self._poi_names[index] for index in sorted(indices)]
+
+    def transform_poi_anchors(self, transform_matrix=None, shift=None):
+        """
+        Apply a linear transformation and/or a shift to the anchors of all POIs at once,
+        i.e. anchor -> transform_matrix @ anchor + shift.
+
+        @param numpy.ndarray transform_matrix: optional transformation matrix of shape (3, 3)
+        @param float[3] shift: optional shift vector (x, y, z)
+        """
+        if transform_matrix is not None:
+            transform_matrix = np.asarray(transform_matrix, dtype=float)
+            if transform_matrix.shape != (3, 3):
+                raise ValueError('Transformation matrix must be array of shape (3, 3).')
+            self._poi_anchors = self._poi_anchors @ transform_matrix.T
+        if shift is not None:
+            if len(shift) != 3:
+                raise ValueError('POI shift must be iterable of length 3 (X, Y, Z).')
+            self._poi_anchors += np.asarray(shift, dtype=float)
+        self._anchors_changed()
+        return
+
+    def _create_poi_name(self, timestamp, tag_index):
+        """ Create a generic POI name from the poi_nametag if it is set or from a timestamp.
+
+        @return (str, datetime, int): name and the timestamp and tag index for the next name
+        """
+        if self._poi_tag is None:
+            return (timestamp.strftime('poi_%Y%m%d%H%M%S%f'),
+                    timestamp + timedelta(microseconds=1),
+                    tag_index)
+        tag_index += 1
+        return '{0}{1:d}'.format(self._poi_tag, tag_index), timestamp, tag_index
+
     def rename_poi(self, name, new_name=None):
         if new_name is not None and not isinstance(new_name, str):
             raise TypeError('POI name to set must be of type str or None.')
-        if name not in self._pois:
+        if name not in self._poi_index:
             raise KeyError('Name "{0}" not found in POI list.'.format(name))
-        if new_name in self._pois:
+        if new_name in self._poi_index:
             raise NameError('New POI name "{0}" already present in current POI list.')
-        self._pois[name].name = new_name
-        self._pois[new_name] = self._pois.pop(name)
+        if not new_name:
+            new_name = datetime.now().strftime('poi_%Y%m%d%H%M%S%f')
+        index = self._poi_index.pop(name)
+        self._poi_names[index] = new_name
+        self._poi_index[new_name] = index
         return
 
     def add_poi(self, position, name=None):
+        """
+        Add a single POI.
+
+        @param float[3]|PointOfInterest position: (x, y, z) position (absolute coordinates) or
+                                                  PointOfInterest instance (position is the anchor)
+        @param str name: Optional POI name. Ignored for PointOfInterest instances.
+
+        @return str: Name of the added POI
+        """
         if isinstance(position, PointOfInterest):
-            poi_inst = position
-        else:
-            position = position - self.origin
-            # Create a generic name from the poi_nametag if it is set and no name is given.
-            if name is None and self._poi_tag is not None:
-                tag_index = len(self._pois)
-                while True:
-                    tag_index += 1
-                    name = '{0}{1:d}'.format(self._poi_tag, tag_index)
-                    if name not in self._pois:
-                        break
-            poi_inst = PointOfInterest(position=position, name=name)
-        if poi_inst.name in self._pois:
-            raise ValueError('POI with name "{0}" already present in ROI "{1}".\n'
-                             'Could not add POI to ROI'.format(poi_inst.name, self.name))
-        self._pois[poi_inst.name] = poi_inst
-        return
+            return self._insert_pois(position.position.reshape((1, 3)), [position.name])[0]
+        return self.add_pois([position], [name])[0]
+
+    def add_pois(self, positions, names=None):
+        """
+        Add several POIs at once. Generic names are created for POIs without a given name.
+
+        @param float[][3] positions: Iterable of (x, y, z) positions (absolute coordinates)
+        @param list names: Optional list of POI names (or None entries) of the same length
+
+        @return list: Names of the added POIs
+        """
+        anchors = np.array(positions, dtype=float).reshape((-1, 3)) - self.origin
+        return self._insert_pois(anchors, names)
+
+    def _insert_pois(self, anchors, names=None):
+        if names is None:
+            names = [None] * len(anchors)
+        elif len(names) != len(anchors):
+            raise ValueError('Number of POI names must match the number of POI positions.')
+
+        new_names = list()
+        new_name_set = set()
+        tag_index = len(self._poi_names)
+        timestamp = datetime.now()
+        for name in names:
+            if name:
+                if not isinstance(name, str):
+                    raise TypeError('POI name must be either None or of type str.')
+                if name in self._poi_index or name in new_name_set:
+                    raise ValueError('POI with name "{0}" already present in ROI "{1}".\n'
+                                     'Could not add POI to ROI'.format(name, self.name))
+            else:
+                # Generic names are unique by incrementing the timestamp (1 us) or the tag index
+                while not name or name in self._poi_index or name in new_name_set:
+                    name, timestamp, tag_index = self._create_poi_name(timestamp, tag_index)
+            new_names.append(name)
+            new_name_set.add(name)
+
+        first_index = len(self._poi_names)
+        self._poi_names.extend(new_names)
+        self._poi_index.update((name, first_index + i) for i, name in enumerate(new_names))
+        self._poi_anchors = np.concatenate((self._poi_anchors, anchors))
+        self._anchors_changed()
+        return new_names
 
     def delete_poi(self, name):
         if not isinstance(name, str):
             raise TypeError('POI name to delete must be of type str.')
-        if name not in self._pois:
+        if name not in self._poi_index:
             raise KeyError('Name "{0}" not found in POI list.'.format(name))
-        del self._pois[name]
+        self.delete_pois([name])
+        return
+
+    def delete_pois(self, names):
+        """
+        Delete several POIs at once.
+
+        @param list names: Names of the POIs to delete
+        """
+        indices = [self._get_poi_index(name) for name in names]
+        keep = np.ones(len(self._poi_names), dtype=bool)
+        keep[indices] = False
+        self._poi_names = [name for name, keep_poi in zip(self._poi_names, keep) if keep_poi]
+        self._poi_index = {name: index for index, name in enumerate(self._poi_names)}
+        self._poi_anchors = self._poi_anchors[keep]
+        self._anchors_changed()
         return
 
     def set_scan_image(self, image_arr, image_extent):
@@ -280,7 +438,8 @@ class RegionOfInterest:
                 'pos_history': self.pos_history,
                 'scan_image': self.scan_image,
                 'scan_image_extent': self.scan_image_extent,
-                'pois': [poi.to_dict() for poi in self._pois.values()]}
+                'pois': [{'name': name, 'position': tuple(anchor)}
+                         for name, anchor in zip(self._poi_names, self._poi_anchors)]}
 
     @classmethod
     def from_dict(cls, dict_repr):
@@ -577,8 +736,8 @@ class PoiManagerLogic(GenericLogic):
 
         @param str name: Name for the POI (must be unique within ROI).
                          None (default) will create generic name.
-        @param scalar[3] position: Iterable of length 3 representing the (x, y, z) position with
-                                   respect to the ROI origin. None (default) causes the current
+        @param scalar[3] position: Iterable of length 3 representing the (x, y, z) position in
+                                   absolute coordinates. None (default) causes the current
                                    scanner crosshair position to be used.
         @param bool emit_change: Flag indicating if the changed POI set should be signaled.
         """
@@ -586,13 +745,8 @@ class PoiManagerLogic(GenericLogic):
         if position is None:
             position = self.scanner_position
 
-        current_poi_set = set(self.poi_names)
-
         # Add POI to current ROI
-        self._roi.add_poi(position=position, name=name)
-
-        # Get newly added POI name from comparing POI names before and after addition of new POI
-        poi_name = set(self.poi_names).difference(current_poi_set).pop()
+        poi_name = self._roi.add_poi(position=position, name=name)
 
         # Notify about a changed set of POIs if necessary
         if emit_change:
@@ -602,6 +756,28 @@ class PoiManagerLogic(GenericLogic):
         self.set_active_poi(poi_name)
         return
 
+    def add_pois(self, positions, names=None):
+        """
+        Creates several new POIs at once and adds them to the current ROI.
+        Emits a single ROI update instead of one update per POI.
+
+        @param float[][3] positions: Iterable of (x, y, z) positions (absolute coordinates, the
+                                     ROI origin is subtracted for the stored anchors)
+        @param list names: Optional list of names (or None entries for generic names) for the POIs
+
+        @return list: names of the added POIs
+        """
+        if len(positions) == 0:
+            return list()
+
+        poi_names = self._roi.add_pois(positions=positions, names=names)
+
+        self.sigRoiUpdated.emit({'pois': self.poi_positions})
+
+        # Set the last newly created POI as active poi
+        self.set_active_poi(poi_names[-1])
+        return poi_names
+
     @QtCore.Slot()
     def delete_poi(self, name=None):
         """
@@ -635,9 +811,46 @@ class PoiManagerLogic(GenericLogic):
     @QtCore.Slot()
     def delete_all_pois(self):
         self.active_poi = None
-        for name in self.poi_names:
-            self._roi.delete_poi(name)
-            self.sigPoiUpdated.emit(name, '', np.zeros(3))
+        self._roi.delete_pois(self.poi_names)
+        self.sigRoiUpdated.emit({'pois': self.poi_positions})
+        return
+
+    def get_nearest_poi(self, position, max_distance=None):
+        """
+        Returns the name of the POI closest to the given position.
+
+        @param float[] position: (x, y) or (x, y, z) position. If only x and y are given, the
+                                 z coordinate of the POIs is ignored.
+        @param float max_distance: Optional maximum distance of the POI to the given position
+
+        @return str: Name of the nearest POI or None if no POI has been found
+        """
+        return self._roi.get_nearest_poi(position=position, max_distance=max_distance)
+
+    def get_pois_in_range(self, position, radius):
+        """
+        Returns the names of all POIs within a given distance of a position.
+
+        @param float[] position: (x, y) or (x, y, z) position. If only x and y are given, the
+                                 z coordinate of the POIs is ignored.
+        @param float radius: Maximum distance of the POIs to the given position
+
+        @return list: Names of the POIs found
+        """
+        return self._roi.get_pois_in_range(position=position, radius=radius)
+
+    @QtCore.Slot(np.ndarray)
+    @QtCore.Slot(np.ndarray, float)
+    def set_active_poi_from_position(self, position, max_distance=None):
+        """
+        Set the POI closest to the given position as active POI.
+
+        @param float[] position: (x, y) or (x, y, z) position
+        @param float max_distance: Optional maximum distance of the POI to the given position
+        """
+        name = self.get_nearest_poi(position=position, max_distance=max_distance)
+        if name is not None:
+            self.set_active_poi(name)
         return
 
     @QtCore.Slot(str)
@@ -821,7 +1034,7 @@ class PoiManagerLogic(GenericLogic):
     def set_scan_image(self, emit_change=True):
         """ Get the current xy scan data and set as scan_image of ROI. """
         self._roi.set_scan_image(
-            self.scannerlogic().xy_image[:, :, 3],
+            self.scannerlogic().xy_image_data.channel_image(0),
             (tuple(self.scannerlogic().image_x_range), tuple(self.scannerlogic().image_y_range)))
 
         if emit_change:
@@ -1172,12 +1385,21 @@ class PoiManagerLogic(GenericLogic):
     def roi_to_dict(self, roi):
         return roi.to_dict()
 
-    def transform_roi(self, transform_matrix):
-        # TODO: Implement this
-        if transform_matrix.shape != (3, 3):
+    def transform_roi(self, transform_matrix=None, shift=None):
+        """
+        Transform the anchors of all POIs at once (anchor -> transform_matrix @ anchor + shift).
+
+        @param numpy.ndarray transform_matrix: Optional transformation matrix of shape (3, 3)
+        @param float[3] shift: Optional shift vector (x, y, z)
+        """
+        if transform_matrix is not None and np.shape(transform_matrix) != (3, 3):
             self.log.error('Tranformation matrix must be numpy array of shape (3, 3).')
             return
-        self.log.error('Tranformation of all POI positions not implemented yet.')
+        if shift is not None and len(shift) != 3:
+            self.log.error('POI shift must be iterable of length 3.')
+            return
+        self._roi.transform_poi_anchors(transform_matrix=transform_matrix, shift=shift)
+        self.sigRoiUpdated.emit({'pois': self.poi_positions})
         return
 
     def _spot_filter(self, scan):
@@ -1188,71 +1410,84 @@ class PoiManagerLogic(GenericLogic):
         arr_size = int(spot_size / pixel_size)
         return arr_size
 
-    def _is_spot_shape(self, local_arr):
-        unspot_e = 0
-        ensem_e = 0
-        len_arr = len(local_arr)
-        mid_f = int(0.5 * len_arr)
-        hm_local_arr = local_arr[mid_f].mean()
-        vm_local_arr = local_arr[:, mid_f].mean()
-        for i in range(0, len_arr):
-            if local_arr[i].mean() > hm_local_arr:
-                ensem_e += 1
-            if local_arr[:, i].mean() > vm_local_arr:
-                ensem_e += 1
-            if hm_local_arr > vm_local_arr * 1.2:
-                unspot_e += 1
-            if vm_local_arr > hm_local_arr * 1.2:
-                unspot_e += 1
-        if ensem_e > 4:
-            return False
-        elif unspot_e > 1:
-            return False
-        else:
-            return True
+    def _is_spot_shape(self, local_arrs):
+        """ Check the shape of a stack of quadratic image sections around spot candidates.
 
-    def _local_max(self, scan):
-        scan = np.asarray(scan, order="C")  # scan has to be a 2-D array
+        A section is rejected if more than 4 of its rows/columns have a higher mean than the
+        central row/column or if the central row and column means differ by more than 20%.
+
+        @param numpy.ndarray local_arrs: image sections of shape (n, filter_size, filter_size)
+
+        @return numpy.ndarray: bool array of length n, True for spot shaped sections
+        """
+        len_arr = local_arrs.shape[1]
+        mid_f = int(0.5 * len_arr)
+        row_means = local_arrs.mean(axis=2)
+        col_means = local_arrs.mean(axis=1)
+        hm_local_arr = row_means[:, mid_f]
+        vm_local_arr = col_means[:, mid_f]
+        ensem_e = (np.count_nonzero(row_means > hm_local_arr[:, np.newaxis], axis=1)
+                   + np.count_nonzero(col_means > vm_local_arr[:, np.newaxis], axis=1))
+        unspot_e = len_arr * ((hm_local_arr > vm_local_arr * 1.2).astype(int)
+                              + (vm_local_arr > hm_local_arr * 1.2).astype(int))
+        return (ensem_e <= 4) & (unspot_e <= 1)
+
+    def _local_max(self, scan, threshold=None):
+        """ Find the centers of all image sections of size filter_size x filter_size whose
+        central pixel is the maximum of the section, which have a spot shape and whose mean
+        exceeds half of the POI threshold.
+
+        @param numpy.ndarray scan: 2D image
+        @param float threshold: optional minimum value of the central pixel to preselect candidates
+
+        @return (numpy.ndarray, numpy.ndarray): row and column indices of the found spots
+        """
+        scan = np.asarray(scan, dtype=float, order="C")  # scan has to be a 2-D array
         filter_size = self._spot_filter(scan)
-        scan_m = scan.mean()
+        if filter_size < 1:
+            self.log.error('POI diameter is smaller than the scan image pixel size. Unable to '
+                           'search for POIs.')
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        arr_threshold = scan.mean() * self._poi_threshold * 0.5
         mid_f = int(filter_size / 2)
-        xc = []
-        yc = []
-        for i in range(0, len(scan) - filter_size):
-            for j in range(0, len(scan[i]) - filter_size):
-                local_arr = scan[i:i + filter_size, j:j + filter_size]
-                local_arr = np.asarray(local_arr)
-                arr_threshold = scan_m * self._poi_threshold * 0.5
-                if scan[i + mid_f][j + mid_f] == local_arr.max() and self._is_spot_shape(local_arr) and local_arr.mean() > arr_threshold:
-                    xc.append(i + mid_f)
-                    yc.append(j + mid_f)
-        return xc, yc
+
+        # Candidates are pixels being the maximum of the section they are the center of.
+        # Only sections lying completely inside the image are considered.
+        is_max = scan == maximum_filter(scan, size=filter_size, mode='nearest')
+        candidates = np.zeros(scan.shape, dtype=bool)
+        candidates[mid_f:scan.shape[0] - filter_size + mid_f,
+                   mid_f:scan.shape[1] - filter_size + mid_f] = True
+        candidates &= is_max
+        if threshold is not None:
+            candidates &= scan > threshold
+        xc, yc = np.nonzero(candidates)
+
+        # Gather the image sections around all candidates at once
+        offsets = np.arange(filter_size) - mid_f
+        rows = (xc[:, np.newaxis] + offsets)[:, :, np.newaxis]
+        cols = (yc[:, np.newaxis] + offsets)[:, np.newaxis, :]
+        local_arrs = scan[rows, cols]
+
+        is_spot = local_arrs.mean(axis=(1, 2)) > arr_threshold
+        is_spot &= self._is_spot_shape(local_arrs)
+        return xc[is_spot], yc[is_spot]
 
     def auto_catch_poi(self):
-        scan_image = self.roi_scan_image.T
+        """ Automatically add POIs for all spots found in the ROI scan image. """
+        # Work on a copy with the fractional part of the counts removed
+        scan_image = np.trunc(np.array(self.roi_scan_image, dtype=float).T)
         x_range = self.roi_scan_image_extent[0]
         y_range = self.roi_scan_image_extent[1]
         x_axis = np.arange(x_range[0], x_range[1], (x_range[1] - x_range[0]) / len(scan_image))
         y_axis = np.arange(y_range[0], y_range[1], (y_range[1] - y_range[0]) / len(scan_image[0]))
 
-        for i in range(0, len(scan_image)):
-            for j in range(0, len(scan_image[i])):
-                scan_image[i][j] = int(scan_image[i][j])  # data here somehow needs to be reset, otherwise shit happens.
-
         threshold = scan_image.mean() * self._poi_threshold
 
-        xc1, yc1 = self._local_max(scan_image)
-        xc2 = []
-        yc2 = []
-        for i in range(0, len(xc1)):
-            if scan_image[xc1[i], yc1[i]] > threshold:
-                xc2.append(xc1[i])
-                yc2.append(yc1[i])
-
-        pois = np.zeros((len(xc2), 3))
-        z = self.scanner_position[2]
-        for i in range(0, len(pois)):
-            pois[i] = [x_axis[xc2[i]], y_axis[yc2[i]], z]
-            self.add_poi(pois[i])
-            if self.poi_nametag is None:
-                time.sleep(0.1)
\ No newline at end of file
+        xc, yc = self._local_max(scan_image, threshold=threshold)
+
+        pois = np.empty((len(xc), 3))
+        pois[:, 0] = x_axis[xc]
+        pois[:, 1] = y_axis[yc]
+        pois[:, 2] = self.scanner_position[2]
+        self.add_pois(pois)
+        return
@@ -28,6 +28,7 @@ import datetime
 import matplotlib.pyplot as plt
 
 from core.connector import Connector
+from core.instrumentation import instrumentation
 from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
 from core.util.mutex import Mutex
@@ -1097,6 +1098,7 @@ class PulsedMeasurementLogic(GenericLogic):
                                                                         self.__fast_counter_gates))
         return
 
+    @instrumentation.timed()
     def _pulsed_analysis_loop(self):
         """ Acquires laser pulses from fast counter,
             calculates fluorescence signal and creates plots.
@@ -1107,7 +1109,8 @@ class PulsedMeasurementLogic(GenericLogic):
 
                 self._extract_laser_pulses()
 
-                tmp_signal, tmp_error = self._analyze_laser_pulses()
+                with instrumentation.measure('analysis'):
+                    tmp_signal, tmp_error = self._analyze_laser_pulses()
 
                 # exclude laser pulses to ignore
                 if len(self._laser_ignore_list) > 0:
@@ -1149,13 +1152,15 @@ class PulsedMeasurementLogic(GenericLogic):
 
     def _extract_laser_pulses(self):
         # Get counter raw data (including recalled raw data from previous measurement)
-        fc_data, info_dict = self._get_raw_data()
+        with instrumentation.measure('hardware'):
+            fc_data, info_dict = self._get_raw_data()
         self.raw_data = fc_data
         self.__elapsed_sweeps = info_dict['elapsed_sweeps']
         self.__elapsed_time = info_dict['elapsed_time']
 
         # extract laser pulses from raw data
-        return_dict = self._pulseextractor.extract_laser_pulses(self.raw_data)
+        with instrumentation.measure('extraction'):
+            return_dict = self._pulseextractor.extract_laser_pulses(self.raw_data)
         self.laser_data = return_dict['laser_counts_arr']
         return
 
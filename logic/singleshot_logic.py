@@ -33,6 +33,79 @@ from logic.generic_logic import GenericLogic
 from qtpy import QtCore
 
 
+class SingleShotBinnings:
+    """
+    Sequence of all binnings of a single shot signal, which are calculated on demand.
+
+    Entry i contains the signal summed up over blocks of i + 1 consecutive rows (an incomplete
+    block at the end is dropped), i.e. entry 0 is the initial binning given by the measurement.
+    All binnings are strided differences of a single cumulative sum of the signal, so calculating
+    one binning costs O(n_rows / bin_width) without any loop in python.
+
+    For normalized binnings each entry is the 1D array (s0 - s1) / (s0 + s1) of the two summed
+    laser pulses s0 and s1, otherwise an array of shape (n_blocks, 2) with the sums themselves.
+    """
+
+    def __init__(self, signal, max_bin, normalized=False):
+        """
+        @param numpy.ndarray signal: array of shape (n_rows, >=2), the first two columns hold the
+                                     summed up laser pulses of each row
+        @param int max_bin: largest number of rows to sum up, i.e. the number of binnings
+        @param bool normalized: return the normalized instead of the summed signal
+        """
+        signal = np.asarray(signal)
+        if signal.size == 0:
+            signal = np.zeros((0, 2))
+        signal = signal[:, :2]
+        dtype = np.float64 if np.issubdtype(signal.dtype, np.floating) else np.int64
+        self._cumsum = np.zeros((signal.shape[0] + 1, 2), dtype=dtype)
+        np.cumsum(signal, axis=0, out=self._cumsum[1:])
+        self._n_rows = signal.shape[0]
+        self._max_bin = max(0, min(int(max_bin), self._n_rows))
+        self.normalized = bool(normalized)
+
+    def __len__(self):
+        return self._max_bin
+
+    def __iter__(self):
+        for bin_width in range(1, self._max_bin + 1):
+            yield self.get_binning(bin_width)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[ii] for ii in range(*index.indices(self._max_bin))]
+        index = int(index)
+        if index < 0:
+            index += self._max_bin
+        if not 0 <= index < self._max_bin:
+            raise IndexError('Binning index {0} out of range for {1:d} binnings.'
+                             ''.format(index, self._max_bin))
+        return self.get_binning(index + 1)
+
+    def get_binning(self, bin_width):
+        """ Calculate the signal summed up over blocks of bin_width consecutive rows.
+
+        @param int bin_width: number of rows to sum up
+
+        @return numpy.ndarray: the binned (or normalized binned) signal
+        """
+        n_blocks = self._n_rows // bin_width
+        binning = np.diff(self._cumsum[:n_blocks * bin_width + 1:bin_width], axis=0)
+        if self.normalized:
+            return (binning[:, 0] - binning[:, 1]) / (binning[:, 0] + binning[:, 1])
+        return binning
+
+    def to_array(self):
+        """ Calculate all binnings at once.
+
+        @return numpy.ndarray: 1D object array containing all binnings
+        """
+        bin_array = np.empty(self._max_bin, dtype=object)
+        for ii, binning in enumerate(self):
+            bin_array[ii] = binning
+        return bin_array
+
+
 class SingleShotLogic(GenericLogic):
     """ This class brings raw data coming from fastcounter measurements (gated or ungated)
         into trace form processable by the trace_analysis_logic.
@@ -194,10 +267,13 @@ class SingleShotLogic(GenericLogic):
         sum_single_pulses = []
         start_stop_tupel_list = self.find_laser(smoothing=smoothing, n_laserpulses=n_laserpulses)
         if self.data_dict:
-            data = self.data_dict['raw_data']
-            for row in data:
-                laser_pulses = [np.sum(row[jj[0]:jj[1]]) for jj in start_stop_tupel_list]
-                sum_single_pulses.append(laser_pulses)
+            data = np.asarray(self.data_dict['raw_data'])
+            # sum up each laser pulse for all rows at once
+            sum_single_pulses = [np.sum(data[:, start:stop], axis=1)
+                                 for start, stop in start_stop_tupel_list]
+            if sum_single_pulses:
+                return np.stack(sum_single_pulses, axis=1)
+            return np.zeros((data.shape[0], 0), dtype=data.dtype)
         else:
             self.log.error('Pull data from fastcounting device using get_data function before trying to sum_laserpulse.')
 
@@ -216,7 +292,8 @@ class SingleShotLogic(GenericLogic):
 
         sum_single_pulses = self.sum_laserpulse()
         if sum_single_pulses.shape[1] == 2:
-            normalized_signal = np.array([(ii[0] - ii[1])/(ii[0] + ii[1]) for ii in sum_single_pulses])
+            normalized_signal = (sum_single_pulses[:, 0] - sum_single_pulses[:, 1]) / \
+                                (sum_single_pulses[:, 0] + sum_single_pulses[:, 1])
         else:
             self.log.warning('could not perform normalisation. Wrong number of laserpulses.')
 
@@ -226,62 +303,34 @@ class SingleShotLogic(GenericLogic):
         """
         calculate reasonable binnings of the signal
         @param int num_bins: minimal number the binnings can have
-        @return list bin_list: Contains the arrays with the binned data.
-                               Data is structured as follows: bin_list[0] is the
-                               initial binning given by the measurement and then going up.
+        @return SingleShotBinnings bin_list: Sequence of the arrays with the binned data, which are
+                                             calculated when accessed. bin_list[0] is the initial
+                                             binning given by the measurement and then going up.
         """
-
-        if self.data_dict:
-            data = self.data_dict
-        else:
-            self.log.error('Pull data from fastcounting device using get_data function '
-                           'before trying to calc_all_binnings.')
-
-        NN = data['n_rows']
-        # this is just a guess value, at some point it doesn't make
-        # sense anymore to further decrease the number of bins
-        max_bin = NN // num_bins
-        count_var = 1
-        bin_list = []
-        temp_list = []
-        signal = self.sum_laserpulse()
-        while count_var <= max_bin:
-            # check if the the first run through loop was done
-            if temp_list:
-                app_arr = np.array(temp_list)
-                bin_list.append(app_arr)
-                temp_list = []
-            jj = 0
-            while jj < NN:
-                sum_ind = np.linspace(jj, jj + count_var - 1, count_var, dtype=np.int)
-                # make sure we don't try to adress not reserved memory
-                jj += count_var
-                if sum_ind[-1] < NN:
-                    # normalize
-                    temp_list.append(np.array([np.sum(signal[sum_ind, 0]), np.sum(signal[sum_ind, 1])]))
-                else:
-                    jj = NN
-            count_var += 1
-
-        return np.array(bin_list)
+        return self._get_binnings(num_bins=num_bins, normalized=False)
 
     def calc_all_binnings_normalized(self, num_bins=100):
         """
         Calculate all normalized binnings from singleshot data
         @param integer num_bins: Tells how many data points should still remain ( in this sense restricts the maximum
                                  number of data points added up together )
-        @return list normalized_bin_list: The entries are numpy arrays that represent different binnings
-                                          ( 1 to n values)
+        @return SingleShotBinnings normalized_bin_list: The entries are numpy arrays that represent different
+                                                        binnings ( 1 to n values), calculated when accessed
         """
+        return self._get_binnings(num_bins=num_bins, normalized=True)
 
-        bin_list = self.calc_all_binnings(num_bins=num_bins)
-        normalized_bin_list = []
-        for binning in bin_list:
-            normalized_binning = (binning[:, 0] - binning[:, 1])/(binning[:, 0] + binning[:, 1])
-            normalized_bin_list.append(normalized_binning)
-
-        return np.array(normalized_bin_list)
+    def _get_binnings(self, num_bins, normalized):
+        if not self.data_dict:
+            self.log.error('Pull data from fastcounting device using get_data function '
+                           'before trying to calc_all_binnings.')
+            return SingleShotBinnings(np.zeros((0, 2)), 0, normalized=normalized)
 
+        NN = self.data_dict['n_rows']
+        # this is just a guess value, at some point it doesn't make
+        # sense anymore to further decrease the number of bins
+        max_bin = NN // num_bins
+        signal = self.sum_laserpulse()
+        return SingleShotBinnings(signal[:NN], max_bin, normalized=normalized)
 
     def get_timetrace(self):
         """
@@ -294,7 +343,7 @@ class SingleShotLogic(GenericLogic):
         # what needs to be done here now is the basic evaluation steps like fit, threshold
         # readout fidelity
 
-        bin_list = self.calc_all_binnings(self, num_bins=100)
+        bin_list = self.calc_all_binnings(num_bins=100)
 
         param_dict_list = []
         fidelity_list = []
@@ -445,7 +494,7 @@ class SingleShotLogic(GenericLogic):
 
             normalized_bin_list = self.calc_all_binnings_normalized()
             save_path2 = os.path.join(filepath, filelabel2)
-            np.save(save_path2, normalized_bin_list)
+            np.save(save_path2, normalized_bin_list.to_array())
             if visualize:
                 visualize_path = os.path.join(filepath, timestamp_str + '_visualize_bins')
                 os.mkdir(visualize_path)
@@ -459,7 +508,7 @@ class SingleShotLogic(GenericLogic):
 
             bin_list = self.calc_all_binnings()
             save_path1 = os.path.join(filepath, filelabel1)
-            np.save(save_path1, bin_list)
+            np.save(save_path1, bin_list.to_array())
 
         meta_data_dict = copy.deepcopy(self.data_dict)
         meta_data_dict.pop('raw_data')
@@ -515,7 +564,7 @@ class SingleShotLogic(GenericLogic):
         @param record_length:
         @return:
         """
-        normalized_bin_list = self.calc_all_binnings_normalized(self, num_bins=100)
+        normalized_bin_list = self.calc_all_binnings_normalized(num_bins=100)
 
         # for now take only the initial binning
         data = normalized_bin_list[0]
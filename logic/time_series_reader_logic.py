@@ -26,6 +26,7 @@ import time
 import matplotlib.pyplot as plt
 
 from core.connector import Connector
+from core.instrumentation import instrumentation
 from core.statusvariable import StatusVar
 from core.configoption import ConfigOption
 from logic.generic_logic import GenericLogic
@@ -530,6 +531,7 @@ class TimeSeriesReaderLogic(GenericLogic):
         return 0
 
     @QtCore.Slot()
+    @instrumentation.timed()
     def acquire_data_block(self):
         """
         This method gets the available data from the hardware.
@@ -560,7 +562,8 @@ class TimeSeriesReaderLogic(GenericLogic):
                     return
 
                 # read the current counter values
-                data = self._streamer.read_data(number_of_samples=samples_to_read)
+                with instrumentation.measure('hardware'):
+                    data = self._streamer.read_data(number_of_samples=samples_to_read)
                 if data.shape[1] != samples_to_read:
                     self.log.error('Reading data from streamer went wrong; '
                                    'killing the stream with next data frame.')
@@ -24,9 +24,159 @@ from scipy.interpolate import InterpolatedUnivariateSpline
 from collections import OrderedDict
 
 from core.connector import Connector
+from core.util.ringbuffer import GrowableArray
 from logic.generic_logic import GenericLogic
 
 
+class TraceFlipCounter:
+    """
+    Counts the transitions between consecutive data points of a trace, classified by an
+    initialization threshold for the first and an analysis threshold for the second point.
+
+    A point is initialized high if it is above init_threshold[1] and low if it is below
+    init_threshold[0]. The following point is analyzed as high if it is above ana_threshold[1],
+    otherwise as low if it is below ana_threshold[0].
+
+    The trace can be passed in several chunks. The last point of each chunk is kept to count the
+    transition to the first point of the next chunk, so the counts do not depend on the chunking.
+    """
+
+    def __init__(self, init_threshold=None, ana_threshold=None):
+        """
+        @param list init_threshold: [low, high] thresholds for the initial point of a transition
+        @param list ana_threshold: [low, high] thresholds for the following point of a transition
+        """
+        self.init_threshold = list(init_threshold) if init_threshold is not None else [1, 1]
+        self.ana_threshold = list(ana_threshold) if ana_threshold is not None else [1, 1]
+        self.reset()
+
+    def reset(self):
+        """ Forget all counted transitions. """
+        # total number of points passed so far
+        self.length = 0
+        # number of points (except the last one) initialized high/low
+        self.init_high = 0
+        self.init_low = 0
+        # number of transitions from an initialized state to an analyzed state
+        self.high_to_high = 0
+        self.high_to_low = 0
+        self.low_to_high = 0
+        self.low_to_low = 0
+        self._last_init = None
+
+    def add_chunk(self, chunk):
+        """ Count all transitions within a chunk and from the previous chunk to this one.
+
+        @param numpy.ndarray chunk: 1D array with the next points of the trace
+        """
+        chunk = np.asarray(chunk)
+        if chunk.size == 0:
+            return
+        init_high = chunk > self.init_threshold[1]
+        init_low = chunk < self.init_threshold[0]
+        ana_high = chunk > self.ana_threshold[1]
+        ana_low = (chunk < self.ana_threshold[0]) & ~ana_high
+
+        if self._last_init is not None:
+            self._count(self._last_init[0], self._last_init[1], ana_high[:1], ana_low[:1])
+        self._count(init_high[:-1], init_low[:-1], ana_high[1:], ana_low[1:])
+        self._last_init = (init_high[-1:], init_low[-1:])
+        self.length += chunk.size
+
+    def _count(self, init_high, init_low, ana_high, ana_low):
+        self.init_high += int(np.count_nonzero(init_high))
+        self.init_low += int(np.count_nonzero(init_low))
+        self.high_to_high += int(np.count_nonzero(init_high & ana_high))
+        self.high_to_low += int(np.count_nonzero(init_high & ana_low))
+        self.low_to_high += int(np.count_nonzero(init_low & ana_high))
+        self.low_to_low += int(np.count_nonzero(init_low & ana_low))
+
+    def get_flips(self, analyze_mode='full'):
+        """ Number of flipped and not flipped transitions.
+
+        @param str analyze_mode: 'bright' to analyze transitions initialized high, 'dark' for the
+                                 ones initialized low and 'full' for both
+
+        @return tuple(float, float): number of flips and number of transitions without flip
+        """
+        flip = 0.0
+        no_flip = 0.0
+        if analyze_mode == 'bright' or analyze_mode == 'full':
+            no_flip += self.high_to_high
+            flip += self.high_to_low
+        if analyze_mode == 'dark' or analyze_mode == 'full':
+            flip += self.low_to_high
+            no_flip += self.low_to_low
+        return flip, no_flip
+
+
+class TraceDwellTimeCounter:
+    """
+    Run-length encodes a trace digitized with a threshold (1 for points >= threshold, else 0).
+
+    The lengths of consecutive runs of 1s are stored as positive and the ones of 0s as negative
+    numbers in chronological order. The trace can be passed in several chunks, runs continuing
+    across the border of two chunks are merged.
+    """
+
+    def __init__(self, threshold):
+        """
+        @param float threshold: points equal or above the threshold belong to the high state
+        """
+        self.threshold = threshold
+        self._runs = GrowableArray(dtype=np.int64)
+        self._state = None
+        self._run_length = 0
+
+    def reset(self):
+        """ Forget all runs. """
+        self._runs.clear()
+        self._state = None
+        self._run_length = 0
+
+    def add_chunk(self, chunk):
+        """ Encode the runs in the next chunk of the trace.
+
+        @param numpy.ndarray chunk: 1D array with the next points of the trace
+        """
+        digital = np.asarray(chunk) >= self.threshold
+        if digital.size == 0:
+            return
+        borders = np.concatenate(([0], np.flatnonzero(digital[1:] != digital[:-1]) + 1,
+                                  [digital.size]))
+        lengths = np.diff(borders)
+        states = digital[borders[:-1]]
+
+        if self._state is not None:
+            if states[0] == self._state:
+                lengths[0] += self._run_length
+            else:
+                self._runs.append(self._run_length if self._state else -self._run_length)
+        # the last run of the chunk may still continue in the next chunk
+        self._runs.extend(np.where(states[:-1], lengths[:-1], -lengths[:-1]))
+        self._state = bool(states[-1])
+        self._run_length = int(lengths[-1])
+
+    def get_run_lengths(self):
+        """ Signed lengths of all runs including the last (possibly unfinished) one.
+
+        @return numpy.ndarray: 1D integer array, positive for high and negative for low runs
+        """
+        if self._state is None:
+            return np.zeros(0, dtype=np.int64)
+        last_run = self._run_length if self._state else -self._run_length
+        return np.append(self._runs.data, last_run)
+
+    def get_dwell_times(self, dt):
+        """ Signed durations of all runs.
+
+        @param float dt: time between two points of the trace
+
+        @return numpy.ndarray: 1D array, positive for high and negative for low runs
+        """
+        return self.get_run_lengths() * dt
+
+
 class TraceAnalysisLogic(GenericLogic):
     """ Perform a gated counting measurement with the hardware.  """
 
@@ -232,37 +382,23 @@ class TraceAnalysisLogic(GenericLogic):
                       float lifetime_dark: the lifetime in the dark state in s
                       float lifetime_bright: lifetime in the bright state in s
         """
-        no_flip = 0.0
+        counter = TraceFlipCounter(init_threshold=[threshold, threshold],
+                                   ana_threshold=[threshold, threshold])
+        counter.add_chunk(trace)
 
         if analyze_mode == 'full':
-            for ii in range(len(trace) - 1):
-                if trace[ii] > threshold and trace[ii + 1] > threshold:
-                    no_flip = no_flip + 1
-
-                elif trace[ii] < threshold and trace[ii + 1] < threshold:
-                    no_flip = no_flip + 1
-
+            no_flip = float(counter.high_to_high + counter.low_to_low)
             probability = 1.0 - (no_flip / len(trace))
             lost_events = 0.0
 
         if analyze_mode == 'dark':
-            dark_counter = 0.0
-            for ii in range(len(trace) - 1):
-                if trace[ii] < threshold:
-                    dark_counter = dark_counter + 1
-                    if trace[ii + 1] < threshold:
-                        no_flip = no_flip + 1
-            probability = 1.0 - (no_flip / dark_counter)
+            dark_counter = float(counter.init_low)
+            probability = 1.0 - (float(counter.low_to_low) / dark_counter)
             lost_events = (1.0 - (dark_counter / len(trace))) * 100
 
         if analyze_mode == 'bright':
-            bright_counter = 0.0
-            for ii in range(len(trace) - 1):
-                if trace[ii] > threshold:
-                    bright_counter = bright_counter + 1
-                    if trace[ii + 1] > threshold:
-                        no_flip = no_flip + 1
-            probability = 1.0 - (no_flip / bright_counter)
+            bright_counter = float(counter.init_high)
+            probability = 1.0 - (float(counter.high_to_high) / bright_counter)
             lost_events = (1.0 - (bright_counter / len(trace))) * 100
 
         return probability, lost_events
@@ -284,35 +420,9 @@ class TraceAnalysisLogic(GenericLogic):
         """
         init_threshold = init_threshold if init_threshold is not None else [1, 1]
         ana_threshold = ana_threshold if ana_threshold is not None else [1, 1]
-        no_flip = 0.0
-        flip = 0.0
-
-        # find all indices in the trace-array, where the value is above init_threshold[1]
-        init_high = np.where(trace[:-1] > init_threshold[1])[0]
-        # find all indices in the trace-array, where the value is below init_threshold[0]
-        init_low = np.where(trace[:-1] < init_threshold[0])[0]
-        # find all indices in the trace-array, where the value is above ana_threshold[1]
-        ana_high = np.where(trace > ana_threshold[1])[0]
-        # find all indices in the trace-array, where the value is below ana_threshold[0]
-        ana_low = np.where(trace < ana_threshold[0])[0]
-
-        if analyze_mode == 'bright' or analyze_mode == 'full':
-            # analyze the trace where the data were the nuclear was initalized into one direction
-            for index in init_high:
-                # check if the following data point is in the analysis array
-                if index + 1 in ana_high:
-                    no_flip = no_flip + 1
-                elif index + 1 in ana_low:
-                    flip = flip + 1
-
-        if analyze_mode == 'dark' or analyze_mode == 'full':
-            # repeat the same if the nucleus was initalized into the other array
-            for index in init_low:
-                # check if the following data point is in the analysis array
-                if index + 1 in ana_high:
-                    flip = flip + 1
-                elif index + 1 in ana_low:
-                    no_flip = no_flip + 1
+        counter = TraceFlipCounter(init_threshold=init_threshold, ana_threshold=ana_threshold)
+        counter.add_chunk(trace)
+        flip, no_flip = counter.get_flips(analyze_mode)
 
         # the flip probability is given by the number of flips divided by the total number of analyzed data points
         if (flip + no_flip) == 0:
@@ -324,6 +434,31 @@ class TraceAnalysisLogic(GenericLogic):
 
         return probability, lost_events
 
+    def analyze_flip_prob_stream(self, chunks, init_threshold=None, ana_threshold=None,
+                                 analyze_mode='full'):
+        """ Same analysis as analyze_flip_prob3, but the trace is passed as several consecutive
+            chunks, e.g. to analyze traces that do not fit into memory at once.
+        @param iterable chunks: 1D arrays which form the trace if concatenated
+        @param list init_threshold: [low, high] thresholds for the initialization
+        @param list ana_threshold: [low, high] thresholds for the analysis
+        @param str analyze_mode: 'full', 'bright' or 'dark'
+        @return tuple(probability, lost_events):
+                      float probability: the flip probability (NaN if nothing was analyzed)
+                      float lost_events: number of points not used in the analysis
+        """
+        counter = TraceFlipCounter(init_threshold=init_threshold, ana_threshold=ana_threshold)
+        for chunk in chunks:
+            counter.add_chunk(chunk)
+        flip, no_flip = counter.get_flips(analyze_mode)
+
+        if (flip + no_flip) == 0:
+            self.log.error('There is not enough data to anaylsis SSR!')
+            probability = np.nan
+        else:
+            probability = flip / (flip + no_flip)
+        lost_events = counter.length - (flip + no_flip)
+        return probability, lost_events
+
     def analyze_flip_prob4(self, trace, bins=30, init_threshold = None, ana_threshold = None, analyze_mode='full'):
         """
         Method which calculates the histogram, the fidelity and the flip probability of a time trace.
@@ -366,33 +501,9 @@ class TraceAnalysisLogic(GenericLogic):
             self.log.warning('Not enough data points yet!')
 
         # calculate the flip probability
-        no_flip = 0.0
-        flip = 0.0
-        # find all indices in the trace-array, where the value is above init_threshold[1]
-        init_high = np.where(trace[:-1] > init_threshold[1])[0]
-        # find all indices in the trace-array, where the value is below init_threshold[0]
-        init_low = np.where(trace[:-1] < init_threshold[0])[0]
-        # find all indices in the trace-array, where the value is above ana_threshold[1]
-        ana_high = np.where(trace > ana_threshold[1])[0]
-        # find all indices in the trace-array, where the value is below ana_threshold[0]
-        ana_low = np.where(trace < ana_threshold[0])[0]
-
-        if analyze_mode == 'bright' or analyze_mode == 'full':
-            # analyze the trace where the data were the nuclear was initalized into one direction
-            for index in init_high:
-                # check if the following data point is in the analysis array
-                if index + 1 in ana_high:
-                    no_flip = no_flip + 1
-                elif index + 1 in ana_low:
-                    flip = flip + 1
-        if analyze_mode == 'dark' or analyze_mode == 'full':
-            # repeat the same if the nucleus was initalized into the other array
-            for index in init_low:
-                # check if the following data point is in the analysis array
-                if index + 1 in ana_high:
-                    flip = flip + 1
-                elif index + 1 in ana_low:
-                    no_flip = no_flip + 1
+        counter = TraceFlipCounter(init_threshold=init_threshold, ana_threshold=ana_threshold)
+        counter.add_chunk(trace)
+        flip, no_flip = counter.get_flips(analyze_mode)
 
         # the flip probability is given by the number of flips divided by the total number of analyzed data points
         if (flip + no_flip) == 0:
@@ -506,50 +617,10 @@ class TraceAnalysisLogic(GenericLogic):
                                                                                distr='gaussian_normalized')
                 threshold = threshold_fit
 
-            # helper functions to get and analyze the timetrace
-            def analog_digitial_converter(cut_off, data):
-                new_digital_trace = []
-                for data_point in data:
-                    if data_point >= cut_off:
-                        new_digital_trace.append(1)
-                    else:
-                        new_digital_trace.append(0)
-                return new_digital_trace
-
-            def time_in_high_low(raw_digital_trace, local_dt):
-                """
-                What I need this function to do is to get all consecutive {1, ... , n} 1s or 0s and add
-                them up and put into a list to later make a histogram from them.
-                """
-                occurances = []
-                index = 0
-                index2 = 0
-
-                while index < len(raw_digital_trace):
-                    occurances.append(0)
-                    # start following the consecutive 1s
-                    while raw_digital_trace[index] == 1:
-                        occurances[index2] += 1
-                        if index == (len(raw_digital_trace) - 1):
-                            occurances = np.array(occurances)
-                            return occurances * local_dt
-                        else:
-                            index += 1
-                    if raw_digital_trace[index - 1] == 1:
-                        index2 += 1
-                        occurances.append(0)
-                    # start following the consecutive 0s
-                    while raw_digital_trace[index] == 0:
-                        occurances[index2] -= 1
-                        if index == (len(raw_digital_trace) - 1):
-                            occurances = np.array(occurances)
-                            return occurances * local_dt
-                        else:
-                            index += 1
-                    index2 += 1
-
-            digital_trace = analog_digitial_converter(threshold, trace)
-            time_array = time_in_high_low(digital_trace, dt)
+            # durations of all consecutive runs above (positive) and below (negative) threshold
+            counter = TraceDwellTimeCounter(threshold)
+            counter.add_chunk(trace)
+            time_array = counter.get_dwell_times(dt)
 
             # now we need to make a histogram as well as a fit
             # what would be a good estimate for the number of bins
@@ -558,15 +629,12 @@ class TraceAnalysisLogic(GenericLogic):
             # number of steps in between, rather not use that for now
             # est_bins = np.int(longest/dt)
 
-            time_array_high = np.array([ii for ii in filter(lambda x: x > 0, time_array)])
-            time_array_low = np.array([ii for ii in filter(lambda x: x < 0, time_array)])
+            time_array_high = time_array[time_array > 0]
+            time_array_low = time_array[time_array < 0]
 
             # get lifetime of bright state
             time_hist_high = np.histogram(time_array_high, bins=num_bins)
-            vals = [i for i in filter(lambda x: x[1] > 0, enumerate(time_hist_high[0][0:num_bins]))]
-
-            indices = np.array([val[0] for val in vals])
-            indices = np.array([np.int(indice) for indice in indices])
+            indices = np.flatnonzero(time_hist_high[0][0:num_bins] > 0)
             self.log.debug('threshold {0}'.format(threshold))
             self.log.debug('time_array:{0}'.format(time_array))
             self.log.debug('time_array_high:{0}'.format(time_array_high))
@@ -588,10 +656,8 @@ class TraceAnalysisLogic(GenericLogic):
 
             # get lifetime of dark state
             time_hist_low = np.histogram(time_array_low, bins=num_bins)
-            vals = [i for i in filter(lambda x: x[1] > 0, enumerate(time_hist_low[0][0:num_bins]))]
-            indices = np.array([val[0] for val in vals])
-            indices = np.array([np.int(indice) for indice in indices])
-            values = np.array([val[1] for val in vals])
+            indices = np.flatnonzero(time_hist_low[0][0:num_bins] > 0)
+            values = time_hist_low[0][indices]
             # positive axis
             mirror_axis = -time_hist_low[1][indices]
             result = self._fit_logic.make_decayexponential_fit(mirror_axis,
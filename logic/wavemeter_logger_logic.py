@@ -33,6 +33,7 @@ from core.connector import Connector
 from core.configoption import ConfigOption
 from logic.generic_logic import GenericLogic
 from core.util.mutex import Mutex
+from core.util.ringbuffer import GrowableArray
 
 
 class HardwarePull(QtCore.QObject):
@@ -127,7 +128,8 @@ class WavemeterLoggerLogic(GenericLogic):
         self._data_index = 0
 
         self._recent_wavelength_window = [0, 0]
-        self.counts_with_wavelength = []
+        # columns: measurement time (s), counts (c/s), interpolated wavelength (nm)
+        self._counts_with_wavelength = GrowableArray(row_shape=(3,))
 
         self._xmin = 650
         self._xmax = 750
@@ -139,7 +141,8 @@ class WavemeterLoggerLogic(GenericLogic):
     def on_activate(self):
         """ Initialisation performed during activation of the module.
         """
-        self._wavelength_data = []
+        # columns: time (s), wavelength (nm)
+        self._wavelength_data = GrowableArray(row_shape=(2,))
 
         self.stopRequested = False
 
@@ -216,6 +219,15 @@ class WavemeterLoggerLogic(GenericLogic):
         if len(self.fc.fit_list) > 0:
             self._statusVariables['fits'] = self.fc.save_to_dict()
 
+    @property
+    def counts_with_wavelength(self):
+        """ Stitched data as array with the columns measurement time (s), counts (c/s) and
+        interpolated wavelength (nm).
+
+            @return numpy.ndarray: view of shape (n, 3) on the stitched data
+        """
+        return self._counts_with_wavelength.data
+
     def get_max_wavelength(self):
         """ Current maximum wavelength of the scan.
 
@@ -296,12 +308,12 @@ class WavemeterLoggerLogic(GenericLogic):
 
         if not resume:
             self._acqusition_start_time = self._counter_logic._saving_start_time
-            self._wavelength_data = []
+            self._wavelength_data.clear()
 
             self.data_index = 0
 
             self._recent_wavelength_window = [0, 0]
-            self.counts_with_wavelength = []
+            self._counts_with_wavelength.clear()
 
             self.rawhisto = np.zeros(self._bins)
             self.sumhisto = np.ones(self._bins) * 1.0e-10
@@ -350,7 +362,7 @@ class WavemeterLoggerLogic(GenericLogic):
             return
 
         # The end of the recent_wavelength_window is the time of the latest wavelength data
-        self._recent_wavelength_window[1] = self._wavelength_data[-1][0]
+        self._recent_wavelength_window[1] = self._wavelength_data.data[-1, 0]
 
         # (speed-up) We only need to worry about "recent" counts, because as the count data gets
         # very long all the earlier points will already be attached to wavelength values.
@@ -360,7 +372,7 @@ class WavemeterLoggerLogic(GenericLogic):
         wavelength_recentness = np.min([5, len(self._wavelength_data)])
 
         recent_counts = np.array(self._counter_logic._data_to_save[-count_recentness:])
-        recent_wavelengths = np.array(self._wavelength_data[-wavelength_recentness:])
+        recent_wavelengths = self._wavelength_data.data[-wavelength_recentness:]
 
         # The latest counts are those recorded during the recent_wavelength_window
         count_idx = [0, 0]
@@ -376,10 +388,10 @@ class WavemeterLoggerLogic(GenericLogic):
                                              )
 
         # Stitch interpolated wavelength into latest counts array
-        latest_stitched_data = np.insert(latest_counts, 2, values=interpolated_wavelengths, axis=1)
+        latest_stitched_data = np.column_stack((latest_counts[:, :2], interpolated_wavelengths))
 
-        # Add this latest data to the list of counts vs wavelength
-        self.counts_with_wavelength += latest_stitched_data.tolist()
+        # Add this latest data to the array of counts vs wavelength
+        self._counts_with_wavelength.extend(latest_stitched_data)
 
         # The start of the recent data window for the next round will be the end of this one.
         self._recent_wavelength_window[0] = self._recent_wavelength_window[1]
@@ -428,42 +440,61 @@ class WavemeterLoggerLogic(GenericLogic):
 
         # only do something if there is wavelength data to work with
         if len(self._wavelength_data) > 0:
-
-            for i in self._wavelength_data[self._data_index:]:
-                self._data_index += 1
-
-                if i[1] < self._xmin or i[1] > self._xmax:
-                    continue
-
-                # calculate the bin the new wavelength needs to go in
-                newbin = np.digitize([i[1]], self.histogram_axis)[0]
-                # if the bin make no sense, start from the beginning
-                if newbin > len(self.rawhisto) - 1:
-                    continue
-
-                # sum the counts in rawhisto and count the occurence of the bin in sumhisto
-                interpolation = np.interp(i[0], xp=temp[:, 0], fp=temp[:, 1])
-                self.rawhisto[newbin] += interpolation
-                self.sumhisto[newbin] += 1.0
-
-                self.envelope_histogram[newbin] = np.max([interpolation,
-                                                          self.envelope_histogram[newbin]
-                                                          ])
-
-                datapoint = [i[1], i[0], interpolation]
-                if time.time() - self.last_point_time > 1:
-                    self.sig_new_data_point.emit(self.recent_avg)
-                    self.last_point_time = time.time()
-                    self.recent_count = 0
-                else:
-                    self.recent_count += 1
-                    for j in range(3):
-                        self.recent_avg[j] -= self.recent_avg[j] / self.recent_count
-                        self.recent_avg[j] += datapoint[j] / self.recent_count
+            new_data = self._wavelength_data.data[self._data_index:]
+            self._data_index += len(new_data)
+
+            # calculate the bins the new wavelengths need to go in (same as np.digitize) and
+            # discard points outside of the histogram range
+            wavelengths = new_data[:, 1]
+            new_bins = np.searchsorted(self.histogram_axis, wavelengths, side='right')
+            valid = ((wavelengths >= self._xmin) & (wavelengths <= self._xmax)
+                     & (new_bins < len(self.rawhisto)))
+            times = new_data[valid, 0]
+            wavelengths = wavelengths[valid]
+            new_bins = new_bins[valid]
+
+            # sum the counts in rawhisto and count the occurence of the bins in sumhisto
+            interpolation = np.interp(times, xp=temp[:, 0], fp=temp[:, 1])
+            bins = len(self.rawhisto)
+            self.rawhisto += np.bincount(new_bins, weights=interpolation, minlength=bins)
+            self.sumhisto += np.bincount(new_bins, minlength=bins)
+            np.maximum.at(self.envelope_histogram, new_bins, interpolation)
+
+            self._update_recent_average(wavelengths, times, interpolation)
 
             # the plot data is the summed counts divided by the occurence of the respective bins
             self.histogram = self.rawhisto / self.sumhisto
 
+    def _update_recent_average(self, wavelengths, times, counts):
+        """ Average the new data points since the last emission of sig_new_data_point and emit
+        the average once every second.
+
+        @param numpy.ndarray wavelengths: wavelengths of the new data points
+        @param numpy.ndarray times: time stamps of the new data points
+        @param numpy.ndarray counts: interpolated counts of the new data points
+        """
+        if len(wavelengths) == 0:
+            return
+        # The first data point arriving more than a second after the last emission triggers the
+        # emission of the previous average and starts a new one (it is not part of the average).
+        if time.time() - self.last_point_time > 1:
+            self.sig_new_data_point.emit(self.recent_avg)
+            self.last_point_time = time.time()
+            self.recent_count = 0
+            wavelengths, times, counts = wavelengths[1:], times[1:], counts[1:]
+
+        number_of_points = len(wavelengths)
+        if number_of_points == 0:
+            return
+        total_count = self.recent_count + number_of_points
+        point_sums = (wavelengths.sum(), times.sum(), counts.sum())
+        if self.recent_count == 0:
+            self.recent_avg = [point_sum / total_count for point_sum in point_sums]
+        else:
+            self.recent_avg = [(avg * self.recent_count + point_sum) / total_count
+                               for avg, point_sum in zip(self.recent_avg, point_sums)]
+        self.recent_count = total_count
+
     def save_data(self, timestamp=None):
         """ Save the counter trace data and writes it to a file.
 
@@ -512,7 +543,7 @@ class WavemeterLoggerLogic(GenericLogic):
 
         # prepare the data in a dict or in an OrderedDict:
         data = OrderedDict()
-        data['Time (s), Wavelength (nm)'] = self._wavelength_data
+        data['Time (s), Wavelength (nm)'] = np.array(self._wavelength_data.data)
         # write the parameters:
         parameters = OrderedDict()
         parameters['Acquisition Timing (ms)'] = self._logic_acquisition_timing
@@ -587,8 +618,8 @@ class WavemeterLoggerLogic(GenericLogic):
         """
         # TODO: Draw plot for second APD if it is connected
 
-        wavelength_data = [entry[2] for entry in self.counts_with_wavelength]
-        count_data = np.array([entry[1] for entry in self.counts_with_wavelength])
+        wavelength_data = self.counts_with_wavelength[:, 2]
+        count_data = self.counts_with_wavelength[:, 1]
 
         # Index of max counts, to use to position "0" of frequency-shift axis
         count_max_index = count_data.argmax()